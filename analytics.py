@@ -0,0 +1,300 @@
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+import time
+from array import array
+from itertools import compress
+
+from cashier import format_cents
+from journal import replay
+from tax import TAX_CLASSES, taxes_of_record
+
+try:
+    import numpy as np
+except ImportError:
+    # Without NumPy the same reports are computed with plain loops, which is fine for a day but slow for a year
+    np = None
+
+
+class SalesColumns:
+    # Completed receipts as flat columns: one entry per receipt line and one per order
+    def __init__(self):
+        # Initialize empty columns; line_order is the position of a line's order in the order columns
+        self.line_order = array("q")
+        self.line_product = array("q")
+        self.line_quantity = array("q")
+        self.line_cents = array("q")
+        self.order_closed = array("d")
+        self.order_total = array("q")
+        # Gross and tax cents per order, one column per tax class code
+        self.order_gross = {code: array("q") for code in TAX_CLASSES}
+        self.order_tax = {code: array("q") for code in TAX_CLASSES}
+        self.names = {}
+
+    def __len__(self):
+        return len(self.order_total)
+
+    def add_record(self, record):
+        # Append one receipt record made by Receipt.to_record
+        order = len(self.order_total)
+        self.order_closed.append(record["closed"])
+        self.order_total.append(record["total"])
+        self.add_taxes(taxes_of_record(record))
+        for line in record["lines"]:
+            product_id, name, price, quantity = line[:4]
+            self.line_order.append(order)
+            self.line_product.append(product_id)
+            self.line_quantity.append(quantity)
+            self.line_cents.append(price * quantity)
+            self.names[product_id] = name
+
+    def add_taxes(self, rows):
+        # Append the tax columns of one order from its [code, rate_bp, gross_cents, tax_cents] rows
+        gross_by_class = {}
+        tax_by_class = {}
+        for code, _, gross, tax in rows:
+            if code not in TAX_CLASSES:
+                raise ValueError(f"Unknown tax class: {code}")
+            gross_by_class[code] = gross
+            tax_by_class[code] = tax
+        for code, column in self.order_gross.items():
+            column.append(gross_by_class.get(code, 0))
+            self.order_tax[code].append(tax_by_class.get(code, 0))
+
+    @classmethod
+    def from_records(cls, records):
+        # Columns for an iterable of receipt records
+        columns = cls()
+        for record in records:
+            columns.add_record(record)
+        return columns
+
+    @classmethod
+    def from_journal(cls, path):
+        # Columns for every order in a journal file
+        return cls.from_records(replay(path))
+
+    @classmethod
+    def from_sales_db(cls, path):
+        # Columns for every order in a sales database written by SalesStore
+        columns = cls()
+        connection = sqlite3.connect(path)
+        try:
+            positions = {}
+            taxes = {}
+            if connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'order_taxes'").fetchone():
+                for row in connection.execute(
+                        "SELECT order_id, tax_class, rate_bp, gross_cents, tax_cents FROM order_taxes"):
+                    taxes.setdefault(row[0], []).append(row[1:])
+            for order_id, closed, total in connection.execute(
+                    "SELECT order_id, closed, total_cents FROM orders ORDER BY closed"):
+                positions[order_id] = len(columns.order_total)
+                columns.order_closed.append(closed)
+                columns.order_total.append(total)
+                # Orders stored before the tax breakdown was kept have no rows; they were taxed at the general rate
+                columns.add_taxes(taxes.get(order_id) or taxes_of_record({"total": total}))
+            for order_id, product_id, quantity, subtotal in connection.execute(
+                    "SELECT order_id, product_id, quantity, subtotal_cents FROM order_lines"):
+                columns.line_order.append(positions[order_id])
+                columns.line_product.append(product_id)
+                columns.line_quantity.append(quantity)
+                columns.line_cents.append(subtotal)
+            columns.names.update(connection.execute("SELECT product_id, name FROM products"))
+        finally:
+            connection.close()
+        return columns
+
+
+def local_hours(epoch_hours):
+    # Local hour of day for each distinct epoch hour; each hour is converted once, so daylight saving time is right
+    return [time.localtime(hour * 3600).tm_hour for hour in epoch_hours]
+
+
+def day_bounds(first_day, last_day):
+    # Epoch seconds from the start of first_day to the end of last_day, both "YYYY-MM-DD" in local time
+    start = time.mktime(time.strptime(first_day, "%Y-%m-%d"))
+    # Midnight of the next day rather than 86400 seconds later, since the day the clocks change is 23 or 25 hours
+    # long; mktime carries day 32 over into the next month, and tm_isdst -1 lets it pick the offset in force
+    day = time.strptime(last_day, "%Y-%m-%d")
+    end = time.mktime((day.tm_year, day.tm_mon, day.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+    return start, end
+
+
+def summarize(columns, start=None, end=None):
+    # Aggregate the orders closed in [start, end): per product, per hour of day, basket size and IVA
+    if np is not None:
+        return summarize_numpy(columns, start, end)
+    return summarize_python(columns, start, end)
+
+
+def summarize_numpy(columns, start, end):
+    # Vectorized aggregates over the columns, which NumPy reads in place without copying
+    closed = np.frombuffer(columns.order_closed, dtype=np.float64)
+    totals = np.frombuffer(columns.order_total, dtype=np.int64)
+    line_order = np.frombuffer(columns.line_order, dtype=np.int64)
+    keep = np.ones(len(totals), dtype=bool)
+    if start is not None:
+        keep &= closed >= start
+    if end is not None:
+        keep &= closed < end
+    line_keep = keep[line_order]
+    products = np.frombuffer(columns.line_product, dtype=np.int64)[line_keep]
+    quantities = np.frombuffer(columns.line_quantity, dtype=np.int64)[line_keep]
+    cents = np.frombuffer(columns.line_cents, dtype=np.int64)[line_keep]
+    kept_totals = totals[keep]
+    gross = {code: int(np.frombuffer(column, dtype=np.int64)[keep].sum()) for code, column in columns.order_gross.items()}
+    taxes = {code: int(np.frombuffer(column, dtype=np.int64)[keep].sum()) for code, column in columns.order_tax.items()}
+
+    # Group by product: np.add.at sums int64 exactly, unlike the float weights of bincount
+    ids, groups = np.unique(products, return_inverse=True)
+    product_quantity = np.zeros(len(ids), dtype=np.int64)
+    product_cents = np.zeros(len(ids), dtype=np.int64)
+    np.add.at(product_quantity, groups, quantities)
+    np.add.at(product_cents, groups, cents)
+
+    # Group by local hour of day, converting each distinct epoch hour once
+    epoch_hours, hour_groups = np.unique((closed[keep] // 3600).astype(np.int64), return_inverse=True)
+    hour_of_day = np.array(local_hours(epoch_hours.tolist()), dtype=np.int64)[hour_groups]
+    hour_orders = np.bincount(hour_of_day, minlength=24)
+    hour_cents = np.zeros(24, dtype=np.int64)
+    np.add.at(hour_cents, hour_of_day, kept_totals)
+
+    return make_report(
+        columns,
+        orders=int(keep.sum()),
+        items=int(quantities.sum()),
+        revenue=int(kept_totals.sum()),
+        gross=gross,
+        taxes=taxes,
+        products=zip(ids.tolist(), product_quantity.tolist(), product_cents.tolist()),
+        hours=zip(range(24), hour_orders.tolist(), hour_cents.tolist()))
+
+
+def summarize_python(columns, start, end):
+    # The same aggregates with plain loops, for tills without NumPy
+    keep = [(start is None or closed >= start) and (end is None or closed < end) for closed in columns.order_closed]
+    product_quantity = {}
+    product_cents = {}
+    items = 0
+    for order, product_id, quantity, cents in zip(columns.line_order, columns.line_product,
+                                                  columns.line_quantity, columns.line_cents):
+        if keep[order]:
+            product_quantity[product_id] = product_quantity.get(product_id, 0) + quantity
+            product_cents[product_id] = product_cents.get(product_id, 0) + cents
+            items += quantity
+    hour_of_day = {}
+    hour_orders = [0] * 24
+    hour_cents = [0] * 24
+    orders = revenue = 0
+    for kept, closed, total in zip(keep, columns.order_closed, columns.order_total):
+        if kept:
+            epoch_hour = int(closed // 3600)
+            hour = hour_of_day.get(epoch_hour)
+            if hour is None:
+                hour = hour_of_day[epoch_hour] = local_hours([epoch_hour])[0]
+            hour_orders[hour] += 1
+            hour_cents[hour] += total
+            orders += 1
+            revenue += total
+    gross = {code: sum(compress(column, keep)) for code, column in columns.order_gross.items()}
+    taxes = {code: sum(compress(column, keep)) for code, column in columns.order_tax.items()}
+    return make_report(
+        columns, orders=orders, items=items, revenue=revenue, gross=gross, taxes=taxes,
+        products=((product_id, product_quantity[product_id], product_cents[product_id])
+                  for product_id in sorted(product_quantity)),
+        hours=zip(range(24), hour_orders, hour_cents))
+
+
+def make_report(columns, orders, items, revenue, gross, taxes, products, hours):
+    # Plain dict report shared by both implementations
+    return {
+        "orders": orders,
+        "items": items,
+        "revenue_cents": revenue,
+        "iva_cents": sum(taxes.values()),
+        # (tax class, gross_cents, base_cents, tax_cents) for the classes with sales, highest rate first
+        "taxes": [(TAX_CLASSES[code], gross[code], gross[code] - taxes[code], taxes[code])
+                  for code in sorted(gross, key=lambda code: -TAX_CLASSES[code].rate_bp) if gross[code]],
+        "basket_items": items / orders if orders else 0.0,
+        "basket_cents": revenue / orders if orders else 0.0,
+        # (product_id, name, quantity, revenue_cents), best sellers first
+        "products": sorted(((product_id, columns.names.get(product_id, "?"), quantity, cents)
+                            for product_id, quantity, cents in products), key=lambda row: -row[3]),
+        # (hour of day, orders, revenue_cents) for the hours with sales
+        "hours": [row for row in hours if row[1]],
+    }
+
+
+def write_csv(report, directory):
+    # Write products.csv, hours.csv and taxes.csv into a directory
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "products.csv"), "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["product_id", "name", "quantity", "revenue"])
+        for product_id, name, quantity, cents in report["products"]:
+            writer.writerow([product_id, name, quantity, format_cents(cents)])
+    with open(os.path.join(directory, "hours.csv"), "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["hour", "orders", "revenue"])
+        for hour, orders, cents in report["hours"]:
+            writer.writerow([f"{hour:02d}:00", orders, format_cents(cents)])
+    with open(os.path.join(directory, "taxes.csv"), "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["tax_class", "rate", "gross", "base", "tax"])
+        for tax, gross, base, amount in report["taxes"]:
+            writer.writerow([tax.code, f"{tax.rate_bp / 100:.2f}", format_cents(gross), format_cents(base),
+                             format_cents(amount)])
+
+
+def format_summary(report, period, width=40):
+    # Printable report laid out like the printed receipts
+    separator = "-" * width
+    lines = [f"COFFEE PALACE - SALES {period}", separator]
+    for _, name, quantity, cents in report["products"]:
+        lines.append(f"{name} x {quantity} - €{format_cents(cents)}")
+    lines.append(separator)
+    for hour, orders, cents in report["hours"]:
+        lines.append(f"{hour:02d}:00 - {orders} orders - €{format_cents(cents)}")
+    lines.append(separator)
+    lines.append(f"Orders: {report['orders']}")
+    lines.append(f"Average basket: {report['basket_items']:.2f} items, €{format_cents(round(report['basket_cents']))}")
+    for tax, gross, base, amount in report["taxes"]:
+        lines.append(f"{tax.label} on €{format_cents(base)}: €{format_cents(amount)}")
+    lines.append(f"IVA included: €{format_cents(report['iva_cents'])}")
+    lines.append(f"TOTAL: €{format_cents(report['revenue_cents'])}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-of-day sales report from the journal or the sales database")
+    parser.add_argument("source", help="sales.journal or sales.db")
+    parser.add_argument("--day", help="report one day, YYYY-MM-DD (default: today)")
+    parser.add_argument("--from", dest="first", help="first day of a longer report, YYYY-MM-DD")
+    parser.add_argument("--to", dest="last", help="last day of a longer report, YYYY-MM-DD")
+    parser.add_argument("--all", action="store_true", help="report every order in the source")
+    parser.add_argument("--csv", metavar="DIR", help="also write products.csv, hours.csv and taxes.csv to DIR")
+    args = parser.parse_args()
+
+    if args.source.endswith(".db"):
+        columns = SalesColumns.from_sales_db(args.source)
+    else:
+        columns = SalesColumns.from_journal(args.source)
+    if args.all:
+        start = end = None
+        period = "ALL"
+    elif args.first or args.last:
+        first = args.first or args.last
+        last = args.last or args.first
+        start, end = day_bounds(first, last)
+        period = f"{first} TO {last}"
+    else:
+        day = args.day or time.strftime("%Y-%m-%d")
+        start, end = day_bounds(day, day)
+        period = day
+    report = summarize(columns, start, end)
+    print(format_summary(report, period))
+    if args.csv:
+        write_csv(report, args.csv)
+        print(f"CSV written to {args.csv}", file=sys.stderr)
@@ -0,0 +1,288 @@
+import bisect
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from cashier import Receipt
+from journal import repair, replay
+
+# zstd compresses receipts better and faster when the zstandard package is installed; zlib is always there
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+_STOP = object()
+
+log = logging.getLogger(__name__)
+
+
+def segment_name(timestamp):
+    # Segment file a block goes to, by the month its first receipt was paid in, e.g. "2024-03"
+    return time.strftime("%Y-%m", time.localtime(timestamp))
+
+
+def record_lines(records):
+    # Records as JSON lines
+    return b"".join(json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n" for record in records)
+
+
+def compress(data, codec):
+    # Compress a block with "zstd" or "zlib"
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=19).compress(data)
+    return zlib.compress(data, 9)
+
+
+def decompress(data, codec):
+    # Decompress a block written by compress()
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("This archive has zstd blocks; install the zstandard package to read them.")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+class ReceiptArchive:
+    # Paid receipts kept for reprints, as compressed blocks of block_size receipt records appended to one segment
+    # file per month. Each block has one entry in the segment's index file with the order numbers and paid times
+    # it covers and where it is, so a reprint decompresses a single block, and the whole index of a year stays in
+    # memory. Receipts of the unfinished block are kept uncompressed in a tail file until the block is full.
+    # Records are stored rather than the printed text: they compress to about a fifth of the text's size and
+    # print the same receipt.
+    def __init__(self, directory, block_size=256, cached=64, codec=None):
+        # Initialize the archive in a directory and start its writer thread; cached is how many reprinted receipts
+        # are kept as text, and codec is "zstd" or "zlib", by default zstd when it is installed
+        self.directory = directory
+        self.block_size = block_size
+        self.codec = codec or ("zstd" if zstandard is not None else "zlib")
+        if self.codec == "zstd" and zstandard is None:
+            raise ValueError("The zstd codec needs the zstandard package.")
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        # Index entries in the order the blocks were written, with the paid time each block ends at, for bisect
+        self.entries = []
+        self.ends = []
+        self.load_index()
+        self.tail_path = os.path.join(directory, "tail.jsonl")
+        repair(self.tail_path)
+        self.block = list(replay(self.tail_path))
+        if self.block:
+            # Blocks may have been written without the tail being cut down before the till stopped; they start
+            # with the tail's first receipt
+            for position in range(len(self.entries) - 1, -1, -1):
+                if self.entries[position]["id"] == self.block[0]["id"]:
+                    del self.block[:sum(entry["count"] for entry in self.entries[position:])]
+                    self.write_tail(self.block)
+                    break
+        self.cache = OrderedDict()
+        self.cached = cached
+        self.pending = queue.Queue()
+        # Last write error, and how long the writer waits before trying again when no receipt comes first
+        self.error = None
+        self.retry_interval = 5.0
+        self.thread = threading.Thread(target=self.run, name="receipt-archive", daemon=True)
+        self.thread.start()
+
+    def load_index(self):
+        # Read the index of every segment and cut off a block written after its segment's last index entry
+        segments = sorted({name[:-4] for name in os.listdir(self.directory) if name.endswith((".idx", ".seg"))})
+        for segment in segments:
+            index_path = os.path.join(self.directory, f"{segment}.idx")
+            repair(index_path)
+            end = 0
+            for entry in replay(index_path):
+                entry["segment"] = segment
+                self.entries.append(entry)
+                self.ends.append(entry["to"])
+                end = entry["offset"] + entry["length"]
+            segment_path = os.path.join(self.directory, f"{segment}.seg")
+            if os.path.exists(segment_path) and os.path.getsize(segment_path) > end:
+                with open(segment_path, "rb+") as file:
+                    file.truncate(end)
+
+    def add_receipt(self, receipt):
+        # Cashier listener: archive a paid receipt
+        record = receipt.to_record()
+        # A reprint of this number now means this receipt
+        self.cache.pop(record["order"], None)
+        with self.lock:
+            self.block.append(record)
+        self.pending.put(None)
+
+    def run(self):
+        # Writer loop: append new records to the tail file, and compress a block whenever one is full
+        tail = open(self.tail_path, "ab")
+        # Records at the start of self.block that are already in the tail file
+        written = len(self.block)
+        rewrite = False
+        while True:
+            try:
+                stop = self.pending.get(timeout=self.retry_interval if self.error is not None else None) is _STOP
+            except queue.Empty:
+                stop = False
+            try:
+                if rewrite:
+                    # A failed append may have left half a line behind, so the tail is written again whole
+                    tail.close()
+                    with self.lock:
+                        written = len(self.block)
+                        unfinished = self.block[:]
+                    self.write_tail(unfinished)
+                    tail = open(self.tail_path, "ab")
+                    rewrite = False
+                with self.lock:
+                    new = self.block[written:]
+                if new:
+                    tail.write(record_lines(new))
+                    tail.flush()
+                    written += len(new)
+                if written >= self.block_size:
+                    while written >= self.block_size:
+                        with self.lock:
+                            full = self.block[:self.block_size]
+                        self.write_block(full)
+                        with self.lock:
+                            del self.block[:self.block_size]
+                        written -= self.block_size
+                    # The tail is cut down once all full blocks are written
+                    tail.close()
+                    with self.lock:
+                        unfinished = self.block[:written]
+                    self.write_tail(unfinished)
+                    tail = open(self.tail_path, "ab")
+                self.error = None
+            except OSError as error:
+                # The records stay in memory; the writer tries again after retry_interval, or sooner with the next
+                # receipt
+                self.error = error
+                rewrite = True
+            if stop:
+                tail.close()
+                return
+
+    def write_tail(self, records):
+        # Replace the tail file with the records of the unfinished block
+        temporary = f"{self.tail_path}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(record_lines(records))
+        os.replace(temporary, self.tail_path)
+
+    def write_block(self, records):
+        # Compress records into one block at the end of their segment and add it to the index
+        raw = b"\n".join(json.dumps(record, separators=(",", ":")).encode("utf-8") for record in records)
+        data = compress(raw, self.codec)
+        segment = segment_name(records[0]["closed"])
+        segment_path = os.path.join(self.directory, f"{segment}.seg")
+        with open(segment_path, "ab") as file:
+            offset = file.tell()
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        numbers = [record["order"] for record in records]
+        entry = {"first": min(numbers), "last": max(numbers), "from": records[0]["closed"],
+                 "to": records[-1]["closed"], "id": records[0]["id"], "offset": offset, "length": len(data),
+                 "raw": len(raw), "count": len(records), "codec": self.codec}
+        with open(os.path.join(self.directory, f"{segment}.idx"), "ab") as file:
+            file.write(json.dumps(entry, separators=(",", ":")).encode("utf-8") + b"\n")
+            file.flush()
+            os.fsync(file.fileno())
+        entry["segment"] = segment
+        with self.lock:
+            self.entries.append(entry)
+            self.ends.append(entry["to"])
+
+    def read_lines(self, entry):
+        # The records of one block as JSON lines
+        with open(os.path.join(self.directory, f"{entry['segment']}.seg"), "rb") as file:
+            file.seek(entry["offset"])
+            data = file.read(entry["length"])
+        return decompress(data, entry["codec"]).split(b"\n")
+
+    def read_block(self, entry):
+        # The records of one block
+        return [json.loads(line) for line in self.read_lines(entry)]
+
+    def find(self, number):
+        # Record of the most recent receipt with an order number, or None; numbering starts again when a till's
+        # journal is reset, so the blocks are searched from the newest
+        with self.lock:
+            for record in reversed(self.block):
+                if record["order"] == number:
+                    return record
+            entries = [entry for entry in reversed(self.entries) if entry["first"] <= number <= entry["last"]]
+        # Only the line with the number is parsed
+        key = f'"order":{number},'.encode("ascii")
+        for entry in entries:
+            for line in self.read_lines(entry):
+                if key in line:
+                    record = json.loads(line)
+                    if record["order"] == number:
+                        return record
+        return None
+
+    def between(self, start, end):
+        # Records of the receipts paid from start up to end, oldest first; only the blocks in the range are read
+        with self.lock:
+            first = bisect.bisect_left(self.ends, start)
+            entries = [entry for entry in self.entries[first:] if entry["from"] < end]
+            block = self.block[:]
+        records = []
+        for entry in entries:
+            records.extend(record for record in self.read_block(entry) if start <= record["closed"] < end)
+        records.extend(record for record in block if start <= record["closed"] < end)
+        return records
+
+    def reprint(self, number, template=None):
+        # Receipt text of an archived order, as printed when it was paid, or None; recent reprints are cached
+        text = self.cache.get(number) if template is None else None
+        if text is not None:
+            self.cache.move_to_end(number)
+            return text
+        record = self.find(number)
+        if record is None:
+            return None
+        text = Receipt.from_record(record).print_receipt(template, record["closed"])
+        if template is None:
+            self.cache[number] = text
+            if len(self.cache) > self.cached:
+                self.cache.popitem(last=False)
+        return text
+
+    def stats(self):
+        # (receipts, record bytes, stored bytes) of the compressed blocks
+        with self.lock:
+            entries = self.entries[:]
+        return (sum(entry["count"] for entry in entries), sum(entry["raw"] for entry in entries),
+                sum(entry["length"] for entry in entries))
+
+    def close(self):
+        # Write what is queued and stop the writer thread; the unfinished block stays in the tail file
+        self.pending.put(_STOP)
+        self.thread.join()
+        if self.error is not None:
+            with self.lock:
+                count = len(self.block)
+            log.error("Could not write the last receipts to %s; %d receipt(s) of the unfinished block may be "
+                      "missing from the archive: %s", self.directory, count, self.error)
+
+
+if __name__ == "__main__":
+    # Usage: python archive.py receipts ORDER_NUMBER - reprint a receipt; without a number, the archive size
+    archive = ReceiptArchive(sys.argv[1])
+    try:
+        if len(sys.argv) > 2:
+            text = archive.reprint(int(sys.argv[2]))
+            print(text if text is not None else f"Order {sys.argv[2]} is not in the archive.")
+        else:
+            count, raw, stored = archive.stats()
+            print(f"{count} receipts in blocks, {raw} bytes of records stored in {stored} bytes "
+                  f"({stored / raw if raw else 0:.1%}); {len(archive.block)} in the tail")
+    finally:
+        archive.close()
@@ -0,0 +1,73 @@
+# Sales report time over synthetic columns of growing size, with NumPy when installed and with the plain loops
+import os
+import random
+import sys
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics
+from analytics import SalesColumns, summarize_python
+from tax import TAX_CLASSES
+
+
+def make_columns(orders, products=40, seed=1):
+    # About three lines per order over a year of opening hours; every fifth product is taxed at the general rate
+    rng = random.Random(seed)
+    columns = SalesColumns()
+    columns.names = {i: f"Product {i}" for i in range(products)}
+    start = time.mktime((2025, 1, 1, 8, 0, 0, 0, 0, -1))
+    closed = [start + (i * 365 // orders) * 86400 + rng.randrange(14 * 3600) for i in range(orders)]
+    line_order = array("q")
+    line_product = array("q")
+    line_quantity = array("q")
+    line_cents = array("q")
+    totals = array("q")
+    for order in range(orders):
+        gross = {"general": 0, "reduced": 0}
+        for _ in range(rng.randint(1, 5)):
+            product = rng.randrange(products)
+            quantity = rng.randint(1, 3)
+            cents = (100 + product * 25) * quantity
+            line_order.append(order)
+            line_product.append(product)
+            line_quantity.append(quantity)
+            line_cents.append(cents)
+            gross["general" if product % 5 == 0 else "reduced"] += cents
+        totals.append(sum(gross.values()))
+        columns.add_taxes([(code, TAX_CLASSES[code].rate_bp, cents, TAX_CLASSES[code].included(cents))
+                           for code, cents in gross.items() if cents])
+    columns.order_closed = array("d", closed)
+    columns.order_total = totals
+    columns.line_order = line_order
+    columns.line_product = line_product
+    columns.line_quantity = line_quantity
+    columns.line_cents = line_cents
+    return columns
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return (time.perf_counter() - start) * 1e3, result
+
+
+def run(sizes=(10000, 100000, 1000000)):
+    day_start, day_end = analytics.day_bounds("2025-06-01", "2025-06-01")
+    print(f"{'orders':>10}{'lines':>10}{'python ms':>12}{'numpy ms':>11}{'day ms':>9}")
+    for size in sizes:
+        columns = make_columns(size)
+        python_ms, expected = timed(lambda: summarize_python(columns, None, None))
+        if analytics.np is not None:
+            numpy_ms, report = timed(lambda: analytics.summarize_numpy(columns, None, None))
+            assert report == expected
+            numpy_text = f"{numpy_ms:>11.1f}"
+        else:
+            numpy_text = f"{'-':>11}"
+        day_ms, _ = timed(lambda: analytics.summarize(columns, day_start, day_end))
+        print(f"{size:>10}{len(columns.line_order):>10}{python_ms:>12.1f}{numpy_text}{day_ms:>9.1f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,77 @@
+# Receipt archive for a year of sales: size against the printed receipts, and reprint time cold and cached
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archive import ReceiptArchive
+from cashier import Receipt
+from catalog import Catalog
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def year_of_receipts(products, days, per_day):
+    # Paid receipts of 1-6 lines spread over the opening hours of each day, numbered in order
+    rng = random.Random(1)
+    start = time.mktime((2025, 1, 1, 8, 0, 0, 0, 0, -1))
+    number = 0
+    for day in range(days):
+        for closed in sorted(rng.uniform(0, 14 * 3600) for _ in range(per_day)):
+            receipt = Receipt(merge_lines=True)
+            for _ in range(rng.choice((1, 1, 2, 2, 3, 4, 6))):
+                receipt.add_item(rng.choice(products), rng.choice((1, 1, 1, 2, 3)))
+            number += 1
+            receipt.order_number = number
+            receipt.order_id = uuid.UUID(int=rng.getrandbits(128)).hex
+            receipt.till = "till-bench"
+            receipt.opened_at = start + day * 86400 + closed - 90
+            receipt.closed_at = start + day * 86400 + closed
+            receipt.paid_cents = -(-receipt.total_cents // 500) * 500
+            yield receipt
+
+
+def run(days=365, per_day=300, reprints=2000):
+    products = Catalog(os.path.join(ROOT, "products.json"), cache=False).products
+    with tempfile.TemporaryDirectory() as directory:
+        archive = ReceiptArchive(directory)
+        text_bytes = 0
+        start = time.perf_counter()
+        for receipt in year_of_receipts(products, days, per_day):
+            text_bytes += len(receipt.print_receipt(when=receipt.closed_at).encode("utf-8"))
+            archive.add_receipt(receipt)
+        archive.close()
+        written = time.perf_counter() - start
+        count, raw, stored = archive.stats()
+        on_disk = sum(entry.stat().st_size for entry in os.scandir(directory))
+        print(f"{count} receipts in blocks, written in {written:.1f} s ({archive.codec})")
+        print(f"printed text {text_bytes / 1e6:.1f} MB, records {raw / 1e6:.1f} MB, "
+              f"archive on disk {on_disk / 1e6:.2f} MB ({on_disk / text_bytes:.1%} of the text)")
+
+        archive = ReceiptArchive(directory)
+        total = days * per_day
+        rng = random.Random(2)
+        numbers = [rng.randint(1, total) for _ in range(reprints)]
+        start = time.perf_counter()
+        for number in numbers:
+            archive.cache.clear()
+            assert archive.reprint(number) is not None
+        cold = (time.perf_counter() - start) / reprints
+        start = time.perf_counter()
+        for _ in range(reprints):
+            archive.reprint(numbers[-1])
+        cached = (time.perf_counter() - start) / reprints
+        start = time.perf_counter()
+        day = archive.between(archive.entries[100]["from"], archive.entries[100]["from"] + 86400)
+        between = time.perf_counter() - start
+        archive.close()
+        print(f"reprint cold {cold * 1e3:.2f} ms, cached {cached * 1e6:.2f} us; "
+              f"one day's {len(day)} receipts in {between * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    run()
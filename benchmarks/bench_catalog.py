@@ -0,0 +1,59 @@
+# Catalog start-up time: cold JSON and CSV parses, warm loads from the cache, and a hot reload of one price
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cashier import Cashier
+from catalog import Catalog
+
+
+def write_files(directory, size):
+    # Write the same synthetic catalog as JSON and CSV
+    items = [{"id": i, "name": f"Product {i:06d}", "price": round(0.50 + (i % 97) * 0.15, 2), "quantity": 100}
+             for i in range(size)]
+    json_path = os.path.join(directory, "catalog.json")
+    with open(json_path, "w") as file:
+        json.dump(items, file)
+    csv_path = os.path.join(directory, "catalog.csv")
+    with open(csv_path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=["id", "name", "price", "quantity"])
+        writer.writeheader()
+        writer.writerows(items)
+    return json_path, csv_path, items
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return (time.perf_counter() - start) * 1e3, result
+
+
+def run(sizes=(1000, 50000)):
+    print(f"{'products':>10}{'json cold ms':>14}{'csv cold ms':>13}{'cached ms':>11}{'+ menu ms':>11}{'reload ms':>11}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            json_path, csv_path, items = write_files(directory, size)
+            json_cold, _ = timed(lambda: Catalog(json_path, cache=False))
+            csv_cold, _ = timed(lambda: Catalog(csv_path, cache=False))
+            Catalog(json_path)
+            cached, catalog = timed(lambda: Catalog(json_path))
+            menu, cashier = timed(lambda: Cashier(catalog.products).display_menu() and None)
+
+            # Change one price and let the running catalog pick it up
+            cashier = Cashier(catalog.products)
+            cashier.display_menu()
+            items[size // 2]["price"] += 1
+            with open(json_path, "w") as file:
+                json.dump(items, file)
+            reload, (changed, added) = timed(lambda: catalog.reload(cashier))
+            assert changed == [size // 2] and not added
+        print(f"{size:>10}{json_cold:>14.1f}{csv_cold:>13.1f}{cached:>11.1f}{cached + menu:>11.1f}{reload:>11.1f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,62 @@
+# Change-making time per payment on random drawers, with the fewest-pieces answers checked against a plain DP
+import gc
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from change import DENOMINATIONS, CashDrawer, fewest_pieces
+
+
+def plain_fewest(state, amount):
+    # Bounded coin change over every amount, one piece at a time; slow but obviously right
+    impossible = amount + 1
+    pieces = [0] + [impossible] * amount
+    for cents, count in zip(DENOMINATIONS, state):
+        for _ in range(count):
+            for value in range(amount, cents - 1, -1):
+                if pieces[value - cents] + 1 < pieces[value]:
+                    pieces[value] = pieces[value - cents] + 1
+    return None if pieces[amount] == impossible else pieces[amount]
+
+
+def check(cases=300, seed=1):
+    # Small drawers, where the greedy answer is often wrong or missing
+    rng = random.Random(seed)
+    for _ in range(cases):
+        state = (0, 0, 0, 0) + tuple(rng.choice((0, 0, 1, 2, 3, 5)) for _ in DENOMINATIONS[4:])
+        amount = rng.randrange(3000)
+        counts = fewest_pieces(state, amount, {})
+        expected = plain_fewest(state, amount)
+        if counts is None:
+            assert expected is None, (state, amount)
+        else:
+            assert sum(cents * count for cents, count in counts.items()) == amount
+            assert sum(counts.values()) == expected, (state, amount, counts)
+
+
+def run(payments=5000, seed=2):
+    check()
+    rng = random.Random(seed)
+    gc.disable()
+    print(f"{'coins per slot':>15}{'p50 us':>9}{'p99 us':>9}{'max us':>9}{'no change':>11}")
+    for most in (5, 40, 200):
+        times = []
+        missing = 0
+        for _ in range(payments):
+            drawer = CashDrawer({cents: rng.randint(0, most) for cents in DENOMINATIONS[3:]})
+            payment = rng.randrange(100, 20000)
+            start = time.perf_counter()
+            plan = drawer.plan_payment(payment, payment - rng.randrange(1, payment))
+            times.append((time.perf_counter() - start) * 1e6)
+            missing += plan is None
+        times.sort()
+        print(f"{most:>15}{times[len(times) // 2]:>9.0f}{times[len(times) * 99 // 100]:>9.0f}{times[-1]:>9.0f}"
+              f"{missing:>11}")
+    gc.enable()
+
+
+if __name__ == "__main__":
+    run()
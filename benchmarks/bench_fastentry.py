@@ -0,0 +1,37 @@
+# Time per key in the fast-entry code buffer, and per Enter that takes the order, by menu size
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cashier import Cashier, Product
+from fastentry import FastEntry
+
+
+def run(sizes=(20, 1000, 100000), orders=20000):
+    print(f"{'menu':>8}{'key us':>10}{'enter us':>10}")
+    for size in sizes:
+        products = [Product(f"Product {i}", 1.00 + (i % 50) * 0.10, 10 ** 9, i) for i in range(size)]
+        cashier = Cashier(products)
+        entry = FastEntry(cashier)
+        typed = [f"3*{(i * 7919) % size}" if i % 4 == 0 else str((i * 7919) % size) for i in range(orders)]
+        keys = enter = 0.0
+        count = 0
+        for number, text in enumerate(typed):
+            if not number % 100:
+                cashier.start_new_order()
+            start = time.perf_counter()
+            for char in text:
+                entry.key(char)
+            keys += time.perf_counter() - start
+            count += len(text)
+            start = time.perf_counter()
+            entry.key("Return")
+            enter += time.perf_counter() - start
+        assert entry.buffer == ""
+        print(f"{size:>8}{keys / count * 1e6:>10.2f}{enter / orders * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,73 @@
+# Startup time versus menu size: per-row listbox inserts vs the cached menu and one bulk insert
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tkinter as tk
+
+from cashier import Cashier, Product
+
+
+def make_listbox():
+    # A real Tk listbox when a display is available, otherwise a stand-in that keeps the rows
+    try:
+        root = tk.Tk()
+        root.withdraw()
+        return root, tk.Listbox(root)
+    except tk.TclError:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from bench_order_display import CountingListbox
+        return None, CountingListbox()
+
+
+def old_menu(products):
+    # The previous display_menu: format every row on every call
+    menu_items = []
+    for i, product in enumerate(products):
+        menu_items.append("{}. {} - €{:.2f}".format(i + 1, product.name, product.price))
+    return menu_items
+
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return (time.perf_counter() - start) * 1e3
+
+
+def run(sizes=(100, 2000, 20000)):
+    root, listbox = make_listbox()
+    if root is None:
+        print("No display: listbox calls go to an in-memory stand-in, so only Python-side time is measured")
+    print(f"{'menu':>8}{'old startup ms':>16}{'new startup ms':>16}{'cached menu ms':>16}{'1 price change ms':>19}")
+    for size in sizes:
+        products = [Product(f"Product {i}", 1.00 + (i % 50) * 0.10, 10) for i in range(size)]
+
+        def old_startup():
+            listbox.delete(0, tk.END)
+            for item in old_menu(products):
+                listbox.insert(tk.END, item)
+
+        cashier = Cashier(products)
+
+        def new_startup():
+            listbox.delete(0, tk.END)
+            listbox.insert(tk.END, *cashier.display_menu())
+
+        def change_price():
+            cashier.update_product(size // 2, price=2.75)
+            listbox.delete(size // 2)
+            listbox.insert(size // 2, cashier.display_menu()[size // 2])
+
+        old = timed(old_startup)
+        new = timed(new_startup)
+        cached = timed(cashier.display_menu)
+        change = timed(change_price)
+        print(f"{size:>8}{old:>16.2f}{new:>16.2f}{cached:>16.4f}{change:>19.4f}")
+    if root is not None:
+        root.destroy()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,52 @@
+# Cost of the opt-in latency histograms: order throughput with and without instrumentation, and percentile error
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cashier import Cashier, Product
+from metrics import Histogram, Metrics
+
+
+def order_cycle(cashier, lines=100):
+    # Take and remove a batch of lines
+    for i in range(lines):
+        cashier.take_order(i % len(cashier.products), 1)
+    for _ in range(lines):
+        cashier.remove_item(len(cashier.receipt.items) - 1)
+
+
+def run(repeat=5):
+    products = [Product(f"Product {i}", 1.00 + i * 0.25, 10 ** 9, i) for i in range(20)]
+    cashier = Cashier(products)
+    cashier.start_new_order()
+    plain = min(timeit.repeat(lambda: order_cycle(cashier), number=20, repeat=repeat))
+    metrics = Metrics()
+    metrics.instrument()
+    instrumented = min(timeit.repeat(lambda: order_cycle(cashier), number=20, repeat=repeat))
+    metrics.restore()
+    restored = min(timeit.repeat(lambda: order_cycle(cashier), number=20, repeat=repeat))
+    ops = 20 * 200
+    print(f"{'':<16}{'ops/s':>12}{'ns/op':>10}")
+    for name, elapsed in (("disabled", plain), ("instrumented", instrumented), ("restored", restored)):
+        print(f"{name:<16}{ops / elapsed:>12,.0f}{elapsed / ops * 1e9:>10.0f}")
+
+    # Percentiles from the histogram against the exact ones from sorted samples
+    rng = random.Random(1)
+    samples = [int(rng.lognormvariate(10, 1.5)) for _ in range(200000)]
+    histogram = Histogram()
+    record_time = timeit.timeit(lambda: [histogram.record(value) for value in samples], number=1)
+    samples.sort()
+    print(f"record: {record_time / len(samples) * 1e9:.0f} ns per value")
+    for percent in (50, 90, 99, 99.9):
+        exact = samples[int(len(samples) * percent / 100) - 1]
+        estimate = histogram.percentile(percent)
+        print(f"p{percent:<5} exact {exact:>12,} ns  histogram {estimate:>12,} ns  error {estimate / exact - 1:+.2%}")
+    print(metrics.summary()[0])
+    print("\n".join(metrics.summary()[1:]))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,76 @@
+# Headless harness: counts Tk listbox calls per add/remove for the old full redraw and OrderListView
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tkinter as tk
+
+from cashier import Cashier, Product
+from orderview import OrderListView
+
+
+class CountingListbox:
+    # Stand-in for tk.Listbox that keeps the rows in a list and counts every call
+    def __init__(self):
+        self.rows = []
+        self.calls = 0
+
+    def insert(self, index, *elements):
+        self.calls += 1
+        if index == tk.END:
+            self.rows.extend(elements)
+        else:
+            self.rows[index:index] = elements
+
+    def delete(self, first, last=None):
+        self.calls += 1
+        if last == tk.END:
+            del self.rows[first:]
+        elif last is not None:
+            del self.rows[first:last + 1]
+        else:
+            del self.rows[first]
+
+
+def full_redraw(listbox, receipt):
+    # The previous update_order_display: clear the listbox and insert every line again
+    listbox.delete(0, tk.END)
+    for index in range(len(receipt.items)):
+        listbox.insert(tk.END, receipt.line_text(index))
+
+
+def run(sizes=(10, 100, 1000)):
+    products = [Product(f"Product {i}", 1.00 + i * 0.25, 100) for i in range(20)]
+    print(f"{'lines':>8}{'redraw calls/op':>18}{'view calls/op':>16}")
+    for size in sizes:
+        results = []
+        for incremental in (False, True):
+            cashier = Cashier(products)
+            cashier.start_new_order()
+            listbox = CountingListbox()
+            view = OrderListView(listbox)
+            if incremental:
+                view.attach(cashier.receipt)
+            for i in range(size):
+                cashier.take_order(i % len(products), 1)
+                if not incremental:
+                    full_redraw(listbox, cashier.receipt)
+            listbox.calls = 0
+            # Measure a mix of adds and removes on an already long receipt
+            for i in range(size):
+                if i % 2:
+                    cashier.remove_item(i % len(cashier.receipt.items))
+                else:
+                    cashier.take_order(i % len(products), 2)
+                if not incremental:
+                    full_redraw(listbox, cashier.receipt)
+            expected = [cashier.receipt.line_text(i) for i in range(len(cashier.receipt.items))]
+            assert listbox.rows == expected, "listbox rows out of sync with the receipt"
+            results.append(listbox.calls / size)
+            view.detach()
+        print(f"{size:>8}{results[0]:>18.1f}{results[1]:>16.1f}")
+
+
+if __name__ == "__main__":
+    run()
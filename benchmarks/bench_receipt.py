@@ -0,0 +1,85 @@
+# Microbenchmark: columnar Receipt vs the old dict-per-line Receipt
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cashier import Product, Receipt
+
+
+class DictReceipt:
+    # The previous Receipt implementation, kept here as the baseline
+    def __init__(self):
+        self.items = []
+        self.total = 0
+
+    def add_item(self, product, quantity):
+        item = {"name": product.name, "price": product.price, "quantity": quantity}
+        self.items.append(item)
+        self.total += product.price * quantity
+
+    def remove_item(self, index):
+        removed_item = self.items.pop(index)
+        self.total -= removed_item["price"] * removed_item["quantity"]
+
+
+def fill(receipt_class, products, lines):
+    # Build a receipt with the given number of lines
+    receipt = receipt_class()
+    for i in range(lines):
+        receipt.add_item(products[i % len(products)], 1 + i % 3)
+    return receipt
+
+
+def measure_memory(receipt_class, products, lines):
+    # Return the bytes allocated while building a receipt
+    tracemalloc.start()
+    receipt = fill(receipt_class, products, lines)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del receipt
+    return size
+
+
+def run(lines=500, repeat=5):
+    products = [Product(f"Product {i}", 1.10 + i * 0.35, 10, i) for i in range(20)]
+    print(f"{'':<14}{'add+remove/s':>16}{'bytes/line':>14}{'drift (cents)':>16}")
+    for name, receipt_class in (("dict-per-line", DictReceipt), ("columnar", Receipt)):
+        def cycle():
+            receipt = fill(receipt_class, products, lines)
+            for _ in range(lines):
+                receipt.remove_item(-1)
+
+        best = min(timeit.repeat(cycle, number=1, repeat=repeat))
+        ops = lines * 2 / best
+        per_line = measure_memory(receipt_class, products, lines) / lines
+
+        # Empty a long tab from the front and see how far the total ends up from zero
+        receipt = fill(receipt_class, products, lines * 20)
+        while receipt.items:
+            receipt.remove_item(0)
+        drift = abs(receipt.total) * 100
+        print(f"{name:<14}{ops:>16,.0f}{per_line:>14.1f}{drift:>16.2e}")
+
+    # With merge_lines every product has one line, found through a product id to line map; removing a line only
+    # updates the entries of the lines after it
+    distinct = [Product(f"Product {i}", 1.10 + i * 0.35, 10, i) for i in range(lines)]
+    print(f"\n{'merge_lines':<14}{'removes/s':>16}")
+    for name, position in (("last line", -1), ("middle line", lines // 2), ("first line", 0)):
+        def empty():
+            receipt = Receipt(merge_lines=True)
+            for product in distinct:
+                receipt.add_item(product, 1)
+            start = timeit.default_timer()
+            while receipt.items:
+                receipt.remove_item(position if position < len(receipt.items) else -1)
+            return timeit.default_timer() - start
+
+        best = min(empty() for _ in range(repeat))
+        print(f"{name:<14}{lines / best:>16,.0f}")
+
+
+if __name__ == "__main__":
+    run()
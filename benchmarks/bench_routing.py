@@ -0,0 +1,42 @@
+# Cost of sending an order to the stations and of a screen taking the next ticket, by tickets waiting per station
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cashier import Cashier, Product
+from routing import Router
+
+
+def run(waiting=(100, 1000, 10000, 100000), orders=2000):
+    products = [Product(f"Product {i}", 1.00 + i * 0.25, 10 ** 9, i, station=("bar", "kitchen")[i % 2],
+                        prep_seconds=30 * (i + 1)) for i in range(20)]
+    cashier = Cashier(products)
+    print(f"{'waiting':>8}{'route us':>10}{'next us':>10}")
+    for count in waiting:
+        router = Router(cashier)
+        cashier.start_new_order()
+        receipts = []
+        for i in range(count + orders):
+            cashier.start_new_order()
+            cashier.take_order(i % len(products), 1)
+            cashier.take_order((i * 7 + 1) % len(products), 2)
+            receipts.append(cashier.receipt)
+        for receipt in receipts[:count]:
+            router.route(receipt)
+        start = time.perf_counter()
+        for receipt in receipts[count:]:
+            router.route(receipt)
+        route = time.perf_counter() - start
+        taken = 0
+        start = time.perf_counter()
+        for i in range(orders):
+            taken += router.next(("bar", "kitchen")[i % 2], timeout=0) is not None
+        take = time.perf_counter() - start
+        assert taken == orders
+        print(f"{count:>8}{route / orders * 1e6:>10.2f}{take / orders * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,47 @@
+# Cost of open-order snapshots per edit, by receipt length: time on the till thread, and total time until the
+# writer thread has saved every edit
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cashier import Cashier, Product
+from snapshots import OrderSnapshots, load_open_orders
+
+
+def edit(cashier, edits):
+    # Add a line at the end of the receipt, then remove it again
+    for i in range(edits):
+        cashier.take_order(i % len(cashier.products), 1)
+        cashier.remove_item(len(cashier.receipt.items) - 1)
+
+
+def run(lengths=(10, 100, 1000, 10000), edits=2000):
+    products = [Product(f"Product {i}", 1.00 + i * 0.25, 10 ** 9, i) for i in range(20)]
+    print(f"{'lines':>8}{'plain us':>10}{'till us':>10}{'saved us':>10}")
+    for length in lengths:
+        cashier = Cashier(products)
+        cashier.start_new_order()
+        for i in range(length):
+            cashier.take_order(i % len(products), 1)
+        start = time.perf_counter()
+        edit(cashier, edits)
+        plain = time.perf_counter() - start
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "open-order.snap")
+            snapshots = OrderSnapshots(path, interval=0.01, sync=False)
+            snapshots.attach(None, cashier.receipt)
+            start = time.perf_counter()
+            edit(cashier, edits)
+            till = time.perf_counter() - start
+            snapshots.close()
+            saved = time.perf_counter() - start
+            assert len(load_open_orders(path)[0]["lines"]) == length
+        count = 2 * edits
+        print(f"{length:>8}{plain / count * 1e6:>10.2f}{till / count * 1e6:>10.2f}{saved / count * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    run()
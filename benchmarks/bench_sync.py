@@ -0,0 +1,48 @@
+# Cost of one sync round with a few new orders, by how many batches the other till has written before
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cashier import Cashier, Product
+from inventory import Inventory
+from sync import TillSync
+
+
+def sell(cashier, sync, orders):
+    # Settle a few two-line orders, then write them out as one batch
+    for i in range(orders):
+        cashier.take_order(i % len(cashier.products), 1)
+        cashier.take_order((i + 3) % len(cashier.products), 2)
+        cashier.settle_order(10 ** 6)
+    sync.exchange()
+
+
+def run(histories=(0, 100, 1000, 10000), rounds=50, orders=5):
+    print(f"{'history':>8}{'round ms':>10}{'bytes':>8}")
+    for history in histories:
+        with tempfile.TemporaryDirectory() as work:
+            share = os.path.join(work, "share")
+            products = [Product(f"Product {i}", 1.00 + i * 0.25, 10 ** 9, i) for i in range(20)]
+            cashier = Cashier(products, inventory=Inventory(products), till="a")
+            sender = TillSync(share, "a", os.path.join(work, "a"))
+            cashier.subscribe(sender.record_receipt)
+            cashier.start_new_order()
+            receiver = TillSync(share, "b", os.path.join(work, "b"), Inventory(products))
+            for _ in range(history):
+                sell(cashier, sender, 1)
+            receiver.sync()
+            elapsed = 0
+            for _ in range(rounds):
+                sell(cashier, sender, orders)
+                start = time.perf_counter()
+                assert len(receiver.sync()) == orders
+                elapsed += time.perf_counter() - start
+            size = os.path.getsize(os.path.join(share, "a", sorted(os.listdir(os.path.join(share, "a")))[-1]))
+        print(f"{history:>8}{elapsed / rounds * 1e3:>10.3f}{size:>8}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,44 @@
+# Open tabs: memory per tab, and the time to switch tabs and move lines between them, as the number of tabs grows
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cashier import Cashier, Product
+from tabs import TabManager
+
+
+def run(counts=(10, 100, 500), lines=5, switches=20000):
+    products = [Product(f"Product {i}", 1.00 + i * 0.25, 10 ** 9, i) for i in range(20)]
+    print(f"{'tabs':>6}{'bytes/tab':>11}{'switch us':>11}{'move us':>9}")
+    for count in counts:
+        cashier = Cashier(products, merge_lines=True)
+        tracemalloc.start()
+        tabs = TabManager(cashier)
+        before = tracemalloc.get_traced_memory()[0]
+        for tab in range(count):
+            tabs.switch(tab)
+            for i in range(lines):
+                cashier.take_order((tab + i) % len(products), 1)
+        per_tab = (tracemalloc.get_traced_memory()[0] - before) / count
+        tracemalloc.stop()
+
+        start = time.perf_counter()
+        for i in range(switches):
+            tabs.switch(i % count)
+        switch = (time.perf_counter() - start) / switches
+
+        # Move a line to the next tab and back again
+        start = time.perf_counter()
+        for i in range(switches // 2):
+            tab = i % count
+            tabs.move_line(tab, 0, (tab + 1) % count, 1)
+            tabs.move_line((tab + 1) % count, -1, tab, 1)
+        move = (time.perf_counter() - start) / switches
+        print(f"{count:>6}{per_tab:>11.0f}{switch * 1e6:>11.2f}{move * 1e6:>9.2f}")
+
+
+if __name__ == "__main__":
+    run()
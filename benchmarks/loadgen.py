@@ -0,0 +1,89 @@
+# Load generator for server.py: many concurrent order sessions, p50/p99 latency per operation
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cashier import Product
+from client import AsyncCashierClient
+from inventory import Inventory
+from server import CashierServer
+
+
+def percentile(samples, fraction):
+    # Nearest-rank percentile of a sorted list
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+async def till(client, orders, lines, menu_size, latencies):
+    # One till: open a session and ring up orders, timing every request
+    session = await client.call("open")
+    for _ in range(orders):
+        for _ in range(lines):
+            start = time.perf_counter()
+            await client.call("take_order", session, random.randrange(menu_size), random.randint(1, 3))
+            latencies["take_order"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        await client.call("remove_item", session, 0)
+        latencies["remove_item"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        await client.call("complete_order", session)
+        await client.call("settle_order", session, 10 ** 9)
+        latencies["complete_order"].append(time.perf_counter() - start)
+    await client.call("close", session)
+
+
+async def run(args):
+    server = None
+    if args.connect is None and args.unix is None:
+        # No server given: run one in this process on a free port
+        products = [Product(f"Product {i}", 1.00 + (i % 40) * 0.25, 10 ** 9, i) for i in range(args.menu)]
+        inventory = Inventory(products, args.stock, "loadgen") if args.stock else None
+        cashier_server = CashierServer(products, inventory, merge_lines=True)
+        server = await cashier_server.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        menu_size = args.menu
+    else:
+        port = args.connect
+        menu_size = None
+    connections = [await AsyncCashierClient.connect(port=port, path=args.unix) for _ in range(args.connections)]
+    if menu_size is None:
+        menu_size = len(await connections[0].call("menu"))
+    latencies = {"take_order": [], "remove_item": [], "complete_order": []}
+    start = time.perf_counter()
+    await asyncio.gather(*(till(connections[i % len(connections)], args.orders, args.lines, menu_size, latencies)
+                           for i in range(args.sessions)))
+    elapsed = time.perf_counter() - start
+    requests = sum(len(samples) for samples in latencies.values())
+    print(f"{args.sessions} sessions over {args.connections} connections, {requests / elapsed:,.0f} timed ops/s")
+    print(f"{'operation':<16}{'count':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, samples in latencies.items():
+        samples.sort()
+        print(f"{name:<16}{len(samples):>8}{percentile(samples, 0.50) * 1e3:>10.3f}{percentile(samples, 0.99) * 1e3:>10.3f}")
+    for client in connections:
+        await client.close()
+    if server is not None:
+        # Let the server's connection handlers see the disconnects before the loop shuts down
+        await asyncio.sleep(0.1)
+        server.close()
+        await server.wait_closed()
+        cashier_server.close()
+        if inventory is not None:
+            inventory.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drive a cashier server with concurrent order sessions")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--connections", type=int, default=20)
+    parser.add_argument("--orders", type=int, default=5, help="orders per session")
+    parser.add_argument("--lines", type=int, default=5, help="lines per order")
+    parser.add_argument("--menu", type=int, default=100, help="menu size for the in-process server")
+    parser.add_argument("--stock", help="reserve stock in this database on the in-process server")
+    parser.add_argument("--connect", type=int, metavar="PORT", help="use a running server on this local port")
+    parser.add_argument("--unix", help="use a running server on this Unix socket")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,414 @@
+# Peak-hour simulator: runs the real CoffeeShopGUI and clicks through a stream of customers arriving at random
+# (Poisson arrivals, baskets drawn from a size distribution), timing every click from when it was made until its
+# callback returned, and how late the Tk event loop runs its timers. Uses the real Tk when a display is
+# available, e.g. under xvfb-run, and otherwise in-memory stand-ins for the widgets that keep the same rows.
+#
+#   python benchmarks/peak_sim.py --rate 0.5 --duration 120                    lunch rush, one customer per 2 s
+#   python benchmarks/peak_sim.py --basket 1000:1 --rate 0.01 --click 0 --duration 1   one 1,000-line receipt
+#   python benchmarks/peak_sim.py --keys --click 150                          keyboard entry with product codes
+import argparse
+import heapq
+import itertools
+import os
+import random
+import sys
+import time
+import tkinter as tk
+import traceback
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import guichange
+from cashier import format_cents
+from catalog import Catalog
+from inventory import Inventory
+
+
+class StubRoot:
+    # Stand-in for tk.Tk: a timer queue run by mainloop() in real time, like Tk's after()
+    def __init__(self):
+        self.timers = []
+        self.cancelled = set()
+        self.ids = itertools.count()
+        self.running = False
+
+    def title(self, text):
+        pass
+
+    def geometry(self, size):
+        pass
+
+    def resizable(self, width, height):
+        pass
+
+    def withdraw(self):
+        pass
+
+    def bell(self):
+        pass
+
+    def after(self, ms, function, *args):
+        timer_id = next(self.ids)
+        heapq.heappush(self.timers, (time.perf_counter() + ms / 1000, timer_id, function, args))
+        return timer_id
+
+    def after_cancel(self, timer_id):
+        self.cancelled.add(timer_id)
+
+    def report_callback_exception(self, exc_type, exc, tb):
+        traceback.print_exception(exc_type, exc, tb)
+
+    def mainloop(self):
+        self.running = True
+        while self.running and self.timers:
+            due, timer_id, function, args = heapq.heappop(self.timers)
+            if timer_id in self.cancelled:
+                self.cancelled.discard(timer_id)
+                continue
+            wait = due - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                function(*args)
+            except Exception as error:
+                self.report_callback_exception(type(error), error, error.__traceback__)
+
+    def quit(self):
+        self.running = False
+
+    def destroy(self):
+        self.timers = []
+
+
+class StubWidget:
+    # Stand-in for frames, labels and styles: accepts and keeps options, draws nothing
+    def __init__(self, master=None, **options):
+        self.options = options
+
+    def pack(self, **options):
+        pass
+
+    def bind(self, sequence, function):
+        pass
+
+    def config(self, **options):
+        self.options.update(options)
+
+    configure = config
+
+
+class StubStyle:
+    # Stand-in for ttk.Style
+    def configure(self, style, **options):
+        pass
+
+
+class StubListbox(StubWidget):
+    # Stand-in for tk.Listbox that keeps the rows and the selection
+    def __init__(self, master=None, **options):
+        super().__init__(master, **options)
+        self.rows = []
+        self.selected = ()
+
+    def index(self, index):
+        return len(self.rows) if index == tk.END else index
+
+    def insert(self, index, *elements):
+        index = self.index(index)
+        self.rows[index:index] = elements
+
+    def delete(self, first, last=None):
+        first = self.index(first)
+        last = first if last is None else self.index(last)
+        del self.rows[first:last + 1]
+
+    def size(self):
+        return len(self.rows)
+
+    def get(self, index):
+        return self.rows[index]
+
+    def curselection(self):
+        return self.selected
+
+    def selection_clear(self, first, last=None):
+        self.selected = ()
+
+    def selection_set(self, first, last=None):
+        self.selected = (first,)
+
+
+class StubEntry(StubWidget):
+    # Stand-in for ttk.Entry holding its text
+    def __init__(self, master=None, **options):
+        super().__init__(master, **options)
+        self.text = ""
+
+    def get(self):
+        return self.text
+
+    def delete(self, first, last=None):
+        self.text = ""
+
+    def insert(self, index, text):
+        self.text += text
+
+
+class StubButton(StubWidget):
+    # Stand-in for ttk.Button; invoke() runs its command like a click
+    def invoke(self):
+        return self.options["command"]()
+
+
+class StubStringVar:
+    # Stand-in for tk.StringVar that calls its write traces
+    def __init__(self, master=None, value=""):
+        self.value = value
+        self.traces = []
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+        for callback in self.traces:
+            callback("", "", "write")
+
+    def trace_add(self, mode, callback):
+        self.traces.append(callback)
+
+
+STUB_TK = SimpleNamespace(Tk=StubRoot, Frame=StubWidget, Listbox=StubListbox, StringVar=StubStringVar, END=tk.END,
+                          LEFT=tk.LEFT, RIGHT=tk.RIGHT, SINGLE=tk.SINGLE, GROOVE=tk.GROOVE)
+STUB_TTK = SimpleNamespace(Style=StubStyle, Label=StubWidget, Entry=StubEntry, Button=StubButton)
+
+
+class Dialogs:
+    # Replaces the message boxes, which would wait for a click, and counts them by title
+    def __init__(self):
+        self.shown = {}
+
+    def show(self, title, message):
+        self.shown[title] = self.shown.get(title, 0) + 1
+
+    showinfo = show
+    showwarning = show
+
+
+def make_root():
+    # A hidden real Tk window, or the stand-ins when there is no display; the GUI module then uses the stand-ins
+    try:
+        root = tk.Tk()
+        root.withdraw()
+        return root, False
+    except tk.TclError:
+        guichange.tk = STUB_TK
+        guichange.ttk = STUB_TTK
+        return StubRoot(), True
+
+
+def parse_basket(text):
+    # Basket sizes and their weights from "size:weight,...", e.g. "1:30,2:30,3:20,5:15,12:5"
+    sizes, weights = [], []
+    for part in text.split(","):
+        size, weight = part.split(":")
+        sizes.append(int(size))
+        weights.append(float(weight))
+    return sizes, weights
+
+
+def key_event(char):
+    # Key event as Tk passes it to a binding, for a typed character or a key name such as "Return"
+    keysym = {"*": "asterisk", ".": "period"}.get(char, char)
+    return SimpleNamespace(keysym=keysym, char=char if len(char) == 1 else "")
+
+
+def percentile(samples, fraction):
+    # Nearest-rank percentile of a sorted list
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+class PeakSimulator:
+    # Serves customers one at a time at the till, clicking through the GUI like a cashier: select a product, type
+    # the quantity and press Add to Order for each basket line, sometimes remove a line, then Complete Order and
+    # Calculate Change with the amount handed over
+    def __init__(self, root, app, args):
+        self.root = root
+        self.app = app
+        self.args = args
+        self.random = random.Random(args.seed)
+        self.sizes, self.weights = parse_basket(args.basket)
+        self.queue = []
+        self.busy = False
+        self.arrivals_end = None
+        # Per click name: ms from the click to the end of its callback
+        self.latencies = {}
+        self.loop_lag = []
+        self.waits = []
+        self.served = 0
+
+    def start(self):
+        # Schedule the first arrival and the event-loop heartbeat
+        self.arrivals_end = time.perf_counter() + self.args.duration
+        self.root.after(0, self.arrive)
+        self.heartbeat(time.perf_counter())
+
+    def heartbeat(self, expected):
+        # Measure how late a timer runs; a busy main loop delays every timer the same way
+        now = time.perf_counter()
+        self.loop_lag.append((now - expected) * 1000)
+        interval = self.args.heartbeat_ms
+        self.root.after(interval, self.heartbeat, now + interval / 1000)
+
+    def arrive(self):
+        # A customer joins the queue; the next one arrives after an exponentially distributed gap
+        now = time.perf_counter()
+        if now >= self.arrivals_end:
+            self.check_done()
+            return
+        self.queue.append(now)
+        self.root.after(int(self.random.expovariate(self.args.rate) * 1000), self.arrive)
+        if not self.busy:
+            self.serve_next()
+
+    def check_done(self):
+        # Stop the main loop once arrivals have ended and the queue is empty
+        if not self.busy and not self.queue and time.perf_counter() >= self.arrivals_end:
+            self.root.quit()
+
+    def serve_next(self):
+        # Start on the customer at the head of the queue
+        if not self.queue:
+            self.busy = False
+            self.check_done()
+            return
+        self.busy = True
+        arrived = self.queue.pop(0)
+        self.waits.append((time.perf_counter() - arrived) * 1000)
+        self.steps = self.customer_steps()
+        self.click_later()
+
+    def click_later(self):
+        # Schedule the next click after the cashier's think time
+        delay_ms = int(self.random.expovariate(1 / self.args.click)) if self.args.click else 0
+        self.root.after(delay_ms, self.click, time.perf_counter() + delay_ms / 1000)
+
+    def click(self, due):
+        # Run the next step of the current customer and time it from when the click was due
+        step = next(self.steps, None)
+        if step is None:
+            self.served += 1
+            self.serve_next()
+            return
+        name, action = step
+        action()
+        self.latencies.setdefault(name, []).append((time.perf_counter() - due) * 1000)
+        self.click_later()
+
+    def customer_steps(self):
+        # The clicks for one customer as (name, action); the entries are filled in before each click
+        if self.args.keys:
+            yield from self.key_steps()
+            return
+        app = self.app
+        lines = self.random.choices(self.sizes, self.weights)[0]
+        for _ in range(lines):
+            def add():
+                app.menu_listbox.selection_clear(0, tk.END)
+                app.menu_listbox.selection_set(self.random.randrange(app.menu_listbox.size()))
+                app.quantity_entry.delete(0, tk.END)
+                app.quantity_entry.insert(0, str(1 if self.random.random() < 0.8 else 2))
+                app.add_button.invoke()
+            yield "add_to_order", add
+        if lines > 1 and self.random.random() < self.args.remove:
+            def remove():
+                app.order_listbox.selection_clear(0, tk.END)
+                app.order_listbox.selection_set(self.random.randrange(len(app.cashier.receipt.items)))
+                app.remove_button.invoke()
+            yield "remove_item", remove
+        yield "complete_order", app.complete_order_button.invoke
+
+        def pay():
+            # Customers hand over the total rounded up to a whole euro
+            total = app.cashier.receipt.total_cents
+            app.payment_entry.delete(0, tk.END)
+            app.payment_entry.insert(0, format_cents(-(-total // 100) * 100))
+            app.calculate_change_button.invoke()
+        yield "calculate_change", pay
+
+    def key_steps(self):
+        # The keys for one customer in the code entry: quantity*code and Enter per line, Delete to drop a line,
+        # F9 to complete and the amount paid with F12
+        app = self.app
+        press = app.fast_key
+        lines = self.random.choices(self.sizes, self.weights)[0]
+        for _ in range(lines):
+            quantity = 1 if self.random.random() < 0.8 else 2
+            code = str(self.random.choice(app.cashier.products).product_id)
+            for char in (f"{quantity}*{code}" if quantity > 1 else code):
+                yield "fast_key", lambda char=char: press(key_event(char))
+            yield "fast_key enter", lambda: press(key_event("Return"))
+        if lines > 1 and self.random.random() < self.args.remove:
+            yield "fast_key remove", lambda: press(key_event("Delete"))
+        yield "fast_key complete", lambda: press(key_event("F9"))
+
+        def type_amount():
+            # Customers hand over the total rounded up to a whole euro
+            total = app.cashier.receipt.total_cents
+            for char in str(-(-total // 100)):
+                press(key_event(char))
+        yield "fast_key amount", type_amount
+        yield "fast_key pay", lambda: press(key_event("F12"))
+
+    def report(self):
+        # Latency percentiles per click and of the event-loop lag
+        print(f"{'click':<18}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        rows = [(name, samples) for name, samples in self.latencies.items()] + [("loop lag", self.loop_lag)]
+        for name, samples in rows:
+            samples = sorted(samples)
+            if samples:
+                print(f"{name:<18}{len(samples):>8}{percentile(samples, 0.5):>10.2f}{percentile(samples, 0.95):>10.2f}"
+                      f"{percentile(samples, 0.99):>10.2f}{samples[-1]:>10.2f}")
+        waits = sorted(self.waits)
+        if waits:
+            print(f"Customers served: {self.served}, queue wait p50 {percentile(waits, 0.5) / 1000:.1f} s, "
+                  f"max {waits[-1] / 1000:.1f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the till GUI with a simulated peak-hour customer stream")
+    parser.add_argument("--rate", type=float, default=0.5, help="customers arriving per second")
+    parser.add_argument("--duration", type=float, default=60, help="seconds during which customers arrive")
+    parser.add_argument("--basket", default="1:30,2:30,3:20,5:15,12:5", help="basket sizes as size:weight,...")
+    parser.add_argument("--click", type=float, default=300, help="mean ms between the cashier's clicks")
+    parser.add_argument("--keys", action="store_true", help="ring up orders with product codes in the code entry")
+    parser.add_argument("--remove", type=float, default=0.1, help="share of customers who drop a line")
+    parser.add_argument("--menu", default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                       "products.json"), help="catalog file")
+    parser.add_argument("--heartbeat-ms", type=int, default=10, help="event-loop lag sampling interval")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    root, stubbed = make_root()
+    if stubbed:
+        print("No display: widgets are in-memory stand-ins, so drawing time is not included")
+    dialogs = guichange.messagebox = Dialogs()
+    products = Catalog(args.menu, cache=False).products
+    # Enough stock for any rush, so every click goes through the same reserve path
+    for product in products:
+        product.quantity = 10 ** 9
+    app = guichange.CoffeeShopGUI(root, products, Inventory(products), "peak-sim")
+    simulator = PeakSimulator(root, app, args)
+    simulator.start()
+    root.mainloop()
+    app.scheduler.close()
+    simulator.report()
+    unexpected = {title: count for title, count in dialogs.shown.items() if title != "Change Calculation"}
+    if unexpected:
+        print(f"Unexpected dialogs: {unexpected}")
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
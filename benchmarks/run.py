@@ -0,0 +1,143 @@
+# Headless benchmark suite for the order pipeline; writes ops/sec and allocations per op as JSON
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cashier import Cashier, Product
+
+MENU_SIZES = (10, 1000, 100000)
+ORDER_SIZES = (1, 100, 10000)
+
+
+def make_menu(size):
+    # Synthetic menu with a spread of names and prices
+    return [Product(f"Product {i:06d}", 0.50 + (i % 97) * 0.15, 10 ** 6) for i in range(size)]
+
+
+def fill(cashier, lines):
+    # Start a new order on the cashier with the given number of lines
+    cashier.start_new_order()
+    size = len(cashier.products)
+    for i in range(lines):
+        cashier.take_order((i * 7919) % size, 1 + i % 3)
+
+
+def measure(cashier, reset, operation, ops, min_time):
+    # Time an operation (run `ops` times per call), resetting the cashier before each call, then count its allocations
+    elapsed = 0.0
+    calls = 0
+    deadline = time.perf_counter() + min_time * 5
+    gc.disable()
+    while elapsed < min_time and time.perf_counter() < deadline:
+        reset(cashier)
+        start = time.perf_counter()
+        operation(cashier)
+        elapsed += time.perf_counter() - start
+        calls += 1
+    gc.enable()
+    reset(cashier)
+    gc.collect()
+    blocks_before = sys.getallocatedblocks()
+    tracemalloc.start()
+    operation(cashier)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks_after = sys.getallocatedblocks()
+    return {
+        "ops_per_sec": calls * ops / elapsed,
+        "peak_bytes_per_op": peak / ops,
+        "net_blocks_per_op": (blocks_after - blocks_before) / ops,
+    }
+
+
+def cases(menu_sizes, order_sizes):
+    # Yield (name, parameters, cashier, reset, operation, ops per call) for every benchmark
+    for menu_size in menu_sizes:
+        cashier = Cashier(make_menu(menu_size))
+
+        def keep(cashier):
+            pass
+
+        def display_menu(cashier):
+            cashier.display_menu()
+
+        yield "display_menu", {"menu": menu_size}, cashier, keep, display_menu, 1
+
+        for lines in order_sizes:
+            params = {"menu": menu_size, "lines": lines}
+
+            def new_order(cashier):
+                cashier.start_new_order()
+
+            def filled(cashier, lines=lines):
+                fill(cashier, lines)
+
+            def take_order(cashier, lines=lines):
+                size = len(cashier.products)
+                for i in range(lines):
+                    cashier.take_order((i * 7919) % size, 1)
+
+            def remove_item(cashier, lines=lines):
+                for _ in range(lines):
+                    cashier.remove_item(len(cashier.receipt.items) - 1)
+
+            def print_receipt(cashier):
+                cashier.receipt.print_receipt()
+
+            yield "take_order", params, cashier, new_order, take_order, lines
+            yield "remove_item", params, cashier, filled, remove_item, lines
+            fill(cashier, lines)
+            yield "print_receipt", params, cashier, keep, print_receipt, 1
+
+
+def compare(results, baseline_path, tolerance):
+    # Print benchmarks that got slower than the baseline by more than the tolerance; return how many
+    with open(baseline_path) as file:
+        baseline = {(r["name"], json.dumps(r["params"], sort_keys=True)): r for r in json.load(file)["results"]}
+    regressions = 0
+    for result in results:
+        old = baseline.get((result["name"], json.dumps(result["params"], sort_keys=True)))
+        if old is None:
+            continue
+        ratio = result["ops_per_sec"] / old["ops_per_sec"]
+        if ratio < 1 - tolerance:
+            regressions += 1
+            print(f"REGRESSION {result['name']} {result['params']}: {ratio:.0%} of baseline ops/sec")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cashier order pipeline without a display")
+    parser.add_argument("--output", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.json"))
+    parser.add_argument("--quick", action="store_true", help="small menus and orders only")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds to run each benchmark")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the baseline")
+    args = parser.parse_args()
+
+    menu_sizes = MENU_SIZES[:2] if args.quick else MENU_SIZES
+    order_sizes = ORDER_SIZES[:2] if args.quick else ORDER_SIZES
+    results = []
+    print(f"{'benchmark':<16}{'params':<28}{'ops/sec':>14}{'bytes/op':>12}{'blocks/op':>11}")
+    for name, params, cashier, reset, operation, ops in cases(menu_sizes, order_sizes):
+        result = {"name": name, "params": params, **measure(cashier, reset, operation, ops, args.min_time)}
+        results.append(result)
+        print(f"{name:<16}{json.dumps(params):<28}{result['ops_per_sec']:>14,.0f}"
+              f"{result['peak_bytes_per_op']:>12.1f}{result['net_blocks_per_op']:>11.2f}")
+
+    with open(args.output, "w") as file:
+        json.dump({"python": platform.python_version(), "time": time.time(), "results": results}, file, indent=1)
+    print(f"Results written to {args.output}")
+    if args.baseline and compare(results, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+import time
+import uuid
+from array import array
+
+from money import to_cents, format_cents
+import receipttemplate
+from tax import DEFAULT_TAX_CLASS, TAX_CLASSES, breakdown, record_taxes, recorded_tax_lines
+
+
+def assign_product_ids(products):
+    # Give products without an id their position in the list as id; only for menus that are never stored by id
+    for i, product in enumerate(products):
+        if product.product_id is None:
+            product.product_id = i
+    if len({product.product_id for product in products}) != len(products):
+        raise ValueError("Product ids must be unique.")
+
+
+def require_product_ids(products):
+    # Stock and sales are stored by product id, so a position-based id would move to another product
+    # as soon as the menu list changes
+    if any(product.product_id is None for product in products):
+        raise ValueError("Products need explicit ids before they are stored by id.")
+
+
+class Product:
+    def __init__(self, name, price, quantity, product_id=None, tax_class=DEFAULT_TAX_CLASS, station=None,
+                 prep_seconds=0):
+        # Initialize a product with a name, price, quantity, the code of its tax class, and the prep station that
+        # makes it with its usual prep time; products without a station are handed over at the till
+        if tax_class not in TAX_CLASSES:
+            raise ValueError(f"Unknown tax class: {tax_class}")
+        self.name = name
+        self.price = price
+        self.quantity = quantity
+        self.product_id = product_id
+        self.price_cents = to_cents(price)
+        self.tax_class = tax_class
+        self.station = station
+        self.prep_seconds = prep_seconds
+
+
+class ReceiptLines:
+    # Columnar line store: one flat array per field instead of a dict per line
+    __slots__ = ("product_ids", "names", "prices", "quantities", "subtotals", "tax_classes", "appends", "pops")
+
+    def __init__(self):
+        # Initialize empty columns for product id, name, unit price, quantity, subtotal and tax class code
+        self.product_ids = array("q")
+        self.names = []
+        self.prices = array("q")
+        self.quantities = array("q")
+        self.subtotals = array("q")
+        self.tax_classes = []
+        # Bound append and pop methods of every column, looked up once instead of on each call
+        columns = (self.product_ids, self.names, self.prices, self.quantities, self.subtotals, self.tax_classes)
+        self.appends = tuple(column.append for column in columns)
+        self.pops = tuple(column.pop for column in columns)
+
+    def __len__(self):
+        return len(self.quantities)
+
+    def __iter__(self):
+        # Iterate over the lines as (product_id, name, price_cents, quantity, subtotal_cents, tax_class) tuples
+        return zip(self.product_ids, self.names, self.prices, self.quantities, self.subtotals, self.tax_classes)
+
+    def append(self, product_id, name, price_cents, quantity, tax_class=DEFAULT_TAX_CLASS):
+        # Append a line and return its subtotal in cents
+        subtotal = price_cents * quantity
+        append_id, append_name, append_price, append_quantity, append_subtotal, append_tax = self.appends
+        append_id(product_id)
+        append_name(name)
+        append_price(price_cents)
+        append_quantity(quantity)
+        append_subtotal(subtotal)
+        append_tax(tax_class)
+        return subtotal
+
+    def add_quantity(self, index, quantity):
+        # Change the quantity of a line in place and return the subtotal change in cents
+        delta = self.prices[index] * quantity
+        self.quantities[index] += quantity
+        self.subtotals[index] += delta
+        return delta
+
+    def pop(self, index=-1):
+        # Remove a line and return its subtotal in cents
+        pop_id, pop_name, pop_price, pop_quantity, pop_subtotal, pop_tax = self.pops
+        pop_id(index)
+        pop_name(index)
+        pop_price(index)
+        pop_quantity(index)
+        pop_tax(index)
+        return pop_subtotal(index)
+
+    def line(self, index):
+        # Return a single line as a tuple
+        return (self.product_ids[index], self.names[index], self.prices[index],
+                self.quantities[index], self.subtotals[index], self.tax_classes[index])
+
+
+class Receipt:
+    def __init__(self, merge_lines=False):
+        # Initialize a receipt with empty items and total
+        self.items = ReceiptLines()
+        self.total_cents = 0
+        # Gross cents per tax class code, kept up to date on every change so rendering never scans the lines
+        self.tax_gross = {}
+        self.listeners = []
+        # With merge_lines, repeat adds of a product bump its existing line instead of appending
+        self.merge_lines = merge_lines
+        self.line_index = {}
+        # Tab the receipt is kept under while other orders are served, e.g. a table number; None at the counter
+        self.tab = None
+        self.order_number = None
+        # Set on payment: the till that took the order and an id that is unique across tills and restarts
+        self.till = None
+        self.order_id = None
+        self.opened_at = time.time()
+        self.closed_at = None
+        self.paid_cents = 0
+        # Tax breakdown a paid receipt was recorded with, so a reprint shows the rates it was charged at
+        self.recorded_taxes = None
+
+    @property
+    def total(self):
+        # Total in euros, kept for callers that still work with floats
+        return self.total_cents / 100
+
+    @property
+    def iva_cents(self):
+        # IVA included in the total, summed over the tax classes
+        return sum(row[3] for row in breakdown(self.tax_gross))
+
+    def subscribe(self, listener):
+        # Register a callback called as listener(event, index) for "insert", "update" and "delete" events
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        # Stop sending change events to a callback
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def notify(self, event, index):
+        # Send a change event to every listener
+        for listener in self.listeners:
+            listener(event, index)
+
+    def add_item(self, product, quantity):
+        # Add an item to the receipt
+        product_id = product.product_id
+        if product_id is None:
+            product_id = -1
+        self.add_line(product_id, product.name, product.price_cents, quantity, product.tax_class)
+
+    def add_line(self, product_id, name, price_cents, quantity, tax_class=DEFAULT_TAX_CLASS):
+        # Add a line as it was rung up, e.g. from a record, a snapshot or another tab, keeping its price and tax class
+        if self.merge_lines:
+            index = self.line_index.get(product_id)
+            if index is not None:
+                delta = self.items.add_quantity(index, quantity)
+                self.total_cents += delta
+                code = self.items.tax_classes[index]
+                self.tax_gross[code] = self.tax_gross.get(code, 0) + delta
+                if self.listeners:
+                    self.notify("update", index)
+                return
+            self.line_index[product_id] = len(self.items)
+        subtotal = self.items.append(product_id, name, price_cents, quantity, tax_class)
+        self.total_cents += subtotal
+        self.tax_gross[tax_class] = self.tax_gross.get(tax_class, 0) + subtotal
+        if self.listeners:
+            self.notify("insert", len(self.items) - 1)
+
+    def remove_item(self, index, quantity=None):
+        # Remove an item from the receipt based on its index, or only some of its quantity
+        if quantity is not None:
+            if quantity <= 0:
+                raise ValueError("Quantity to remove must be greater than 0.")
+            if quantity < self.items.quantities[index]:
+                if index < 0:
+                    index += len(self.items)
+                delta = self.items.add_quantity(index, -quantity)
+                self.total_cents += delta
+                self.tax_gross[self.items.tax_classes[index]] += delta
+                if self.listeners:
+                    self.notify("update", index)
+                return
+        if index < 0 and (self.merge_lines or self.listeners):
+            index += len(self.items)
+        product_id = self.items.product_ids[index]
+        code = self.items.tax_classes[index]
+        subtotal = self.items.pop(index)
+        self.total_cents -= subtotal
+        self.tax_gross[code] -= subtotal
+        if self.merge_lines:
+            self.shift_lines(product_id, index)
+        if self.listeners:
+            self.notify("delete", index)
+
+    def split_item(self, index, quantity):
+        # Move part of a line's quantity onto a new line at the end of the receipt
+        if index < 0:
+            index += len(self.items)
+        if not 0 < quantity < self.items.quantities[index]:
+            raise ValueError("Split quantity must be smaller than the line quantity.")
+        items = self.items
+        items.add_quantity(index, -quantity)
+        items.append(items.product_ids[index], items.names[index], items.prices[index], quantity,
+                     items.tax_classes[index])
+        if self.listeners:
+            self.notify("update", index)
+            self.notify("insert", len(items) - 1)
+
+    def shift_lines(self, product_id, index):
+        # Update the product id to line map after the line of a product at index was removed; only the lines
+        # after it moved, so removing the last line costs nothing. A product whose first line was removed maps to
+        # its next line, if a split left it one.
+        line_index = self.line_index
+        if line_index.get(product_id) == index:
+            del line_index[product_id]
+        product_ids = self.items.product_ids
+        if index == len(product_ids):
+            return
+        if len(line_index) == len(product_ids):
+            # Each line is the only one of its product, as usual when lines merge: every later line moves up by one
+            line_index.update(zip(product_ids[index:], range(index, len(product_ids))))
+            return
+        get = line_index.get
+        for position, moved in enumerate(product_ids[index:], index):
+            first = get(moved)
+            if first == position + 1 or (first is None and moved == product_id):
+                line_index[moved] = position
+
+    def to_record(self):
+        # Convert a completed receipt to a plain dict for journals and stores
+        items = self.items
+        return {
+            "id": self.order_id,
+            "till": self.till,
+            "tab": self.tab,
+            "order": self.order_number,
+            "opened": self.opened_at,
+            "closed": self.closed_at,
+            "paid": self.paid_cents,
+            "total": self.total_cents,
+            "lines": [[product_id, name, price, quantity, code]
+                      for product_id, name, price, quantity, _, code in items],
+            "taxes": record_taxes(self.tax_gross),
+        }
+
+    @classmethod
+    def from_record(cls, record):
+        # Rebuild a receipt from a dict made by to_record
+        receipt = cls()
+        for line in record["lines"]:
+            # Lines written before tax classes have four fields; those receipts were all taxed at the general rate
+            receipt.add_line(*line)
+        receipt.order_number = record["order"]
+        receipt.order_id = record.get("id")
+        receipt.till = record.get("till")
+        receipt.tab = record.get("tab")
+        receipt.opened_at = record["opened"]
+        receipt.closed_at = record["closed"]
+        receipt.paid_cents = record["paid"]
+        receipt.recorded_taxes = record.get("taxes")
+        return receipt
+
+    def line_text(self, index):
+        # Format a single receipt line for display
+        items = self.items
+        return f"{items.names[index]} x {items.quantities[index]} - €{format_cents(items.subtotals[index])}"
+
+    def tax_lines(self):
+        # Tax rows for the printed receipt as (label, cents), one per tax class on the receipt; prices include IVA,
+        # so the rows are for information and do not affect the total
+        if self.recorded_taxes is not None:
+            return recorded_tax_lines(self.recorded_taxes)
+        return [(tax.label, amount) for tax, _, _, amount in breakdown(self.tax_gross)]
+
+    def print_receipt(self, template=None, when=None):
+        # Generate a receipt including date, items, IVA, and total; plain text unless another template is given
+        return (template or receipttemplate.TEXT).render(self, when)
+
+
+class Cashier:
+    def __init__(self, products, merge_lines=False, inventory=None, till=None, product_by_id=None):
+        # Initialize a cashier with a list of products and no current receipt; product_by_id is the id index of
+        # another cashier on the same products, e.g. one per server session, which then share it instead of each
+        # building their own
+        self.products = products
+        self.till = till
+        self.receipt = None
+        self.merge_lines = merge_lines
+        self.inventory = inventory
+        # Menu rows are cached and only the rows of changed products are formatted again
+        self.catalog_version = 0
+        self.menu_version = -1
+        self.menu_rows = []
+        self.stale_rows = set()
+        self.next_order_number = 1
+        self.listeners = []
+        self.order_listeners = []
+        if product_by_id is None:
+            assign_product_ids(products)
+            product_by_id = {product.product_id: product for product in products}
+        self.product_by_id = product_by_id
+
+    def start_new_order(self):
+        # Start a new order by creating a new receipt
+        if self.inventory is not None and self.receipt is not None and self.receipt.closed_at is None:
+            self.inventory.release_receipt(self.receipt)
+        self.switch_receipt(Receipt(self.merge_lines))
+
+    def switch_receipt(self, receipt):
+        # Make another open receipt the current one, e.g. a parked tab; the previous one is left as it is
+        self.receipt = receipt
+        for listener in self.order_listeners:
+            listener(receipt)
+
+    def subscribe_orders(self, listener):
+        # Register a callback called as listener(receipt) whenever the current receipt changes to another one
+        self.order_listeners.append(listener)
+
+    def display_menu(self):
+        # Display the menu as a list of formatted strings; the list is cached, so callers must not change it
+        if self.menu_version != self.catalog_version:
+            rows = self.menu_rows
+            if len(rows) != len(self.products):
+                rows[:] = [self.menu_row(i) for i in range(len(self.products))]
+            else:
+                for i in self.stale_rows:
+                    rows[i] = self.menu_row(i)
+            self.stale_rows.clear()
+            self.menu_version = self.catalog_version
+        return self.menu_rows
+
+    def menu_row(self, index):
+        # Format a single menu row
+        product = self.products[index]
+        return "{}. {} - €{:.2f}".format(index + 1, product.name, product.price)
+
+    def update_product(self, index, name=None, price=None):
+        # Change a product's name or price and invalidate only its menu row
+        product = self.products[index]
+        if name is not None:
+            product.name = name
+        if price is not None:
+            product.price = price
+            product.price_cents = to_cents(price)
+        self.stale_rows.add(index)
+        self.catalog_version += 1
+
+    def add_product(self, product):
+        # Add a product to the end of the menu
+        if product.product_id is None:
+            product.product_id = max(self.product_by_id, default=-1) + 1
+        elif product.product_id in self.product_by_id:
+            raise ValueError("Product ids must be unique.")
+        self.products.append(product)
+        self.product_by_id[product.product_id] = product
+        self.menu_rows.append(self.menu_row(len(self.products) - 1))
+        self.catalog_version += 1
+
+    def take_order(self, index, quantity):
+        # Take an order by adding items to the current receipt, by menu position
+        self.take_product(self.products[index].product_id, quantity)
+
+    def take_product(self, product_id, quantity):
+        # Take an order by adding items to the current receipt, by product id
+        if self.receipt is None:
+            self.start_new_order()
+        product = self.product_by_id[product_id]
+        if self.inventory is not None:
+            self.inventory.reserve(product.product_id, quantity)
+        self.receipt.add_item(product, quantity)
+
+    def remove_item(self, index, quantity=None):
+        # Remove an item, or part of its quantity, from the current receipt based on its index
+        if quantity is not None and quantity <= 0:
+            raise ValueError("Quantity to remove must be greater than 0.")
+        if self.receipt is not None and 0 <= index < len(self.receipt.items):
+            if self.inventory is not None:
+                line_quantity = self.receipt.items.quantities[index]
+                released = line_quantity if quantity is None else min(quantity, line_quantity)
+                self.inventory.release(self.receipt.items.product_ids[index], released)
+            self.receipt.remove_item(index, quantity)
+
+    def complete_order(self):
+        # Complete the order by generating a receipt text
+        if self.receipt is not None and self.receipt.items:
+            return self.receipt.print_receipt()
+
+    def subscribe(self, listener):
+        # Register a callback called as listener(receipt) whenever an order is paid
+        self.listeners.append(listener)
+
+    def settle_order(self, payment_cents):
+        # Close the current order with a payment, hand it to the listeners and start a new one
+        receipt = self.receipt
+        if receipt is None or not receipt.items:
+            raise ValueError("No items in the order.")
+        change = payment_cents - receipt.total_cents
+        receipt.order_number = self.next_order_number
+        receipt.order_id = uuid.uuid4().hex
+        receipt.till = self.till
+        receipt.closed_at = time.time()
+        receipt.paid_cents = payment_cents
+        self.next_order_number += 1
+        if self.inventory is not None:
+            self.inventory.commit_receipt(receipt)
+        for listener in self.listeners:
+            listener(receipt)
+        self.start_new_order()
+        return change
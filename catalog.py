@@ -0,0 +1,201 @@
+import csv
+import json
+import os
+import pickle
+
+from cashier import Product, to_cents
+from tax import DEFAULT_TAX_CLASS, tax_class
+
+# Bump when the layout of the cached rows changes, so old cache files are ignored
+CACHE_VERSION = 3
+
+
+def file_stamp(path):
+    # Size and modification time of a file; a changed stamp means the file must be read again
+    status = os.stat(path)
+    return status.st_size, status.st_mtime_ns
+
+
+def parse_rows(path):
+    # Read a JSON or CSV catalog as a list of (product_id, name, price, quantity, tax_class, station, prep_seconds)
+    # tuples; station is the prep station a product is made at, if any, and prep_seconds how long it takes
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as file:
+            rows = [(int(row["id"]), row["name"], float(row["price"]), int(row.get("quantity") or 0),
+                     row.get("tax") or DEFAULT_TAX_CLASS, row.get("station") or None, int(row.get("prep") or 0))
+                    for row in csv.DictReader(file)]
+    else:
+        with open(path, encoding="utf-8") as file:
+            items = json.load(file)
+        rows = [(int(item["id"]), item["name"], float(item["price"]), int(item.get("quantity", 0)),
+                 item.get("tax", DEFAULT_TAX_CLASS), item.get("station"), int(item.get("prep", 0))) for item in items]
+    if len({row[0] for row in rows}) != len(rows):
+        raise ValueError(f"Product ids in {path} must be unique.")
+    # One unknown tax class rejects the whole file, so a reload never applies half of it
+    for row in rows:
+        try:
+            tax_class(row[4])
+        except ValueError as error:
+            raise ValueError(f"Product {row[0]} in {path}: {error}") from None
+    return rows
+
+
+def read_rows(path, cache_path=None):
+    # Catalog rows, taken from the binary cache next to the file while the file has not changed
+    stamp = file_stamp(path)
+    if cache_path is not None:
+        try:
+            with open(cache_path, "rb") as file:
+                cached = pickle.load(file)
+            if cached["version"] == CACHE_VERSION and cached["stamp"] == stamp:
+                return stamp, cached["rows"]
+        except (OSError, EOFError, KeyError, TypeError, pickle.UnpicklingError):
+            pass
+    rows = parse_rows(path)
+    if cache_path is not None:
+        # Write the cache under a temporary name and rename it, so a reader never sees half a file
+        temporary = f"{cache_path}.tmp"
+        try:
+            with open(temporary, "wb") as file:
+                pickle.dump({"version": CACHE_VERSION, "stamp": stamp, "rows": rows}, file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, cache_path)
+        except OSError:
+            pass
+    return stamp, rows
+
+
+def load_catalog(path):
+    # Products of a catalog file, for scripts that do not need hot reloading
+    return Catalog(path).products
+
+
+class Catalog:
+    # Products loaded from a JSON or CSV file, with id and name indexes and reloading of changed entries
+    def __init__(self, path, cache=True):
+        # Initialize the catalog and load the file, through the cache unless cache is False
+        self.path = path
+        self.cache_path = f"{path}.cache" if cache else None
+        self.products = []
+        self.by_id = {}
+        # The name index is only needed for lookups by name, so it is built on the first one
+        self.by_name = None
+        self.positions = {}
+        self.listeners = []
+        self.stamp = None
+        self.load()
+
+    def load(self):
+        # Build the products and the id index from the file
+        stamp, rows = read_rows(self.path, self.cache_path)
+        self.products[:] = [Product(name, price, quantity, product_id, tax_class, station, prep_seconds)
+                            for product_id, name, price, quantity, tax_class, station, prep_seconds in rows]
+        self.by_id = {product.product_id: product for product in self.products}
+        self.positions = {row[0]: position for position, row in enumerate(rows)}
+        self.by_name = None
+        self.stamp = stamp
+
+    def add(self, product):
+        # Add a product at the end of the catalog and index it
+        self.positions[product.product_id] = len(self.products)
+        self.products.append(product)
+        self.by_id[product.product_id] = product
+        if self.by_name is not None:
+            self.by_name.setdefault(product.name.lower(), product)
+
+    def find(self, name):
+        # Product with the given name, ignoring case, or None
+        if self.by_name is None:
+            self.by_name = {product.name.lower(): product for product in reversed(self.products)}
+        return self.by_name.get(name.lower())
+
+    def subscribe(self, listener):
+        # Register a callback called as listener(products) with the products a reload changed or added
+        self.listeners.append(listener)
+
+    def changed(self):
+        # Whether the file has changed since it was last read
+        try:
+            return file_stamp(self.path) != self.stamp
+        except OSError:
+            return False
+
+    def read_changes(self):
+        # Read the file again if it changed and return (stamp, rows) for reload, or None; touches no products,
+        # so it can run on a worker thread
+        if not self.changed():
+            return None
+        return read_rows(self.path, self.cache_path)
+
+    def reload(self, cashier=None, changes=None):
+        # Apply the names, prices, tax classes and stations that changed in the file and add new products;
+        # returns (changed ids, added ids)
+        # With a cashier the changes go through it, so its cached menu rows are updated too. Products removed from
+        # the file stay on the menu until the next start, because open receipts may still refer to them.
+        # `changes` is the result of read_changes when the file was already read elsewhere.
+        if cashier is not None and cashier.products is not self.products:
+            raise ValueError("The cashier must be built on the catalog's product list.")
+        if changes is None:
+            changes = self.read_changes()
+            if changes is None:
+                return [], []
+        # parse_rows checked every row, so the rows below all apply; the stamp is only taken once they have, so a
+        # reload that fails is tried again
+        stamp, rows = changes
+        changed = []
+        added = []
+        for product_id, name, price, quantity, tax_class, station, prep_seconds in rows:
+            product = self.by_id.get(product_id)
+            if product is None:
+                product = Product(name, price, quantity, product_id, tax_class, station, prep_seconds)
+                if cashier is not None:
+                    cashier.add_product(product)
+                    self.positions[product_id] = len(self.products) - 1
+                    self.by_id[product_id] = product
+                    if self.by_name is not None:
+                        self.by_name[name.lower()] = product
+                else:
+                    self.add(product)
+                added.append(product_id)
+                continue
+            updated = False
+            if product.name != name or product.price != price:
+                if self.by_name is not None and self.by_name.get(product.name.lower()) is product:
+                    del self.by_name[product.name.lower()]
+                if cashier is not None:
+                    cashier.update_product(self.positions[product_id], name=name, price=price)
+                else:
+                    product.name = name
+                    product.price = price
+                    product.price_cents = to_cents(price)
+                if self.by_name is not None:
+                    self.by_name[name.lower()] = product
+                updated = True
+            if (product.tax_class, product.station, product.prep_seconds) != (tax_class, station, prep_seconds):
+                # Lines already on a receipt keep the tax class they were rung up with
+                product.tax_class = tax_class
+                product.station = station
+                product.prep_seconds = prep_seconds
+                updated = True
+            if updated:
+                changed.append(product_id)
+        self.stamp = stamp
+        if changed or added:
+            products = [self.by_id[product_id] for product_id in changed + added]
+            for listener in self.listeners:
+                listener(products)
+        return changed, added
+
+
+def write_catalog(path, products):
+    # Save products as a JSON catalog
+    with open(path, "w", encoding="utf-8") as file:
+        items = []
+        for product in products:
+            item = {"id": product.product_id, "name": product.name, "price": product.price,
+                    "quantity": product.quantity, "tax": product.tax_class}
+            if product.station is not None:
+                item["station"] = product.station
+                item["prep"] = product.prep_seconds
+            items.append(item)
+        json.dump(items, file, indent=1, ensure_ascii=False)
+        file.write("\n")
@@ -0,0 +1,229 @@
+import json
+import os
+import sys
+from collections import OrderedDict
+
+from money import format_cents
+
+# Euro notes and coins in cents, largest first
+DENOMINATIONS = (50000, 20000, 10000, 5000, 2000, 1000, 500, 200, 100, 50, 20, 10, 5, 2, 1)
+
+# Pieces needed for an amount the drawer cannot make
+_IMPOSSIBLE = float("inf")
+
+
+def denomination_text(cents):
+    # Printed name of a denomination, e.g. "€0.20"
+    return f"€{format_cents(cents)}"
+
+
+def breakdown_text(counts):
+    # Counts per denomination as one line, largest first, e.g. "1 x €5.00, 2 x €0.20"
+    return ", ".join(f"{counts[cents]} x {denomination_text(cents)}" for cents in DENOMINATIONS if counts.get(cents))
+
+
+def read_counts(saved):
+    # {cents: count} from JSON, where object keys are strings
+    return {int(cents): count for cents, count in saved.items()}
+
+
+def tender_split(amount):
+    # Notes and coins of a payment when only its amount is known, assuming the fewest pieces; greedy is optimal
+    # for euro denominations when the supply is unlimited
+    counts = {}
+    for cents in DENOMINATIONS:
+        if amount >= cents:
+            counts[cents], amount = divmod(amount, cents)
+    return counts
+
+
+def reachable(state, limit):
+    # Per denomination index i, a bit mask of the amounts up to limit that denominations i and smaller can make
+    # exactly; a count of n pieces is added as shifts by 1, 2, 4, ... pieces instead of n single shifts
+    mask = (1 << (limit + 1)) - 1
+    masks = [1] * (len(DENOMINATIONS) + 1)
+    reach = 1
+    for i in range(len(DENOMINATIONS) - 1, -1, -1):
+        count = state[i]
+        chunk = 1
+        while count:
+            take = min(chunk, count)
+            reach = (reach | (reach << (take * DENOMINATIONS[i]))) & mask
+            count -= take
+            chunk *= 2
+        masks[i] = reach
+    return masks
+
+
+def fewest_pieces(state, amount, memo):
+    # Fewest-pieces change for amount from the counts in state (aligned with DENOMINATIONS), or None.
+    # DP over the denominations: best(i, rest) is the fewest pieces for rest using denomination i and smaller.
+    # Counts whose rest the smaller denominations cannot make are skipped using the reachable() masks, counts
+    # are tried from the most down, and a count stops being tried once even filling the rest with the next
+    # denomination could not beat the best found; the first count tried that works is usually the answer.
+    limit, masks = memo.get("reach", (-1, None))
+    if amount > limit:
+        limit = amount
+        masks = reachable(state, limit)
+        memo["reach"] = (limit, masks)
+    if not masks[0] >> amount & 1:
+        return None
+    last = len(DENOMINATIONS) - 1
+
+    def best(i, rest):
+        # Only called for a rest that denominations i and smaller can make
+        if rest == 0:
+            return 0
+        key = (i, rest)
+        found = memo.get(key)
+        if found is not None:
+            return found[0]
+        cents = DENOMINATIONS[i]
+        pieces, take = _IMPOSSIBLE, 0
+        following = DENOMINATIONS[i + 1] if i < last else None
+        smaller = masks[i + 1]
+        for count in range(min(state[i], rest // cents), -1, -1):
+            remaining = rest - count * cents
+            if following is not None and count - (-remaining // following) >= pieces:
+                break
+            if smaller >> remaining & 1:
+                total = count + best(i + 1, remaining)
+                if total < pieces:
+                    pieces, take = total, count
+        memo[key] = (pieces, take)
+        return pieces
+
+    best(0, amount)
+    counts = {}
+    i = 0
+    while amount:
+        take = memo[(i, amount)][1]
+        if take:
+            counts[DENOMINATIONS[i]] = take
+            amount -= take * DENOMINATIONS[i]
+        i += 1
+    return counts
+
+
+class CashDrawer:
+    # Notes and coins in the till per denomination, with change-making and end-of-shift reconciliation
+    def __init__(self, counts=None, path=None, opening=None, cached_states=16):
+        # Initialize the drawer from {cents: count}; path is where save() writes the counts, and opening is the
+        # float the shift started with, by default the counts themselves
+        self.counts = dict.fromkeys(DENOMINATIONS, 0)
+        if counts:
+            self.add(counts)
+        self.path = path
+        self.opening = dict(self.counts) if opening is None else dict(opening)
+        # DP tables of the last few drawer states; a state never changes, so its table stays valid
+        self.cached_states = cached_states
+        self.tables = OrderedDict()
+
+    @classmethod
+    def load(cls, path):
+        # Drawer saved at path, or an empty one when the file does not exist yet. A file with only
+        # {cents: count}, as written by hand for the opening float, starts a new shift.
+        if not os.path.exists(path):
+            return cls(path=path)
+        with open(path, encoding="utf-8") as file:
+            saved = json.load(file)
+        if "counts" not in saved:
+            return cls(read_counts(saved), path)
+        return cls(read_counts(saved["counts"]), path, read_counts(saved["opening"]))
+
+    def save(self):
+        # Write the counts and the opening float to the drawer file; replaced atomically
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump({"counts": {str(cents): count for cents, count in self.counts.items() if count},
+                       "opening": {str(cents): count for cents, count in self.opening.items() if count}}, file)
+        os.replace(temporary, self.path)
+
+    @property
+    def total(self):
+        # Cash in the drawer in cents
+        return sum(cents * count for cents, count in self.counts.items())
+
+    def add(self, counts):
+        # Put notes and coins into the drawer
+        for cents, count in counts.items():
+            if cents not in self.counts:
+                raise ValueError(f"Unknown denomination: {cents}")
+            if count < 0:
+                raise ValueError("Counts must not be negative.")
+            self.counts[cents] += count
+
+    def remove(self, counts):
+        # Take notes and coins out of the drawer
+        for cents, count in counts.items():
+            if self.counts.get(cents, 0) < count:
+                raise ValueError(f"Only {self.counts.get(cents, 0)} x {denomination_text(cents)} in the drawer.")
+        for cents, count in counts.items():
+            self.counts[cents] -= count
+
+    def make_change(self, amount, tendered=None):
+        # Fewest notes and coins for amount as {cents: count}, or None when the drawer cannot give it exactly;
+        # tendered pieces are counted as already in the drawer
+        if amount < 0:
+            raise ValueError("Change must not be negative.")
+        state = tuple(self.counts[cents] + (tendered or {}).get(cents, 0) for cents in DENOMINATIONS)
+        table = self.tables.get(state)
+        if table is None:
+            table = self.tables[state] = {}
+            if len(self.tables) > self.cached_states:
+                self.tables.popitem(last=False)
+        else:
+            self.tables.move_to_end(state)
+        return fewest_pieces(state, amount, table)
+
+    def plan_payment(self, payment, change, tendered=None):
+        # (tendered, change) counts for a cash payment, or None when exact change cannot be given; nothing moves
+        # until take_payment. Without tendered, the payment is taken to be paid in the fewest pieces.
+        tendered = tender_split(payment) if tendered is None else tendered
+        given = self.make_change(change, tendered)
+        if given is None:
+            return None
+        return tendered, given
+
+    def take_payment(self, plan):
+        # Put the tendered pieces into the drawer and take the change out
+        tendered, given = plan
+        self.add(tendered)
+        self.remove(given)
+
+    def reconcile(self, counted):
+        # Compare a count of the drawer with what it should hold: rows of (cents, expected, counted, difference)
+        # for the denominations that differ, and the difference in cents (positive when there is more cash)
+        rows = []
+        difference = 0
+        for cents in DENOMINATIONS:
+            expected = self.counts[cents]
+            actual = counted.get(cents, 0)
+            if actual != expected:
+                rows.append((cents, expected, actual, actual - expected))
+                difference += (actual - expected) * cents
+        return rows, difference
+
+    def shift_lines(self):
+        # End-of-shift summary: opening float, cash taken and what the drawer should hold per denomination
+        opening = sum(cents * count for cents, count in self.opening.items())
+        lines = [f"{denomination_text(cents):>9} x {self.counts[cents]}" for cents in DENOMINATIONS if self.counts[cents]]
+        lines.append(f"Opening float: €{format_cents(opening)}")
+        lines.append(f"Cash taken: €{format_cents(self.total - opening)}")
+        lines.append(f"Expected in drawer: €{format_cents(self.total)}")
+        return lines
+
+
+if __name__ == "__main__":
+    # Usage: python change.py drawer.json [counted.json] - expected contents, and the differences with a count
+    drawer = CashDrawer.load(sys.argv[1])
+    for line in drawer.shift_lines():
+        print(line)
+    if len(sys.argv) > 2:
+        with open(sys.argv[2], encoding="utf-8") as file:
+            counted = read_counts(json.load(file))
+        rows, difference = drawer.reconcile(counted)
+        for cents, expected, actual, delta in rows:
+            print(f"{denomination_text(cents):>9}: expected {expected}, counted {actual} ({delta:+d})")
+        sign = "-" if difference < 0 else "+"
+        print(f"Difference: {sign}€{format_cents(abs(difference))}" if difference else "Drawer matches.")
@@ -0,0 +1,106 @@
+import asyncio
+import itertools
+import json
+import socket
+
+from server import encode
+
+
+class CashierError(Exception):
+    pass
+
+
+class AsyncCashierClient:
+    # Thin asyncio client for CashierServer; one connection can drive many sessions
+    def __init__(self, reader, writer):
+        # Initialize the client on an open connection
+        self.reader = reader
+        self.writer = writer
+        self.ids = itertools.count(1)
+        self.waiting = {}
+        self.receiver = asyncio.ensure_future(self.receive())
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=8765, path=None):
+        # Connect over a Unix socket if a path is given, otherwise over TCP
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def receive(self):
+        # Hand each response to the request waiting for it
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            future = self.waiting.pop(response["id"], None)
+            if future is None:
+                continue
+            if response["ok"]:
+                future.set_result(response.get("r"))
+            else:
+                future.set_exception(CashierError(response["e"]))
+        for future in self.waiting.values():
+            future.set_exception(ConnectionError("Connection to the cashier server closed."))
+
+    async def call(self, op, session=None, *args):
+        # Send a request and wait for its result
+        request_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[request_id] = future
+        self.writer.write(encode({"id": request_id, "op": op, "s": session, "a": list(args)}))
+        await self.writer.drain()
+        return await future
+
+    async def close(self):
+        # Close the connection
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.receiver.cancel()
+
+
+class CashierClient:
+    # Blocking client with the same calls as Cashier, for scripts and simple tills
+    def __init__(self, host="127.0.0.1", port=8765, path=None):
+        # Connect and open an order session
+        if path is not None:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.connect(path)
+        else:
+            self.socket = socket.create_connection((host, port))
+        self.file = self.socket.makefile("rb")
+        self.ids = itertools.count(1)
+        self.session = self.call("open")
+
+    def call(self, op, *args):
+        # Send a request and wait for its result
+        request_id = next(self.ids)
+        self.socket.sendall(encode({"id": request_id, "op": op, "s": getattr(self, "session", None), "a": list(args)}))
+        response = json.loads(self.file.readline())
+        if not response["ok"]:
+            raise CashierError(response["e"])
+        return response.get("r")
+
+    def display_menu(self):
+        return self.call("menu")
+
+    def take_order(self, index, quantity):
+        return self.call("take_order", index, quantity)
+
+    def remove_item(self, index, quantity=None):
+        return self.call("remove_item", index, quantity)
+
+    def complete_order(self):
+        return self.call("complete_order")
+
+    def settle_order(self, payment_cents):
+        return self.call("settle_order", payment_cents)["change"]
+
+    def close(self):
+        # Close the session and the connection
+        self.call("close")
+        self.file.close()
+        self.socket.close()
@@ -0,0 +1,85 @@
+# Keys that edit the fast-entry buffer, by Tk keysym, for keys whose character is not what is typed
+KEYSYM_KEYS = {"asterisk": "*", "KP_Multiply": "*", "x": "*", "period": ".", "KP_Decimal": ".", "comma": ".",
+               "KP_Enter": "Return"}
+
+# Longest quantity and product code accepted, in digits
+MAX_QUANTITY_DIGITS = 3
+MAX_CODE_DIGITS = 6
+
+
+class FastEntry:
+    # Keyboard entry for the till: a product code (PLU), optionally after a quantity and "*", e.g. "3*12" for three
+    # of product 12, then Enter. The code is a product id, which never changes or gets reused, so codes printed
+    # for the staff stay valid, and leading zeros are ignored, so "012" is product 12 too. Each key only edits a
+    # short buffer; Enter resolves the code through a dict from product id to menu position made up front, so
+    # neither depends on the menu size.
+    def __init__(self, cashier):
+        # Initialize the entry with the codes of the cashier's menu
+        self.cashier = cashier
+        self.buffer = ""
+        self.positions = {}
+        self.add_products(cashier.products)
+
+    def add_products(self, products):
+        # Give products added to the menu a code; Catalog listener
+        positions = {product.product_id: position for position, product in enumerate(self.cashier.products)}
+        for product in products:
+            if product.product_id in positions:
+                self.positions[product.product_id] = positions[product.product_id]
+
+    def key(self, key):
+        # Handle one key: a digit, "*" or "." edits the buffer, BackSpace and Escape undo, Return takes the order.
+        # Returns the text to show next to the entry; raises ValueError for a code or quantity that is not valid.
+        buffer = self.buffer
+        if key == "Return":
+            return self.enter()
+        if key == "BackSpace":
+            self.buffer = buffer[:-1]
+        elif key == "Escape":
+            self.buffer = ""
+        elif key.isdigit() and len(key) == 1:
+            digits = len(buffer) - buffer.find("*") - 1 if "*" in buffer else len(buffer)
+            if digits >= MAX_CODE_DIGITS:
+                raise ValueError("Product codes are at most 6 digits.")
+            self.buffer = buffer + key
+        elif key == "*":
+            if not buffer or "*" in buffer or "." in buffer:
+                raise ValueError("Type the quantity before *, e.g. 3*12.")
+            if len(buffer) > MAX_QUANTITY_DIGITS:
+                raise ValueError("Quantities are at most 3 digits.")
+            self.buffer = buffer + "*"
+        elif key == ".":
+            # Only amounts paid have decimals
+            if "*" in buffer or "." in buffer:
+                raise ValueError("Only a payment amount can have a decimal point.")
+            self.buffer = buffer + "."
+        return ""
+
+    def parse(self):
+        # (quantity, code) typed in the buffer
+        quantity, _, code = self.buffer.rpartition("*")
+        if not code or "." in code:
+            raise ValueError("Type a product code, e.g. 12 or 3*12.")
+        quantity = int(quantity) if quantity else 1
+        if quantity <= 0:
+            raise ValueError("Please enter a valid quantity greater than 0.")
+        return quantity, code
+
+    def enter(self):
+        # Take the order typed in the buffer and clear it; the buffer is kept when the order fails
+        quantity, code = self.parse()
+        position = self.positions.get(int(code))
+        if position is None:
+            raise ValueError(f"There is no product with code {code}.")
+        self.cashier.take_order(position, quantity)
+        self.buffer = ""
+        return f"{self.cashier.products[position].name} x {quantity}"
+
+    def amount(self):
+        # Payment typed in the buffer in euros, or None when the buffer is empty; the buffer is cleared
+        if not self.buffer:
+            return None
+        if "*" in self.buffer or self.buffer == ".":
+            raise ValueError("Type the amount paid, e.g. 20 or 12.50.")
+        amount, self.buffer = self.buffer, ""
+        return amount
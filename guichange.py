@@ -1,94 +1,48 @@
+import os
+import sys
 import tkinter as tk
 from tkinter import ttk, messagebox
-import datetime
-
-class Product:
-    def __init__(self, name, price, quantity):
-        # Initialize a product with a name, price, and quantity
-        self.name = name
-        self.price = price
-        self.quantity = quantity
-
-class Receipt:
-    def __init__(self):
-        # Initialize a receipt with empty items and total
-        self.items = []
-        self.total = 0
-
-    def add_item(self, product, quantity):
-        # Add an item to the receipt
-        item = {"name": product.name, "price": product.price, "quantity": quantity}
-        self.items.append(item)
-        self.total += product.price * quantity
-
-    def remove_item(self, index):
-        # Remove an item from the receipt based on its index
-        removed_item = self.items.pop(index)
-        self.total -= removed_item["price"] * removed_item["quantity"]
-
-    def print_receipt(self):
-        # Generate a receipt text including date, items, IVA, and total
-        iva_rate = 0.21  # IVA tax rate (21% in Spain)
-
-        receipt_text = f"COFFEE PALACE - {datetime.datetime.now().strftime('%d-%m-%Y %H:%M:%S')}\n"
-        receipt_text += "-" * 40 + "\n"
-
-        for item in self.items:
-            item_total = item["price"] * item["quantity"]
-            receipt_text += f"{item['name']} x {item['quantity']} - €{item_total:.2f}\n"
-
-        # Calculate IVA without affecting the total
-        iva_amount = self.total * iva_rate
-        receipt_text += f"IVA ({iva_rate * 100}%): €{iva_amount:.2f}\n"
-
-        receipt_text += "-" * 40 + "\n"
-        receipt_text += f"TOTAL: €{self.total:.2f}\n"
-        receipt_text += "\nThank you for your visit, \nsee you soon!"
-
-        return receipt_text
-
-class Cashier:
-    def __init__(self, products):
-        # Initialize a cashier with a list of products and no current receipt
-        self.products = products
-        self.receipt = None
-
-    def start_new_order(self):
-        # Start a new order by creating a new receipt
-        self.receipt = Receipt()
-
-    def display_menu(self):
-        # Display the menu as a list of formatted strings
-        menu_items = []
-        for i, product in enumerate(self.products):
-            menu_items.append("{}. {} - €{:.2f}".format(i + 1, product.name, product.price))
-        return menu_items
-
-    def take_order(self, index, quantity):
-        # Take an order by adding items to the current receipt
-        if self.receipt is None:
-            self.start_new_order()
-        product = self.products[index]
-        self.receipt.add_item(product, quantity)
-
-    def remove_item(self, index):
-        # Remove an item from the current receipt based on its index
-        if self.receipt is not None and 0 <= index < len(self.receipt.items):
-            self.receipt.remove_item(index)
-
-    def complete_order(self):
-        # Complete the order by generating a receipt text
-        if self.receipt is not None and self.receipt.items:
-            return self.receipt.print_receipt()
+from cashier import Cashier, to_cents, format_cents
+from catalog import Catalog
+from orderview import OrderListView
+from journal import Journal, restore_cashier
+from salesstore import SalesStore
+from inventory import Inventory, OutOfStockError, StockBusyError
+from search import FilteredMenuView
+from scheduler import TaskScheduler
+from metrics import Metrics, CASHIER_METHODS
+from till import till_id
+from change import CashDrawer, breakdown_text
+from snapshots import OrderSnapshots, load_open_orders, restore_orders
+from tabs import TabManager
+from fastentry import FastEntry, KEYSYM_KEYS
+from routing import Router
+from sync import TillSync
+from archive import ReceiptArchive
+
+# Hotkeys of the code entry, by Tk keysym
+FAST_ACTIONS = {"F9": "complete", "F12": "pay", "Delete": "remove"}
 
 class CoffeeShopGUI:
-    def __init__(self, master, products):
-        # Initialize the CoffeeShopGUI with a master window and a list of products
+    def __init__(self, master, products, inventory=None, till=None, drawer=None, router=None, archive=None):
+        # Initialize the CoffeeShopGUI with a master window, a list of products, optional stock tracking, the till id,
+        # an optional cash drawer that change is counted out of, an optional router that sends completed orders
+        # to the kitchen and the bar, and an optional archive of paid receipts to reprint from
         self.master = master
         self.master.title("COFFEE PALACE")
+        self.drawer = drawer
 
         self.products = products
-        self.cashier = Cashier(products)
+        self.cashier = Cashier(products, merge_lines=True, inventory=inventory, till=till)
+        # Open orders per table or tab; the counter order has no tab
+        self.tabs = TabManager(self.cashier)
+        self.router = router
+        self.archive = archive
+        # Typed product codes, e.g. 3*12; see fast_key
+        self.fast_entry = FastEntry(self.cashier)
+        self.journal_failing = False
+        # Slow work runs on worker threads; every button callback is timed on the main loop
+        self.scheduler = TaskScheduler(master)
 
         # Configure styles for ttk elements
         self.style = ttk.Style()
@@ -116,24 +70,39 @@ class CoffeeShopGUI:
         self.menu_label = ttk.Label(menu_frame, text="Menu:", font=("Arial", 14, "bold"), background="#EFEFEF")
         self.menu_label.pack()
 
+        # Search box that filters the menu as you type
+        self.search_var = tk.StringVar()
+        self.search_entry = ttk.Entry(menu_frame, textvariable=self.search_var, width=40)
+        self.search_entry.pack(pady=5)
+
         # Menu listbox with subtle color and border
         self.menu_listbox = tk.Listbox(menu_frame, selectmode=tk.SINGLE, font=("Arial", 14), bd=2, relief=tk.GROOVE, width=60, height=15)
-        for item in self.cashier.display_menu():
-            self.menu_listbox.insert(tk.END, item)
+        self.menu_view = FilteredMenuView(self.menu_listbox, self.cashier)
         self.menu_listbox.pack(pady=10)
+        self.search_var.trace_add("write", self.scheduler.timed("filter_menu", self.filter_menu))
 
         # Quantity entry and Add to Order button with bold styling
         self.quantity_label = ttk.Label(menu_frame, text="Quantity:")
         self.quantity_label.pack()
         self.quantity_entry = ttk.Entry(menu_frame, width=24)  # Adjust width here
         self.quantity_entry.pack()
-        self.add_button = ttk.Button(menu_frame, text="Add to Order", command=self.add_to_order, style="TButton")
+        self.add_button = ttk.Button(menu_frame, text="Add to Order", command=self.scheduler.timed("add_to_order", self.add_to_order), style="TButton")
         self.add_button.pack(pady=5)
 
         # Complete Order button with a different color
-        self.complete_order_button = ttk.Button(menu_frame, text="Complete Order", command=self.complete_order, style="TButton")
+        self.complete_order_button = ttk.Button(menu_frame, text="Complete Order", command=self.scheduler.timed("complete_order", self.complete_order), style="TButton")
         self.complete_order_button.pack(pady=5)
 
+        # Code entry for keyboard-only sales: a product code, or quantity*code, then Enter; F9 completes the order,
+        # F12 pays the amount typed (the exact total when nothing is typed) and Delete removes a line
+        self.code_label = ttk.Label(menu_frame, text="Code (F9 complete, F12 pay, Del remove):")
+        self.code_label.pack()
+        self.code_entry = ttk.Entry(menu_frame, width=24)
+        self.code_entry.pack()
+        self.code_entry.bind("<Key>", self.scheduler.timed("fast_key", self.fast_key))
+        self.fast_status = ttk.Label(menu_frame, text="")
+        self.fast_status.pack()
+
         # Your Order label and Order Listbox with a different background color
         self.order_label = ttk.Label(order_frame, text="Your Order:", font=("Arial", 14, "bold"), background="#EFEFEF")
         self.order_label.pack()
@@ -141,23 +110,58 @@ class CoffeeShopGUI:
         # Listbox to display the order with italic font
         self.order_listbox = tk.Listbox(order_frame, height=15, width=60, font=("Arial", 14, "italic"))  # Adjust width and height here
         self.order_listbox.pack()
+        self.order_view = OrderListView(self.order_listbox)
 
         # Remove Item button with a different color
-        self.remove_button = ttk.Button(order_frame, text="Remove Item", command=self.remove_item, style="TButton")
+        self.remove_button = ttk.Button(order_frame, text="Remove Item", command=self.scheduler.timed("remove_item", self.remove_item), style="TButton")
         self.remove_button.pack(pady=10)
 
+        # Tab entry with buttons to switch to a tab and to move the selected line to it; an empty tab is the counter
+        tab_frame = tk.Frame(order_frame)
+        self.tab_label = ttk.Label(tab_frame, text="Tab:")
+        self.tab_label.pack(side=tk.LEFT)
+        self.tab_entry = ttk.Entry(tab_frame, width=10)
+        self.tab_entry.pack(side=tk.LEFT, padx=5)
+        self.switch_tab_button = ttk.Button(tab_frame, text="Switch Tab", command=self.scheduler.timed("switch_tab", self.switch_tab), style="TButton")
+        self.switch_tab_button.pack(side=tk.LEFT, padx=5)
+        self.move_line_button = ttk.Button(tab_frame, text="Move to Tab", command=self.scheduler.timed("move_to_tab", self.move_to_tab), style="TButton")
+        self.move_line_button.pack(side=tk.LEFT, padx=5)
+        tab_frame.pack(pady=5)
+
         # Payment Entry and Calculate Change button
         self.payment_label = ttk.Label(order_frame, text="Payment:")
         self.payment_label.pack()
         self.payment_entry = ttk.Entry(order_frame, width=24)
         self.payment_entry.pack()
-        self.calculate_change_button = ttk.Button(order_frame, text="Calculate Change", command=self.calculate_change, style="TButton")
+        self.calculate_change_button = ttk.Button(order_frame, text="Calculate Change", command=self.scheduler.timed("calculate_change", self.calculate_change), style="TButton")
         self.calculate_change_button.pack(pady=10)
 
+        # Reprint of a paid receipt by its order number
+        reprint_frame = tk.Frame(order_frame)
+        self.reprint_label = ttk.Label(reprint_frame, text="Order No.:")
+        self.reprint_label.pack(side=tk.LEFT)
+        self.reprint_entry = ttk.Entry(reprint_frame, width=10)
+        self.reprint_entry.pack(side=tk.LEFT, padx=5)
+        self.reprint_button = ttk.Button(reprint_frame, text="Reprint", command=self.scheduler.timed("reprint", self.reprint), style="TButton")
+        self.reprint_button.pack(side=tk.LEFT, padx=5)
+        reprint_frame.pack(pady=5)
+
         # Pack frames
         menu_frame.pack(side=tk.LEFT, padx=20)
         order_frame.pack(side=tk.RIGHT, padx=20)
 
+    def filter_menu(self, *args):
+        # Show only the products matching the search box
+        self.menu_view.filter(self.search_var.get())
+
+    def refresh_menu(self, product_ids=None):
+        # Redraw the rows of changed products, or the whole menu
+        if product_ids is None:
+            self.menu_view.visible = []
+            self.filter_menu()
+        else:
+            self.menu_view.refresh(product_ids)
+
     def add_to_order(self):
         # Add selected items to the order based on user input
         selected_index = self.menu_listbox.curselection()
@@ -165,16 +169,59 @@ class CoffeeShopGUI:
             try:
                 quantity = int(self.quantity_entry.get())
                 if quantity > 0:
-                    index = selected_index[0]
-                    self.cashier.take_order(index, quantity)
+                    product_id = self.menu_view.product_id_at(selected_index[0])
+                    self.cashier.take_product(product_id, quantity)
                     self.update_order_display()
                 else:
                     messagebox.showwarning("Invalid Quantity", "Please enter a valid quantity greater than 0.")
             except ValueError:
                 messagebox.showwarning("Invalid Quantity", "Please enter a valid numeric quantity.")
+            except OutOfStockError as error:
+                messagebox.showwarning("Out of Stock", str(error))
+            except StockBusyError as error:
+                messagebox.showwarning("Stock Busy", str(error))
         else:
             messagebox.showwarning("No Selection", "Please select a product from the menu.")
 
+    def fast_key(self, event):
+        # Handle a key typed in the code entry; the entry shows the fast-entry buffer rather than its own text, and
+        # problems are shown next to it instead of in a dialog, so the cashier can keep typing
+        if event.keysym in ("Tab", "ISO_Left_Tab"):
+            return None
+        status = ""
+        try:
+            action = FAST_ACTIONS.get(event.keysym)
+            if action in ("complete", "pay") and (self.cashier.receipt is None or not self.cashier.receipt.items):
+                raise ValueError("No items in the order.")
+            if action == "complete":
+                self.complete_order()
+            elif action == "pay":
+                amount = self.fast_entry.amount()
+                if amount is None and self.cashier.receipt is not None:
+                    amount = format_cents(self.cashier.receipt.total_cents)
+                self.payment_entry.delete(0, tk.END)
+                self.payment_entry.insert(0, amount or "")
+                self.calculate_change()
+            elif action == "remove":
+                # The selected line, or the last one
+                selected_index = self.order_listbox.curselection()
+                if self.cashier.receipt is not None and self.cashier.receipt.items:
+                    self.cashier.remove_item(selected_index[0] if selected_index else len(self.cashier.receipt.items) - 1)
+                    self.update_order_display()
+            else:
+                key = KEYSYM_KEYS.get(event.keysym, event.keysym if event.keysym in ("Return", "BackSpace", "Escape")
+                                      else event.char)
+                status = self.fast_entry.key(key)
+                if status:
+                    self.update_order_display()
+        except (ValueError, OutOfStockError, StockBusyError) as error:
+            status = str(error)
+            self.master.bell()
+        self.code_entry.delete(0, tk.END)
+        self.code_entry.insert(0, self.fast_entry.buffer)
+        self.fast_status.config(text=status)
+        return "break"
+
     def remove_item(self):
         # Remove selected items from the order based on user input
         selected_index = self.order_listbox.curselection()
@@ -185,59 +232,265 @@ class CoffeeShopGUI:
         else:
             messagebox.showwarning("No Selection", "Please select an item to remove from the order.")
 
+    def reprint(self):
+        # Show a paid receipt again from the archive; the current order stays open and is shown by the next change
+        if self.archive is None:
+            messagebox.showinfo("Reprint", "This till does not keep a receipt archive.")
+            return
+        try:
+            number = int(self.reprint_entry.get())
+        except ValueError:
+            messagebox.showwarning("Reprint", "Please enter an order number.")
+            return
+        try:
+            text = self.archive.reprint(number)
+        except OSError as error:
+            messagebox.showwarning("Reprint", f"The receipt archive could not be read: {error}")
+            return
+        if text is None:
+            messagebox.showwarning("Reprint", f"Order {number} is not in the archive.")
+        else:
+            self.update_order_display(text)
+
+    def tab_id(self):
+        # Tab id typed in the tab entry, or None for the counter order
+        return self.tab_entry.get().strip() or None
+
+    def switch_tab(self):
+        # Show the tab in the entry, opening it when it is new; only the order list is redrawn
+        tab_id = self.tab_id()
+        self.tabs.switch(tab_id)
+        self.order_label.config(text="Your Order:" if tab_id is None else f"Tab {tab_id}:")
+        self.update_order_display()
+
+    def move_to_tab(self):
+        # Move the selected order line to the tab in the entry, opening that tab when it is new
+        selected_index = self.order_listbox.curselection()
+        if not selected_index:
+            messagebox.showwarning("No Selection", "Please select an item to move to another tab.")
+            return
+        tab_id = self.tab_id()
+        try:
+            if tab_id not in self.tabs.tabs:
+                self.tabs.open(tab_id)
+            self.tabs.move_line(self.tabs.current, selected_index[0], tab_id)
+        except ValueError as error:
+            messagebox.showwarning("Move to Tab", str(error))
+
     def complete_order(self):
         # Complete the order and display the receipt
         if self.cashier.receipt is not None and self.cashier.receipt.items:
+            receipt = self.cashier.receipt
             receipt_text = self.cashier.complete_order()
+            if self.router is not None:
+                # Only lines added since the order was last completed are sent again
+                self.router.route(receipt)
             self.update_order_display(receipt_text)
         else:
             messagebox.showinfo("Coffee PALACE", "No items in the order.")
 
     def calculate_change(self):
         # Calculate change for the payment and start a new order
+        if self.cashier.receipt is None or not self.cashier.receipt.items:
+            messagebox.showinfo("Coffee PALACE", "No items in the order.")
+            return
         try:
-            payment = float(self.payment_entry.get())
-            if payment >= self.cashier.receipt.total:
-                change = payment - self.cashier.receipt.total
-                messagebox.showinfo("Change Calculation", f"Change: €{change:.2f}")
-                # Start a new order after completing the payment
-                self.cashier.start_new_order()
+            payment = to_cents(float(self.payment_entry.get()))
+            if payment >= self.cashier.receipt.total_cents:
+                # Check the drawer can give the change before the order is closed
+                plan = None
+                if self.drawer is not None:
+                    plan = self.drawer.plan_payment(payment, payment - self.cashier.receipt.total_cents)
+                    if plan is None:
+                        messagebox.showwarning("No Exact Change", f"The drawer cannot give "
+                                               f"€{format_cents(payment - self.cashier.receipt.total_cents)} in change. "
+                                               "Please ask for a different amount.")
+                        return
+                # Record the paid order, close its tab and go back to the counter
+                change = self.tabs.settle(payment)
+                self.order_label.config(text="Your Order:")
+                message = f"Change: €{format_cents(change)}"
+                if plan is not None:
+                    self.drawer.take_payment(plan)
+                    self.drawer.save()
+                    if change:
+                        message += f"\n{breakdown_text(plan[1])}"
+                messagebox.showinfo("Change Calculation", message)
                 self.update_order_display()
             else:
                 messagebox.showwarning("Insufficient Payment", "Insufficient payment. Please enter an amount equal to or greater than the total.")
         except ValueError:
             messagebox.showwarning("Invalid Payment", "Please enter a valid numeric payment amount.")
 
+    def restore_open_orders(self, orders):
+        # Put back the orders that were open on each tab when the till stopped, and say which lines could not be
+        # put back
+        skipped = restore_orders(self.tabs, orders)
+        self.update_order_display()
+        if skipped:
+            details = "\n".join(f"{'Counter' if tab_id is None else f'Tab {tab_id}'}: {line[1]} x {line[3]}: {error}"
+                                for tab_id, line, error in skipped)
+            messagebox.showwarning("Orders Restored", f"The open orders were restored without these lines:\n{details}")
+
+    def watch_journal(self, journal, interval_ms=1000):
+        # Warn when paid orders cannot be written to the journal, and poll again; the journal retries by itself
+        failing = journal.error is not None
+        if failing and not self.journal_failing:
+            messagebox.showwarning("Journal Error", f"Paid orders could not be saved to {journal.path} "
+                                   f"and will be retried: {journal.error}")
+        elif self.journal_failing and not failing:
+            messagebox.showinfo("Journal", "Paid orders are being saved again.")
+        self.journal_failing = failing
+        self.master.after(interval_ms, self.watch_journal, journal, interval_ms)
+
+    def watch_catalog(self, catalog, interval_ms=2000):
+        # Read the catalog file on a worker thread when it changed, then apply the changes here and poll again
+        def retry(error):
+            # The file may be half written or name an unknown tax class; it is read again on the next poll
+            self.master.after(interval_ms, self.watch_catalog, catalog, interval_ms)
+
+        self.scheduler.submit(catalog.read_changes, name="catalog",
+                              on_done=lambda changes: self.apply_catalog(catalog, changes, interval_ms),
+                              on_error=retry)
+
+    def apply_catalog(self, catalog, changes, interval_ms):
+        # Put the products that changed in the catalog file on the menu
+        try:
+            changed, added = catalog.reload(self.cashier, changes) if changes is not None else ([], [])
+            for product_id in changed:
+                self.menu_view.index.rename(self.cashier.product_by_id[product_id])
+            for product_id in added:
+                self.menu_view.index.add(self.cashier.product_by_id[product_id])
+            if changed or added:
+                self.menu_view.refresh(changed)
+                self.filter_menu()
+        finally:
+            self.master.after(interval_ms, self.watch_catalog, catalog, interval_ms)
+
+    def watch_sync(self, sync, interval_ms=2000):
+        # Exchange orders and stock with the other tills on a worker thread, apply what came in here and poll again
+        def retry(error):
+            # The local outbox could not be written; the changes are sent with the next round
+            self.master.after(interval_ms, self.watch_sync, sync, interval_ms)
+
+        self.scheduler.submit(sync.exchange, name="sync",
+                              on_done=lambda batches: self.apply_sync(sync, batches, interval_ms),
+                              on_error=retry)
+
+    def apply_sync(self, sync, batches, interval_ms):
+        # Take the other tills' orders and stock changes
+        try:
+            sync.apply(batches)
+        finally:
+            self.master.after(interval_ms, self.watch_sync, sync, interval_ms)
+
+    def export_metrics(self, metrics, path, interval_ms=10000):
+        # Write the latency metrics to a file, and again after the interval
+        metrics.write(path)
+        self.master.after(interval_ms, self.export_metrics, metrics, path, interval_ms)
+
     def update_order_display(self, receipt_text=None):
         # Update the order display based on the current receipt
-        self.order_listbox.delete(0, tk.END)
         if receipt_text:
-            lines = receipt_text.split('\n')
-            for line in lines:
-                self.order_listbox.insert(tk.END, line)
+            self.order_view.show_text(receipt_text)
         else:
-            for item in self.cashier.receipt.items:
-                item_total = item['price'] * item['quantity']
-                display_text = f"{item['name']} x {item['quantity']} - €{item_total:.2f}"
-                self.order_listbox.insert(tk.END, display_text)
+            # Rows are kept in sync by the receipt's change events; only a new receipt is redrawn
+            self.order_view.attach(self.cashier.receipt)
 
 if __name__ == "__main__":
     root = tk.Tk()
-    products = [
-        Product("Coffee", 1.50, 10),
-        Product("Tea", 1.20, 15),
-        Product("Beer", 2.30, 20),
-        Product("Muffin", 2.00, 25),
-        Product("Sandwich", 3.50, 30),
-        Product("Cake", 2.50, 12),
-        Product("Pizza Margarita", 6.50, 8),
-        Product("Patatas Bravas", 5.50, 18),
-        # Add more products here
-        Product("Hamburger with Cheese", 7.00, 15),
-        Product("Coca-Cola", 2.80, 10),
-        Product("Vermut", 2.20, 20),
-        Product("Fanta Naranja", 2.80, 10),
-        Product("Nestea", 2.30, 10)
-    ]
-    app = CoffeeShopGUI(root, products)
+    # The menu is read from products.json, or from the catalog file given on the command line; product ids in
+    # the catalog are the keys in stock.db and sales.db, so never reuse or renumber them
+    catalog = Catalog(sys.argv[1] if len(sys.argv) > 1 else "products.json")
+    products = catalog.products
+    # Latency metrics are opt-in: set CASHIER_METRICS_FILE and/or CASHIER_METRICS_PORT to turn them on.
+    # The methods are patched before the window binds them; without the variables nothing is patched
+    metrics_file = os.environ.get("CASHIER_METRICS_FILE")
+    metrics_port = os.environ.get("CASHIER_METRICS_PORT")
+    metrics = None
+    if metrics_file or metrics_port:
+        metrics = Metrics()
+        metrics.instrument(CASHIER_METHODS + ((CoffeeShopGUI, "update_order_display", "update_order_display"),
+                                              (CoffeeShopGUI, "calculate_change", "calculate_change")))
+        if metrics_port:
+            metrics.serve(port=int(metrics_port))
+
+    # This till's name stays the same across restarts; orders in the shared sales.db are told apart by it
+    till = till_id("till.id")
+    # Stock is shared with the other tills through stock.db
+    inventory = Inventory(products, "stock.db", till)
+    # Change is counted out of the drawer when the till has a drawer.json with the opening float
+    drawer = CashDrawer.load("drawer.json") if os.path.exists("drawer.json") else None
+    # Completed orders go to the kitchen and bar screens; set CASHIER_KDS_PORT to serve the tickets to them
+    kds_port = os.environ.get("CASHIER_KDS_PORT")
+    # Paid receipts are archived in receipts/ for reprints, compressed a few hundred at a time
+    archive = ReceiptArchive("receipts")
+    app = CoffeeShopGUI(root, products, inventory, till, drawer, archive=archive)
+    app.cashier.subscribe(archive.add_receipt)
+    router = None
+    if kds_port:
+        router = app.router = Router(app.cashier)
+        # Orders paid without pressing Complete Order are sent when they are paid
+        app.cashier.subscribe(router.route)
+        router.serve(port=int(kds_port))
+
+    # Journal every paid order and continue the order numbering from the last run
+    restore_cashier(app.cashier, "sales.journal")
+    journal = Journal("sales.journal")
+    app.cashier.subscribe(journal.record_receipt)
+    app.watch_journal(journal)
+
+    # Keep the sales database for end-of-day reports; writes happen on the store's own thread
+    sales_store = SalesStore("sales.db")
+    sales_store.add_products(products)
+    app.cashier.subscribe(sales_store.add_receipt)
+
+    # Price and name changes saved to the catalog file show up on the menu without a restart
+    catalog.subscribe(inventory.add_products)
+    catalog.subscribe(sales_store.add_products)
+    catalog.subscribe(app.fast_entry.add_products)
+    app.watch_catalog(catalog)
+
+    # Tills that cannot share stock.db and sales.db, e.g. when the network is unreliable, keep their own and
+    # exchange orders and stock changes through the directory in CASHIER_SYNC_DIR; they keep selling while it is
+    # unreachable and catch up once it is back
+    sync_dir = os.environ.get("CASHIER_SYNC_DIR")
+    if sync_dir:
+        sync = TillSync(sync_dir, till, "sync-outbox", inventory)
+        app.cashier.subscribe(sync.record_receipt)
+        sync.subscribe(sales_store.add_records)
+        app.watch_sync(sync)
+
+    # The open orders of every tab are snapshotted as they change, so a crash does not lose them; they are put back
+    # on their tabs on the next start
+    unfinished = load_open_orders("open-tabs.snap")
+    snapshots = OrderSnapshots("open-tabs.snap")
+    if unfinished:
+        app.restore_open_orders(unfinished)
+    snapshots.follow(app.tabs)
+    if metrics_file:
+        app.export_metrics(metrics, metrics_file)
+
     root.mainloop()
+    app.scheduler.close()
+    # How long each callback kept the window busy during this run
+    for line in app.scheduler.report():
+        print(line)
+    if metrics is not None:
+        for line in metrics.summary():
+            print(line)
+        if metrics_file:
+            metrics.write(metrics_file)
+        metrics.close()
+    if drawer is not None:
+        # What the drawer should hold for the end-of-shift count; python change.py drawer.json counted.json
+        # compares it with the count
+        for line in drawer.shift_lines():
+            print(line)
+    if router is not None:
+        router.close()
+    snapshots.close()
+    journal.close()
+    sales_store.close()
+    archive.close()
+    inventory.close()
@@ -1,74 +1,9 @@
+import sys
 import tkinter as tk
 from tkinter import ttk, messagebox
-import datetime
-
-class Product:
-    def __init__(self, name, price, quantity):
-        self.name = name
-        self.price = price
-        self.quantity = quantity
-
-class Receipt:
-    def __init__(self):
-        self.items = []
-        self.total = 0
-
-    def add_item(self, product, quantity):
-        item = {"name": product.name, "price": product.price, "quantity": quantity}
-        self.items.append(item)
-        self.total += product.price * quantity
-
-    def remove_item(self, index):
-        removed_item = self.items.pop(index)
-        self.total -= removed_item["price"] * removed_item["quantity"]
-
-    def print_receipt(self):
-        iva_rate = 0.21  # IVA tax rate (21% in Spain)
-
-        receipt_text = f"COFFEE PALACE - {datetime.datetime.now().strftime('%d-%m-%Y %H:%M:%S')}\n"
-        receipt_text += "-" * 40 + "\n"
-
-        for item in self.items:
-            item_total = item["price"] * item["quantity"]
-            receipt_text += f"{item['name']} x {item['quantity']} - €{item_total:.2f}\n"
-
-        # Calculate IVA without affecting the total
-        iva_amount = self.total * iva_rate
-        receipt_text += f"IVA ({iva_rate * 100}%): €{iva_amount:.2f}\n"
-
-        receipt_text += "-" * 40 + "\n"
-        receipt_text += f"TOTAL: €{self.total:.2f}\n"
-        receipt_text += "\nThank you for your visit, \nsee you soon!"
-
-        return receipt_text
-
-class Cashier:
-    def __init__(self, products):
-        self.products = products
-        self.receipt = None
-
-    def start_new_order(self):
-        self.receipt = Receipt()
-
-    def display_menu(self):
-        menu_items = []
-        for i, product in enumerate(self.products):
-            menu_items.append("{}. {} - €{:.2f}".format(i + 1, product.name, product.price))
-        return menu_items
-
-    def take_order(self, index, quantity):
-        if self.receipt is None:
-            self.start_new_order()
-        product = self.products[index]
-        self.receipt.add_item(product, quantity)
-
-    def remove_item(self, index):
-        if self.receipt is not None and 0 <= index < len(self.receipt.items):
-            self.receipt.remove_item(index)
-
-    def complete_order(self):
-        if self.receipt is not None and self.receipt.items:
-            return self.receipt.print_receipt()
+from cashier import Cashier, to_cents, format_cents
+from catalog import load_catalog
+from orderview import OrderListView
 
 class CoffeeShopGUI:
     def __init__(self, master, products):
@@ -99,8 +34,7 @@ class CoffeeShopGUI:
 
         # Menu listbox with subtle color and border
         self.menu_listbox = tk.Listbox(menu_frame, selectmode=tk.SINGLE, font=("Arial", 14), bd=2, relief=tk.GROOVE, width=60, height=15)
-        for item in self.cashier.display_menu():
-            self.menu_listbox.insert(tk.END, item)
+        self.menu_listbox.insert(tk.END, *self.cashier.display_menu())
         self.menu_listbox.pack(pady=10)
 
         # Quantity entry and Add to Order button with bold styling
@@ -122,6 +56,7 @@ class CoffeeShopGUI:
         # Listbox to display the order with italic font
         self.order_listbox = tk.Listbox(order_frame, height=15, width=60, font=("Arial", 14, "italic"))  # Adjust width and height here
         self.order_listbox.pack()
+        self.order_view = OrderListView(self.order_listbox)
 
         # Remove Item button with a different color
         self.remove_button = ttk.Button(order_frame, text="Remove Item", command=self.remove_item, style="TButton")
@@ -172,13 +107,15 @@ class CoffeeShopGUI:
             messagebox.showinfo("Coffee PALACE", "No items in the order.")
 
     def calculate_change(self):
+        if self.cashier.receipt is None or not self.cashier.receipt.items:
+            messagebox.showinfo("Coffee PALACE", "No items in the order.")
+            return
         try:
-            payment = float(self.payment_entry.get())
-            if payment >= self.cashier.receipt.total:
-                change = payment - self.cashier.receipt.total
-                messagebox.showinfo("Change Calculation", f"Change: €{change:.2f}")
-                # Start a new order after completing the payment
-                self.cashier.start_new_order()
+            payment = to_cents(float(self.payment_entry.get()))
+            if payment >= self.cashier.receipt.total_cents:
+                # Record the paid order and start a new one
+                change = self.cashier.settle_order(payment)
+                messagebox.showinfo("Change Calculation", f"Change: €{format_cents(change)}")
                 self.update_order_display()
             else:
                 messagebox.showwarning("Insufficient Payment", "Insufficient payment. Please enter an amount equal to or greater than the total.")
@@ -186,33 +123,15 @@ class CoffeeShopGUI:
             messagebox.showwarning("Invalid Payment", "Please enter a valid numeric payment amount.")
 
     def update_order_display(self, receipt_text=None):
-        self.order_listbox.delete(0, tk.END)
         if receipt_text:
-            lines = receipt_text.split('\n')
-            for line in lines:
-                self.order_listbox.insert(tk.END, line)
+            self.order_view.show_text(receipt_text)
         else:
-            for item in self.cashier.receipt.items:
-                item_total = item['price'] * item['quantity']
-                display_text = f"{item['name']} x {item['quantity']} - €{item_total:.2f}"
-                self.order_listbox.insert(tk.END, display_text)
+            # Rows are kept in sync by the receipt's change events; only a new receipt is redrawn
+            self.order_view.attach(self.cashier.receipt)
 
 if __name__ == "__main__":
     root = tk.Tk()
-    products = [
-        Product("Coffee", 1.50, 10),
-        Product("Tea", 1.20, 15),
-        Product("Beer", 2.30, 20),
-        Product("Muffin", 2.00, 25),
-        Product("Sandwich", 3.50, 30),
-        Product("Cake", 2.50, 12),
-        Product("Pizza Margarita", 6.50, 8),
-        Product("Patatas Bravas", 5.50, 18),
-        # Add more products here
-        Product("New Product 1", 3.00, 15),
-        Product("New Product 2", 4.50, 10),
-        Product("New Product 3", 2.20, 20),
-        
-    ]
+    # The menu is read from products.json, or from the catalog file given on the command line
+    products = load_catalog(sys.argv[1] if len(sys.argv) > 1 else "products.json")
     app = CoffeeShopGUI(root, products)
     root.mainloop()
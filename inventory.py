@@ -0,0 +1,289 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+from cashier import assign_product_ids, require_product_ids
+
+log = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stock (
+    product_id INTEGER PRIMARY KEY,
+    on_hand INTEGER NOT NULL,
+    reserved INTEGER NOT NULL DEFAULT 0,
+    low_stock INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS reservations (
+    till TEXT NOT NULL,
+    product_id INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    PRIMARY KEY (till, product_id)
+);
+"""
+
+# Each till's reservations are tracked so it can drop them when it starts again after a crash
+UPDATE_RESERVATION = ("INSERT INTO reservations VALUES (?, ?, ?) ON CONFLICT (till, product_id) "
+                      "DO UPDATE SET quantity = quantity + excluded.quantity")
+
+# How long take_order may wait for another till's lock before giving up, in seconds
+RESERVE_TIMEOUT = 0.25
+
+_STOP = object()
+
+
+class OutOfStockError(Exception):
+    def __init__(self, product, available):
+        # Initialize the error with the product and how many are still available
+        super().__init__(f"Only {available} x {product.name} left in stock.")
+        self.product = product
+        self.available = available
+
+
+class StockBusyError(Exception):
+    def __init__(self):
+        # Initialize the error raised when the shared stock database stays locked for too long
+        super().__init__("The stock database is busy. Please try again.")
+
+
+class Inventory:
+    # Stock levels per product id: take_order reserves, remove_item releases, payment commits
+    def __init__(self, products, path=None, till=None, low_stock=3):
+        # Initialize stock from Product.quantity; with a path the counts are shared with other tills through SQLite,
+        # and the till id must stay the same across restarts so a restarted till can drop what it held before a crash
+        if path is not None and not till:
+            raise ValueError("A shared stock database needs a stable till id.")
+        if path is not None:
+            require_product_ids(products)
+        assign_product_ids(products)
+        self.products = {product.product_id: product for product in products}
+        self.on_hand = {}
+        self.reserved = {}
+        self.low_stock = {}
+        self.default_low_stock = low_stock
+        self.listeners = []
+        self.till = till
+        self.connection = None
+        self.writes = None
+        self.writer = None
+        # Last error of the writer thread; it keeps retrying the failed write until it succeeds
+        self.error = None
+        # First write the writer had to drop since the last flush(), which raises it
+        self.failure = None
+        for product_id, product in self.products.items():
+            self.on_hand[product_id] = product.quantity
+            self.reserved[product_id] = 0
+            self.low_stock[product_id] = low_stock
+        if path is not None:
+            self.open_store(path)
+
+    def open_store(self, path):
+        # Connect to the shared stock database, seed unknown products and drop this till's stale reservations
+        # The server opens the store here and then reserves stock from its stock thread, one thread at a time
+        self.connection = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        with self.transaction() as cursor:
+            cursor.executemany(
+                "INSERT OR IGNORE INTO stock (product_id, on_hand, low_stock) VALUES (?, ?, ?)",
+                [(product_id, self.on_hand[product_id], self.low_stock[product_id]) for product_id in self.products])
+            stale = cursor.execute("SELECT product_id, quantity FROM reservations WHERE till = ?", (self.till,)).fetchall()
+            cursor.executemany("UPDATE stock SET reserved = reserved - ? WHERE product_id = ?",
+                               [(quantity, product_id) for product_id, quantity in stale])
+            cursor.execute("DELETE FROM reservations WHERE till = ?", (self.till,))
+        self.refresh()
+        # From here on the till thread only waits briefly for a lock, in reserve; every other write goes to the
+        # writer thread, like the sales store, so a slow till never freezes the UI or the server's event loop
+        self.connection.execute(f"PRAGMA busy_timeout = {int(RESERVE_TIMEOUT * 1000)}")
+        self.writes = queue.Queue()
+        self.writer = threading.Thread(target=self.run_writes, args=(path,), name="stock-writer", daemon=True)
+        self.writer.start()
+
+    def transaction(self):
+        # Context manager for a write transaction that locks out the other tills until it ends
+        return _Transaction(self.connection)
+
+    def queue_write(self, statements):
+        # Hand a list of (sql, rows) statements to the writer thread, to run in one transaction
+        self.writes.put(statements)
+
+    def run_writes(self, path):
+        # Writer loop: run queued writes in order, retrying a write until the database accepts it
+        connection = sqlite3.connect(path, timeout=5, isolation_level=None)
+        while True:
+            statements = self.writes.get()
+            if statements is _STOP:
+                connection.close()
+                self.writes.task_done()
+                return
+            while True:
+                try:
+                    with _Transaction(connection) as cursor:
+                        for sql, rows in statements:
+                            cursor.executemany(sql, rows)
+                except sqlite3.OperationalError as error:
+                    self.error = error
+                    time.sleep(0.5)
+                except Exception as error:
+                    # Trying again would fail the same way, e.g. rows that break a constraint; the write is
+                    # dropped so the writes behind it still go through
+                    log.error("Could not write stock changes: %s", error)
+                    if self.failure is None:
+                        self.failure = error
+                    self.error = None
+                    break
+                else:
+                    self.error = None
+                    break
+            self.writes.task_done()
+
+    def flush(self):
+        # Wait until every queued write has reached the database; raises the error of a write that was dropped
+        if self.writes is not None:
+            self.writes.join()
+        failure, self.failure = self.failure, None
+        if failure is not None:
+            raise failure
+
+    def close(self):
+        # Finish the queued writes and close the database
+        if self.connection is not None:
+            self.writes.put(_STOP)
+            self.writer.join()
+            self.connection.close()
+            self.connection = None
+
+    def refresh(self):
+        # Reload every product's counts from the shared store
+        rows = self.connection.execute("SELECT product_id, on_hand, reserved, low_stock FROM stock").fetchall()
+        for product_id, on_hand, reserved, low_stock in rows:
+            if product_id in self.products:
+                self.on_hand[product_id] = on_hand
+                self.reserved[product_id] = reserved
+                self.low_stock[product_id] = low_stock
+                self.products[product_id].quantity = on_hand
+
+    def subscribe(self, listener):
+        # Register a callback called as listener(product, available) when a product drops to its low-stock threshold
+        self.listeners.append(listener)
+
+    def available(self, product_id):
+        # Units that can still be sold
+        return self.on_hand[product_id] - self.reserved[product_id]
+
+    def reserve(self, product_id, quantity):
+        # Hold stock for a receipt line, or raise OutOfStockError
+        if self.connection is None:
+            available = self.on_hand[product_id] - self.reserved[product_id]
+            if quantity > available:
+                raise OutOfStockError(self.products[product_id], available)
+            self.reserved[product_id] += quantity
+        else:
+            # The answer is needed right away, so this write runs here, but waits at most RESERVE_TIMEOUT for a lock
+            try:
+                with self.transaction() as cursor:
+                    cursor.execute("UPDATE stock SET reserved = reserved + ? "
+                                   "WHERE product_id = ? AND on_hand - reserved >= ?", (quantity, product_id, quantity))
+                    reserved = cursor.rowcount == 1
+                    if reserved:
+                        cursor.execute(UPDATE_RESERVATION, (self.till, product_id, quantity))
+                    on_hand, self.reserved[product_id] = cursor.execute(
+                        "SELECT on_hand, reserved FROM stock WHERE product_id = ?", (product_id,)).fetchone()
+                    self.on_hand[product_id] = on_hand
+            except sqlite3.OperationalError:
+                raise StockBusyError()
+            if not reserved:
+                raise OutOfStockError(self.products[product_id], self.available(product_id))
+        self.check_low_stock(product_id)
+
+    def add_products(self, products):
+        # Start tracking stock for products added to the menu while the till runs; known products are left alone
+        new = [product for product in products if product.product_id not in self.products]
+        if self.connection is not None:
+            require_product_ids(new)
+        for product in new:
+            self.products[product.product_id] = product
+            self.on_hand[product.product_id] = product.quantity
+            self.reserved[product.product_id] = 0
+            self.low_stock[product.product_id] = self.default_low_stock
+        if self.connection is not None and new:
+            self.queue_write([("INSERT OR IGNORE INTO stock (product_id, on_hand, low_stock) VALUES (?, ?, ?)",
+                               [(product.product_id, product.quantity, self.default_low_stock) for product in new])])
+
+    def release(self, product_id, quantity):
+        # Give back stock held for a removed receipt line
+        self.reserved[product_id] -= quantity
+        if self.connection is not None:
+            self.queue_write([("UPDATE stock SET reserved = reserved - ? WHERE product_id = ?", [(quantity, product_id)]),
+                              (UPDATE_RESERVATION, [(self.till, product_id, -quantity)])])
+
+    def release_receipt(self, receipt):
+        # Give back all stock held for an abandoned receipt
+        for product_id, quantity in self.receipt_quantities(receipt).items():
+            self.release(product_id, quantity)
+
+    def commit_receipt(self, receipt):
+        # Turn the reservations of a paid receipt into sold stock
+        sold = self.receipt_quantities(receipt)
+        for product_id, quantity in sold.items():
+            self.on_hand[product_id] -= quantity
+            self.reserved[product_id] -= quantity
+            self.products[product_id].quantity = self.on_hand[product_id]
+        if self.connection is not None:
+            self.queue_write([
+                ("UPDATE stock SET on_hand = on_hand - ?, reserved = reserved - ? WHERE product_id = ?",
+                 [(quantity, quantity, product_id) for product_id, quantity in sold.items()]),
+                (UPDATE_RESERVATION, [(self.till, product_id, -quantity) for product_id, quantity in sold.items()])])
+
+    def restock(self, quantities):
+        # Add delivered stock, given as {product_id: quantity}
+        for product_id, quantity in quantities.items():
+            self.on_hand[product_id] += quantity
+            self.products[product_id].quantity = self.on_hand[product_id]
+        if self.connection is not None:
+            self.queue_write([("UPDATE stock SET on_hand = on_hand + ? WHERE product_id = ?",
+                               [(quantity, product_id) for product_id, quantity in quantities.items()])])
+
+    def set_low_stock(self, thresholds):
+        # Change low-stock thresholds, given as {product_id: threshold}
+        self.low_stock.update(thresholds)
+        if self.connection is not None:
+            self.queue_write([("UPDATE stock SET low_stock = ? WHERE product_id = ?",
+                               [(threshold, product_id) for product_id, threshold in thresholds.items()])])
+
+    def low_stock_items(self):
+        # Products at or below their low-stock threshold
+        return [product for product_id, product in self.products.items()
+                if self.available(product_id) <= self.low_stock[product_id]]
+
+    def check_low_stock(self, product_id):
+        # Tell the listeners if a product has reached its low-stock threshold
+        if self.listeners:
+            available = self.available(product_id)
+            if available <= self.low_stock[product_id]:
+                for listener in self.listeners:
+                    listener(self.products[product_id], available)
+
+    @staticmethod
+    def receipt_quantities(receipt):
+        # Total quantity per product on a receipt
+        quantities = {}
+        for product_id, quantity in zip(receipt.items.product_ids, receipt.items.quantities):
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        return quantities
+
+
+class _Transaction:
+    # BEGIN IMMEDIATE ... COMMIT/ROLLBACK around a block of statements
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection.cursor()
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.connection.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
@@ -0,0 +1,175 @@
+import json
+import os
+import queue
+import threading
+import time
+
+# When to fsync the journal: after every order, every N orders, or every T milliseconds
+SYNC_EVERY_ORDER = "order"
+SYNC_EVERY_N = "count"
+SYNC_EVERY_MS = "interval"
+
+_STOP = object()
+
+
+class Journal:
+    # Append-only, line-delimited JSON log of completed orders, written by a background thread
+    def __init__(self, path, sync_mode=SYNC_EVERY_ORDER, sync_every=10, sync_interval_ms=500, max_pending=1000):
+        # Initialize the journal and start its writer thread
+        if sync_mode not in (SYNC_EVERY_ORDER, SYNC_EVERY_N, SYNC_EVERY_MS):
+            raise ValueError(f"Unknown sync mode: {sync_mode}")
+        self.path = path
+        self.sync_mode = sync_mode
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval_ms / 1000
+        self.pending = queue.Queue(max_pending)
+        self.stalls = 0
+        self.written = 0
+        self.synced = 0
+        self.error = None
+        # Lines of a batch whose write failed; they are written again before anything newer
+        self.failed = []
+        self.retry_interval = 1.0
+        repair(path)
+        self.file = open(path, "ab")
+        self.end = self.file.tell()
+        self.thread = threading.Thread(target=self.run, name="journal-writer", daemon=True)
+        self.thread.start()
+
+    def append(self, record):
+        # Queue a record for writing; only waits if the writer has fallen max_pending orders behind
+        line = json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n"
+        try:
+            self.pending.put_nowait(line)
+        except queue.Full:
+            self.stalls += 1
+            self.pending.put(line)
+
+    def record_receipt(self, receipt):
+        # Cashier listener: journal a paid receipt
+        self.append(receipt.to_record())
+
+    def run(self):
+        # Writer loop: write whatever is queued in one batch, then fsync according to the sync mode
+        unsynced = 0
+        last_sync = time.monotonic()
+        stopping = False
+        while True:
+            if self.failed or (self.error is not None and unsynced):
+                timeout = self.retry_interval
+            elif self.sync_mode == SYNC_EVERY_MS and unsynced:
+                timeout = self.sync_interval
+            else:
+                timeout = None
+            batch = []
+            if not stopping:
+                try:
+                    batch.append(self.pending.get(timeout=timeout))
+                except queue.Empty:
+                    pass
+                while True:
+                    try:
+                        batch.append(self.pending.get_nowait())
+                    except queue.Empty:
+                        break
+                if batch and batch[-1] is _STOP:
+                    batch.pop()
+                    stopping = True
+            batch = self.failed + batch
+            self.failed = []
+            try:
+                if batch:
+                    try:
+                        self.write_batch(batch)
+                    except OSError:
+                        self.failed = batch
+                        raise
+                    self.written += len(batch)
+                    unsynced += len(batch)
+                now = time.monotonic()
+                if unsynced and (stopping
+                                 or self.sync_mode == SYNC_EVERY_ORDER
+                                 or (self.sync_mode == SYNC_EVERY_N and unsynced >= self.sync_every)
+                                 or (self.sync_mode == SYNC_EVERY_MS and now - last_sync >= self.sync_interval)):
+                    os.fsync(self.file.fileno())
+                    self.synced = self.written
+                    unsynced = 0
+                    last_sync = now
+                self.error = None
+            except OSError as error:
+                # Keep the till running; the error is reported through self.error until a retry succeeds
+                self.error = error
+                if stopping:
+                    # Give up after one last attempt on close; the lines stay in self.failed
+                    return
+                continue
+            if stopping:
+                return
+
+    def write_batch(self, batch):
+        # Append a batch of lines; after a failed write the file is cut back to the end of the last good batch,
+        # so the retry does not leave half a batch or a duplicate record behind
+        if self.file is None:
+            self.file = open(self.path, "ab")
+            self.file.truncate(self.end)
+        try:
+            self.file.write(b"".join(batch))
+            # Flushing hands the batch to the OS so it survives a crash of the till process
+            self.file.flush()
+        except OSError:
+            file, self.file = self.file, None
+            try:
+                file.close()
+            except OSError:
+                pass
+            raise
+        self.end = self.file.tell()
+
+    def close(self):
+        # Write and fsync everything still queued, then stop the writer thread
+        self.pending.put(_STOP)
+        self.thread.join()
+        if self.file is not None:
+            self.file.close()
+
+
+def replay(path):
+    # Yield the records of a journal file in order, skipping a partly written last line
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as file:
+        for line in file:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                if line.endswith(b"\n"):
+                    raise
+                return
+
+
+def repair(path):
+    # Cut off a partly written last record left behind by a crash, so new records start on a fresh line
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as file:
+        end = file.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - 4096)
+            file.seek(start)
+            chunk = file.read(position - start)
+            newline = chunk.rfind(b"\n")
+            if newline != -1:
+                position = start + newline + 1
+                break
+            position = start
+        if position != end:
+            file.truncate(position)
+
+
+def restore_cashier(cashier, path):
+    # Replay a journal into a cashier so order numbering continues where it stopped; returns the records
+    records = list(replay(path))
+    if records:
+        cashier.next_order_number = records[-1]["order"] + 1
+    return records
@@ -1,5 +1,8 @@
-# Import the datetime module
+# Import the modules for dates, arguments, JSON records and standard input
+import argparse
 import datetime
+import json
+import sys
 
 # Define the class for a product
 class Product:
@@ -112,6 +115,99 @@ class Cashier:
     # Clear the receipt
     self.receipt = Receipt()
 
+# Define the function to read orders in batch mode
+def read_orders(lines):
+  # Yield (line number, [(index, quantity), ...]) for every order in the input
+  # An order is one JSONL record like {"lines": [[1, 2], [3, 1]]}, or a block of "index quantity" lines
+  # ended by a blank line or a 0, as in the interactive mode
+  block = []
+  block_start = None
+  for line_number, line in enumerate(lines, 1):
+    line = line.strip()
+    # Check if the line is a JSONL record
+    if line.startswith("{"):
+      # A record also ends an unfinished block
+      if block:
+        yield block_start, block
+        block = []
+      try:
+        record = json.loads(line)
+        yield line_number, [(item[0], item[1]) for item in record["lines"]]
+      except (ValueError, KeyError, TypeError, IndexError):
+        yield line_number, None
+      continue
+    # Check if the line ends the current block
+    if not line or line == "0":
+      if block:
+        yield block_start, block
+      block = []
+      continue
+    if not block:
+      block_start = line_number
+    choice = line.split()
+    if len(choice) == 2 and choice[0].isdigit() and choice[1].lstrip("-").isdigit():
+      block.append((int(choice[0]), int(choice[1])))
+    else:
+      # Keep the bad line so the whole order is reported as invalid
+      block.append((None, line))
+  if block:
+    yield block_start, block
+
+# Define the function to check an order against the menu
+def validate_order(products, order):
+  # Return an error message for the order, or None when every line is valid
+  if order is None:
+    return "Invalid JSON order record."
+  for index, quantity in order:
+    if index is None:
+      return f"Invalid input: {quantity}"
+    if not isinstance(index, int) or not 1 <= index <= len(products):
+      return f"Invalid product index: {index}"
+    if not isinstance(quantity, int) or quantity <= 0:
+      return f"Invalid quantity: {quantity}"
+  return None
+
+# Define the function to replay orders without prompting
+def run_batch(cashier, lines, totals_only=False, max_errors=20):
+  # Process every valid order through the cashier and report the invalid ones together at the end
+  products = cashier.products
+  quantities = [0] * len(products)
+  orders = 0
+  errors = []
+  for line_number, order in read_orders(lines):
+    error = validate_order(products, order)
+    if error is not None:
+      errors.append((line_number, error))
+      continue
+    orders += 1
+    if totals_only:
+      # Only count the items; the receipts are not printed
+      for index, quantity in order:
+        quantities[index - 1] += quantity
+    else:
+      cashier.process_order([(products[index - 1], quantity) for index, quantity in order])
+      cashier.complete_order()
+  if totals_only:
+    # Print the totals per product, summed in pence so a long day does not drift
+    grand_total = 0
+    print(f"Orders: {orders}")
+    print("-" * 40)
+    for product, quantity in zip(products, quantities):
+      if quantity:
+        pence = round(product.price * 100) * quantity
+        grand_total += pence
+        print(f"{product.name} x {quantity} - £{pence // 100}.{pence % 100:02d}")
+    print("-" * 40)
+    print(f"TOTAL: £{grand_total // 100}.{grand_total % 100:02d}")
+  # Report the invalid orders in one list instead of one message per line
+  if errors:
+    print(f"{len(errors)} invalid order(s) skipped:", file=sys.stderr)
+    for line_number, error in errors[:max_errors]:
+      print(f"  line {line_number}: {error}", file=sys.stderr)
+    if len(errors) > max_errors:
+      print(f"  ... and {len(errors) - max_errors} more", file=sys.stderr)
+  return orders, errors
+
 # Create a list of products
 products = [
 Product("Coffee", 1.50),
@@ -122,13 +218,30 @@ Product("Cake", 2.50),
 Product("Pizza Margarita", 6.50)
 ]
 
-# Create a cashier object
-cashier = Cashier(products)
+if __name__ == "__main__":
+  # Read the command line: no arguments keeps the interactive mode
+  parser = argparse.ArgumentParser(description="Coffee Place cashier")
+  parser.add_argument("--batch", nargs="?", const="-", metavar="FILE",
+                      help="replay orders from FILE, or from standard input when no file is given")
+  parser.add_argument("--totals", action="store_true", help="in batch mode, print totals instead of receipts")
+  args = parser.parse_args()
+
+  # Create a cashier object
+  cashier = Cashier(products)
+
+  if args.batch is not None:
+    # Replay the orders and exit with an error status if any were invalid
+    if args.batch == "-":
+      orders, errors = run_batch(cashier, sys.stdin, args.totals)
+    else:
+      with open(args.batch, encoding="utf-8") as file:
+        orders, errors = run_batch(cashier, file, args.totals)
+    sys.exit(1 if errors else 0)
 
-# Test the program
-# Take an order
-order = cashier.take_order()
-# Process the order
-cashier.process_order(order)
-# Complete the order
-cashier.complete_order()
+  # Test the program
+  # Take an order
+  order = cashier.take_order()
+  # Process the order
+  cashier.process_order(order)
+  # Complete the order
+  cashier.complete_order()
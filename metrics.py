@@ -0,0 +1,223 @@
+import functools
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cashier import Cashier, Receipt
+
+# Histogram buckets are 1/2**SUB_BITS of their value wide, so percentiles are within about 3% at any scale
+SUB_BITS = 5
+SUB_COUNT = 1 << SUB_BITS
+
+# Bucket bounds, in seconds, written out in the Prometheus export
+EXPORT_BOUNDS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Methods timed by instrument(): (class, method name, operation label)
+CASHIER_METHODS = (
+    (Cashier, "take_order", "take_order"),
+    (Cashier, "take_product", "take_product"),
+    (Cashier, "remove_item", "remove_item"),
+    (Cashier, "settle_order", "settle_order"),
+    (Receipt, "print_receipt", "print_receipt"),
+)
+
+
+def bucket_index(value):
+    # Bucket of a value in nanoseconds: exact below 2 * SUB_COUNT, then SUB_COUNT buckets per power of two
+    bits = value.bit_length()
+    if bits <= SUB_BITS + 1:
+        return value
+    shift = bits - SUB_BITS - 1
+    return (shift + 1) * SUB_COUNT + (value >> shift) - SUB_COUNT
+
+
+def bucket_bounds(index):
+    # Lowest and highest value in nanoseconds that fall into a bucket
+    if index < 2 * SUB_COUNT:
+        return index, index
+    shift = index // SUB_COUNT - 1
+    low = (index % SUB_COUNT + SUB_COUNT) << shift
+    return low, low + (1 << shift) - 1
+
+
+class Histogram:
+    # Log-linear latency histogram in the style of HdrHistogram, recording nanoseconds into fixed buckets
+    def __init__(self):
+        # Initialize empty buckets; 64-bit values need at most 60 groups of SUB_COUNT buckets
+        self.counts = [0] * (60 * SUB_COUNT)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value):
+        # Add one value in nanoseconds; bucket_index is inlined here, this runs on every timed call
+        bits = value.bit_length()
+        if bits > SUB_BITS + 1:
+            shift = bits - SUB_BITS - 1
+            index = (shift + 1) * SUB_COUNT + (value >> shift) - SUB_COUNT
+        else:
+            index = value
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percent):
+        # Value in nanoseconds below which the given percent of the recorded values fall
+        if not self.count:
+            return 0
+        wanted = max(1, -(-self.count * percent // 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= wanted:
+                return min(bucket_bounds(index)[1], self.max)
+        return self.max
+
+    def cumulative(self, bounds_ns):
+        # Number of values at or below each bound, for the Prometheus buckets
+        result = []
+        seen = 0
+        index = 0
+        for bound in bounds_ns:
+            while index < len(self.counts) and bucket_bounds(index)[1] <= bound:
+                seen += self.counts[index]
+                index += 1
+            result.append(seen)
+        return result
+
+
+class Metrics:
+    # Latency histograms and error counters per cashier operation, with file and HTTP export in Prometheus text
+    def __init__(self):
+        # Initialize empty metrics; nothing is measured until instrument() patches the methods
+        self.histograms = {}
+        self.errors = {}
+        self.patched = []
+        self.server = None
+
+    def histogram(self, operation):
+        # Histogram of an operation, created on first use
+        histogram = self.histograms.get(operation)
+        if histogram is None:
+            histogram = self.histograms[operation] = Histogram()
+            self.errors[operation] = 0
+        return histogram
+
+    def timer(self, operation):
+        # Context manager that records the time spent in its block
+        return _Timer(self, operation)
+
+    def wrap(self, operation, function):
+        # Return function wrapped so every call is timed, and counted as an error if it raises
+        histogram = self.histogram(operation)
+        clock = time.perf_counter_ns
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            except Exception:
+                self.errors[operation] += 1
+                raise
+            finally:
+                histogram.record(clock() - start)
+        return timed
+
+    def instrument(self, methods=CASHIER_METHODS):
+        # Time the given (class, method name, label) methods; when this is never called they run untouched
+        for cls, name, operation in methods:
+            original = cls.__dict__[name]
+            self.patched.append((cls, name, original))
+            setattr(cls, name, self.wrap(operation, original))
+
+    def restore(self):
+        # Put the original methods back
+        while self.patched:
+            cls, name, original = self.patched.pop()
+            setattr(cls, name, original)
+
+    def prometheus_text(self):
+        # All metrics in the Prometheus text exposition format
+        lines = ["# HELP cashier_operation_seconds Time spent in cashier operations.",
+                 "# TYPE cashier_operation_seconds histogram"]
+        bounds_ns = [int(bound * 1e9) for bound in EXPORT_BOUNDS]
+        for operation, histogram in sorted(self.histograms.items()):
+            label = f'op="{operation}"'
+            for bound, count in zip(EXPORT_BOUNDS, histogram.cumulative(bounds_ns)):
+                lines.append(f'cashier_operation_seconds_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'cashier_operation_seconds_bucket{{{label},le="+Inf"}} {histogram.count}')
+            lines.append(f"cashier_operation_seconds_sum{{{label}}} {histogram.total / 1e9:.9f}")
+            lines.append(f"cashier_operation_seconds_count{{{label}}} {histogram.count}")
+        lines.append("# HELP cashier_operation_errors_total Cashier operations that raised an error.")
+        lines.append("# TYPE cashier_operation_errors_total counter")
+        for operation, errors in sorted(self.errors.items()):
+            lines.append(f'cashier_operation_errors_total{{op="{operation}"}} {errors}')
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        # Lines with the count and p50/p99/max latency of every operation, for printing
+        lines = [f"{'operation':<22}{'count':>9}{'p50 us':>10}{'p99 us':>10}{'max us':>10}"]
+        for operation, histogram in sorted(self.histograms.items()):
+            lines.append(f"{operation:<22}{histogram.count:>9}{histogram.percentile(50) / 1e3:>10.1f}"
+                         f"{histogram.percentile(99) / 1e3:>10.1f}{histogram.max / 1e3:>10.1f}")
+        return lines
+
+    def write(self, path):
+        # Write the metrics to a file, e.g. for the node exporter's textfile collector; replaced atomically
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as file:
+            file.write(self.prometheus_text())
+        os.replace(temporary, path)
+
+    def serve(self, host="127.0.0.1", port=9464):
+        # Serve the metrics at http://host:port/metrics from a background thread
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+        return self.server
+
+    def close(self):
+        # Stop the HTTP endpoint, if any
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+class _Timer:
+    # Context manager made by Metrics.timer
+    def __init__(self, metrics, operation):
+        self.metrics = metrics
+        self.histogram = metrics.histogram(operation)
+        self.operation = operation
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.histogram.record(time.perf_counter_ns() - self.start)
+        if exc_type is not None:
+            self.metrics.errors[self.operation] += 1
+        return False
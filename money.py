@@ -0,0 +1,10 @@
+def to_cents(amount):
+    # Convert a euro amount to integer cents
+    return int(round(amount * 100))
+
+
+def format_cents(cents):
+    # Format integer cents as a euro amount with two decimals
+    sign = "-" if cents < 0 else ""
+    cents = abs(cents)
+    return f"{sign}{cents // 100}.{cents % 100:02d}"
@@ -0,0 +1,44 @@
+import tkinter as tk
+
+
+class OrderListView:
+    # Keeps an order listbox in sync with a Receipt by applying its change events row by row
+    def __init__(self, listbox):
+        # Initialize the view with the listbox it draws into
+        self.listbox = listbox
+        self.receipt = None
+
+    def attach(self, receipt):
+        # Show a receipt and follow its changes; does nothing if it is already shown
+        if receipt is self.receipt:
+            return
+        self.detach()
+        self.listbox.delete(0, tk.END)
+        if receipt is not None:
+            lines = [receipt.line_text(index) for index in range(len(receipt.items))]
+            if lines:
+                self.listbox.insert(tk.END, *lines)
+            receipt.subscribe(self.on_change)
+        self.receipt = receipt
+
+    def detach(self):
+        # Stop following the current receipt
+        if self.receipt is not None:
+            self.receipt.unsubscribe(self.on_change)
+            self.receipt = None
+
+    def show_text(self, text):
+        # Replace the rows with a block of text, e.g. a printed receipt
+        self.detach()
+        self.listbox.delete(0, tk.END)
+        self.listbox.insert(tk.END, *text.split("\n"))
+
+    def on_change(self, event, index):
+        # Apply a single receipt change to the matching listbox row
+        if event == "insert":
+            self.listbox.insert(index, self.receipt.line_text(index))
+        elif event == "delete":
+            self.listbox.delete(index)
+        elif event == "update":
+            self.listbox.delete(index)
+            self.listbox.insert(index, self.receipt.line_text(index))
@@ -0,0 +1,98 @@
+import html
+import time
+
+from money import format_cents
+
+
+class ReceiptTemplate:
+    # Plain-text receipt: header, one row per line, tax rows and footer, rendered in a single join
+    # Function applied to product names and tax labels before formatting, e.g. html.escape
+    escape = None
+
+    def __init__(self, title="COFFEE PALACE", width=40, date_format="%d-%m-%Y %H:%M:%S",
+                 footer="Thank you for your visit, \nsee you soon!"):
+        # Initialize the template and build its static parts once
+        self.title = title
+        self.width = width
+        self.date_format = date_format
+        self.footer = footer
+        self.stamp_second = None
+        self.stamp_text = None
+        self.compile()
+
+    def compile(self):
+        # Pre-build the fixed strings and row formats
+        separator = "-" * self.width + "\n"
+        self.header_format = self.title + " - {}\n" + separator
+        # Line rows are formatted with % as (name, quantity, euros, cents), the fastest path per line
+        self.line_format = "%s x %d - €%d.%02d\n"
+        self.tax_format = "{}: €{}\n"
+        self.total_format = separator + "TOTAL: €{}\n"
+        self.footer_text = "\n" + self.footer
+
+    def stamp(self, when):
+        # Format the receipt time, reusing the text while the second has not changed
+        second = int(when)
+        if second != self.stamp_second:
+            self.stamp_text = time.strftime(self.date_format, time.localtime(second))
+            self.stamp_second = second
+        return self.stamp_text
+
+    def parts(self, receipt, when=None):
+        # Return the receipt as a list of strings in output order
+        items = receipt.items
+        escape = self.escape
+        names = items.names if escape is None else map(escape, items.names)
+        line_format = self.line_format
+        parts = [self.header_format.format(self.stamp(time.time() if when is None else when))]
+        parts.extend([line_format % (name, quantity, subtotal // 100, subtotal % 100)
+                      for name, quantity, subtotal in zip(names, items.quantities, items.subtotals)])
+        tax_format = self.tax_format.format
+        for label, amount in receipt.tax_lines():
+            parts.append(tax_format(label if escape is None else escape(label), format_cents(amount)))
+        parts.append(self.total_format.format(format_cents(receipt.total_cents)))
+        parts.append(self.footer_text)
+        return parts
+
+    def render(self, receipt, when=None):
+        # Render the receipt as text
+        return "".join(self.parts(receipt, when))
+
+
+class HtmlReceiptTemplate(ReceiptTemplate):
+    # Receipt as a small HTML document, for screens and e-mailed receipts
+    escape = staticmethod(html.escape)
+
+    def compile(self):
+        self.header_format = ("<div class=\"receipt\"><h1>" + html.escape(self.title) + "</h1><p>{}</p><table>\n")
+        self.line_format = "<tr><td>%s</td><td>x %d</td><td>€%d.%02d</td></tr>\n"
+        self.tax_format = "<tr class=\"tax\"><td colspan=\"2\">{}</td><td>€{}</td></tr>\n"
+        self.total_format = "<tr class=\"total\"><th colspan=\"2\">TOTAL</th><th>€{}</th></tr>\n</table>"
+        self.footer_text = "<p>" + html.escape(self.footer).replace("\n", "<br>") + "</p></div>\n"
+
+
+class EscPosReceiptTemplate(ReceiptTemplate):
+    # Receipt as ESC/POS bytes for thermal printers, using code page 858 for the euro sign
+    INIT = "\x1b@\x1bt\x13"
+    BOLD_ON = "\x1bE\x01"
+    BOLD_OFF = "\x1bE\x00"
+    CENTER = "\x1ba\x01"
+    LEFT = "\x1ba\x00"
+    CUT = "\n\n\n\x1dV\x01"
+
+    def compile(self):
+        super().compile()
+        separator = "-" * self.width + "\n"
+        self.header_format = (self.INIT + self.CENTER + self.BOLD_ON + self.title + self.BOLD_OFF + "\n{}\n"
+                              + self.LEFT + separator)
+        self.total_format = separator + self.BOLD_ON + "TOTAL: €{}" + self.BOLD_OFF + "\n"
+        self.footer_text = "\n" + self.CENTER + self.footer + self.CUT
+
+    def render(self, receipt, when=None):
+        # Render the receipt as printer bytes
+        return "".join(self.parts(receipt, when)).encode("cp858", "replace")
+
+
+TEXT = ReceiptTemplate()
+HTML = HtmlReceiptTemplate()
+ESCPOS = EscPosReceiptTemplate()
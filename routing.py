@@ -0,0 +1,193 @@
+import heapq
+import itertools
+import json
+import threading
+import time
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Ticket:
+    # The part of an order one prep station makes, e.g. the drinks for the bar
+    def __init__(self, ticket_id, station, lines, created, prep_seconds, start_by, tab=None, till=None):
+        # Initialize a ticket with its lines as (name, quantity), when it was sent, how long its slowest line takes
+        # and when the station should start it so the whole order is ready together
+        self.ticket_id = ticket_id
+        self.station = station
+        self.lines = lines
+        self.created = created
+        self.prep_seconds = prep_seconds
+        self.start_by = start_by
+        self.tab = tab
+        self.till = till
+        # waiting, then taken by a screen, then done; or recalled when the order is changed or cancelled
+        self.state = "waiting"
+
+    def to_dict(self):
+        # Ticket as sent to the kitchen display screens
+        return {"id": self.ticket_id, "station": self.station, "tab": self.tab, "till": self.till,
+                "lines": [[name, quantity] for name, quantity in self.lines], "created": self.created,
+                "prep": self.prep_seconds, "start_by": self.start_by, "state": self.state}
+
+
+class Router:
+    # Sends the lines of completed orders to the prep stations that make them, by the station of each product.
+    # Each station has a heap of waiting tickets keyed by the time they should be started: an order's slow
+    # tickets come before its quick ones, and older orders before newer ones. Sending and taking a ticket are
+    # O(log n) in the tickets waiting; a recalled ticket stays in its heap and is skipped when it comes up.
+    def __init__(self, cashier, clock=time.time):
+        # Initialize the router for the products of a cashier
+        self.cashier = cashier
+        self.clock = clock
+        self.queues = {}
+        self.tickets = {}
+        self.waiting = {}
+        self.counter = itertools.count(1)
+        # Quantities per product already sent for each open receipt, so completing it again only sends additions
+        self.sent = weakref.WeakKeyDictionary()
+        self.condition = threading.Condition()
+        self.server = None
+
+    def route(self, receipt):
+        # Send the lines of a receipt not sent yet to their stations; returns the new tickets
+        sent = self.sent.setdefault(receipt, {})
+        quantities = {}
+        for product_id, name, _, quantity, _, _ in receipt.items:
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        by_station = {}
+        for product_id, quantity in quantities.items():
+            product = self.cashier.product_by_id.get(product_id)
+            new = quantity - sent.get(product_id, 0)
+            if product is None or product.station is None or new <= 0:
+                continue
+            by_station.setdefault(product.station, []).append((product.name, new, product.prep_seconds))
+            sent[product_id] = quantity
+        if not by_station:
+            return []
+        now = self.clock()
+        preps = {station: max(prep for _, _, prep in lines) for station, lines in by_station.items()}
+        ready_at = now + max(preps.values())
+        tickets = []
+        with self.condition:
+            for station, lines in by_station.items():
+                ticket = Ticket(next(self.counter), station, [(name, quantity) for name, quantity, _ in lines],
+                                now, preps[station], ready_at - preps[station], receipt.tab, self.cashier.till)
+                self.push(ticket)
+                tickets.append(ticket)
+            self.condition.notify_all()
+        return tickets
+
+    def push(self, ticket):
+        # Put a ticket on its station's heap; the ticket id breaks ties in arrival order
+        self.tickets[ticket.ticket_id] = ticket
+        heapq.heappush(self.queues.setdefault(ticket.station, []), (ticket.start_by, ticket.ticket_id, ticket))
+        self.waiting[ticket.station] = self.waiting.get(ticket.station, 0) + 1
+
+    def forget(self, receipt):
+        # Stop tracking what was sent for a receipt, e.g. when its tab is cancelled and the order may be rung again
+        self.sent.pop(receipt, None)
+
+    def recall(self, ticket_id):
+        # Take back a waiting ticket, e.g. when the order is cancelled; returns False when a screen already took it
+        with self.condition:
+            ticket = self.tickets.get(ticket_id)
+            if ticket is None or ticket.state != "waiting":
+                return False
+            ticket.state = "recalled"
+            self.waiting[ticket.station] -= 1
+            del self.tickets[ticket_id]
+            return True
+
+    def pop(self, station):
+        # Most urgent waiting ticket of a station, marked as taken, or None; the lock is held by the caller
+        heap = self.queues.get(station)
+        while heap:
+            _, _, ticket = heapq.heappop(heap)
+            if ticket.state == "waiting":
+                ticket.state = "taken"
+                self.waiting[station] -= 1
+                return ticket
+        return None
+
+    def next(self, station, timeout=None):
+        # Take the most urgent ticket of a station, waiting up to timeout seconds for one (forever when None);
+        # None when there is still no ticket
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.waiting.get(station, 0) > 0, timeout):
+                return None
+            return self.pop(station)
+
+    def peek(self, station, count=10):
+        # The count most urgent waiting tickets of a station without taking them, most urgent first
+        with self.condition:
+            heap = self.queues.get(station, [])
+            return [ticket for _, _, ticket in heapq.nsmallest(count + len(heap) - self.waiting.get(station, 0), heap)
+                    if ticket.state == "waiting"][:count]
+
+    def done(self, ticket_id):
+        # Mark a taken ticket as made; it is forgotten
+        with self.condition:
+            ticket = self.tickets.get(ticket_id)
+            if ticket is None or ticket.state != "taken":
+                raise ValueError(f"Ticket {ticket_id} is not being made.")
+            ticket.state = "done"
+            del self.tickets[ticket_id]
+
+    def stations(self):
+        # {station: waiting tickets}
+        with self.condition:
+            return dict(self.waiting)
+
+    def serve(self, host="127.0.0.1", port=9470):
+        # Serve the tickets to kitchen display screens at http://host:port from a background thread:
+        # GET /stations, GET /stations/<station>?count=n, POST /stations/<station>/next, POST /tickets/<id>/done
+        router = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def reply(self, status, data):
+                body = json.dumps(data).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                path, _, query = self.path.partition("?")
+                parts = path.strip("/").split("/")
+                if parts == ["stations"]:
+                    self.reply(200, router.stations())
+                elif len(parts) == 2 and parts[0] == "stations":
+                    count = int(query[6:]) if query.startswith("count=") and query[6:].isdigit() else 10
+                    self.reply(200, [ticket.to_dict() for ticket in router.peek(parts[1], count)])
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                parts = self.path.strip("/").split("/")
+                if len(parts) == 3 and parts[0] == "stations" and parts[2] == "next":
+                    ticket = router.next(parts[1], timeout=0)
+                    self.reply(200, None if ticket is None else ticket.to_dict())
+                elif len(parts) == 3 and parts[0] == "tickets" and parts[1].isdigit() and parts[2] == "done":
+                    try:
+                        router.done(int(parts[1]))
+                    except ValueError as error:
+                        self.reply(409, {"error": str(error)})
+                        return
+                    self.reply(200, {"id": int(parts[1])})
+                else:
+                    self.send_error(404)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, name="routing-http", daemon=True).start()
+        return self.server
+
+    def close(self):
+        # Stop the HTTP endpoint, if any
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
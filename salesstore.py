@@ -0,0 +1,277 @@
+import logging
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+from cashier import format_cents, require_product_ids
+from tax import taxes_of_record
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    product_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    price_cents INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS orders (
+    order_id TEXT PRIMARY KEY,
+    till TEXT NOT NULL,
+    order_number INTEGER NOT NULL,
+    opened REAL NOT NULL,
+    closed REAL NOT NULL,
+    paid_cents INTEGER NOT NULL,
+    total_cents INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS orders_closed ON orders (closed);
+CREATE TABLE IF NOT EXISTS order_lines (
+    order_id TEXT NOT NULL,
+    line_no INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    price_cents INTEGER NOT NULL,
+    subtotal_cents INTEGER NOT NULL,
+    PRIMARY KEY (order_id, line_no)
+);
+CREATE INDEX IF NOT EXISTS order_lines_product ON order_lines (product_id);
+CREATE TABLE IF NOT EXISTS order_taxes (
+    order_id TEXT NOT NULL,
+    tax_class TEXT NOT NULL,
+    rate_bp INTEGER NOT NULL,
+    gross_cents INTEGER NOT NULL,
+    tax_cents INTEGER NOT NULL,
+    PRIMARY KEY (order_id, tax_class)
+);
+CREATE TABLE IF NOT EXISTS sales_daily (
+    day TEXT NOT NULL,
+    product_id INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    revenue_cents INTEGER NOT NULL,
+    PRIMARY KEY (day, product_id)
+);
+CREATE TABLE IF NOT EXISTS sales_hourly (
+    hour TEXT PRIMARY KEY,
+    orders INTEGER NOT NULL,
+    revenue_cents INTEGER NOT NULL
+);
+"""
+
+UPSERT_PRODUCT = ("INSERT INTO products VALUES (?, ?, ?) ON CONFLICT (product_id) "
+                  "DO UPDATE SET name = excluded.name, price_cents = excluded.price_cents")
+
+# Sales databases from before orders were keyed by order id are moved over to the new tables on open
+MIGRATE_ORDER_IDS = """
+ALTER TABLE orders RENAME TO orders_old;
+ALTER TABLE order_lines RENAME TO order_lines_old;
+DROP INDEX IF EXISTS orders_closed;
+DROP INDEX IF EXISTS order_lines_product;
+""" + SCHEMA + """
+INSERT INTO orders SELECT ':' || order_number || ':' || CAST(closed * 1000 AS INTEGER), '', order_number,
+    opened, closed, paid_cents, total_cents FROM orders_old;
+INSERT INTO order_lines SELECT ':' || l.order_number || ':' || CAST(o.closed * 1000 AS INTEGER), l.line_no,
+    l.product_id, l.quantity, l.price_cents, l.subtotal_cents
+    FROM order_lines_old l JOIN orders_old o ON o.order_number = l.order_number;
+DROP TABLE order_lines_old;
+DROP TABLE orders_old;
+"""
+
+_STOP = object()
+
+log = logging.getLogger(__name__)
+
+
+def day_key(timestamp):
+    # Local calendar day of a timestamp, e.g. "2024-03-01"
+    return time.strftime("%Y-%m-%d", time.localtime(timestamp))
+
+
+def order_key(record):
+    # Id that identifies an order across tills and journal resets; records from before order ids get one
+    # built from till, number and closing time, so replaying an old journal twice still stores it once
+    if record.get("id"):
+        return record["id"]
+    return f"{record.get('till') or ''}:{record['order']}:{int(record['closed'] * 1000)}"
+
+
+def hour_key(timestamp):
+    # Local hour of a timestamp, e.g. "2024-03-01 13"
+    return time.strftime("%Y-%m-%d %H", time.localtime(timestamp))
+
+
+class SalesStore:
+    # SQLite sales database owned by a worker thread; every call returns a Future and never touches the disk itself
+    def __init__(self, path, batch_size=500):
+        # Initialize the store and start the worker thread that owns the connection
+        self.path = path
+        self.batch_size = batch_size
+        self.pending = queue.Queue()
+        # Last write error and the receipt records that failed to store; they can be passed to add_records again
+        self.error = None
+        self.failed = []
+        self.thread = threading.Thread(target=self.run, name="sales-store", daemon=True)
+        self.thread.start()
+
+    def submit(self, kind, *args):
+        # Queue a job for the worker thread and return its Future
+        future = Future()
+        self.pending.put((kind, args, future))
+        return future
+
+    def add_receipt(self, receipt):
+        # Cashier listener: store a paid receipt
+        return self.add_records([receipt.to_record()])
+
+    def add_records(self, records):
+        # Store many receipt records, e.g. replayed from the journal; failures are logged and kept in self.failed
+        records = list(records)
+        future = self.submit("orders", records)
+        future.add_done_callback(lambda future: self.check_stored(future, records))
+        return future
+
+    def check_stored(self, future, records):
+        # Keep the records of a failed insert so they are not lost without a trace
+        error = future.exception()
+        if error is not None:
+            self.error = error
+            self.failed.extend(records)
+            log.error("Could not store %d order(s) in %s: %s", len(records), self.path, error)
+
+    def add_products(self, products):
+        # Store or update product names and prices
+        require_product_ids(products)
+        rows = [(product.product_id, product.name, product.price_cents) for product in products]
+        return self.submit("products", rows)
+
+    def query(self, sql, params=()):
+        # Run a read query on the worker thread; the Future resolves to the list of rows
+        return self.submit("query", sql, params)
+
+    def sales_by_product(self, day=None):
+        # Quantity and revenue per product for one day (today by default), best sellers first
+        day = day or day_key(time.time())
+        return self.query(
+            "SELECT s.product_id, COALESCE(p.name, '?'), s.quantity, s.revenue_cents FROM sales_daily s "
+            "LEFT JOIN products p ON p.product_id = s.product_id WHERE s.day = ? ORDER BY s.revenue_cents DESC",
+            (day,))
+
+    def revenue_per_hour(self, first_day, last_day):
+        # Orders and revenue per hour between two days, inclusive
+        return self.query(
+            "SELECT hour, orders, revenue_cents FROM sales_hourly WHERE hour >= ? AND hour < ? ORDER BY hour",
+            (first_day, last_day + "~"))
+
+    def close(self):
+        # Finish the queued jobs and stop the worker thread
+        self.pending.put((_STOP, (), None))
+        self.thread.join()
+
+    def run(self):
+        # Worker loop: group queued orders into one transaction, run other jobs one by one
+        connection = sqlite3.connect(self.path)
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(orders)")]
+        if columns and "order_id" not in columns:
+            connection.executescript("BEGIN;" + MIGRATE_ORDER_IDS + "COMMIT;")
+        connection.executescript(SCHEMA)
+        while True:
+            jobs = [self.pending.get()]
+            while len(jobs) < self.batch_size:
+                try:
+                    jobs.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            orders = [job for job in jobs if job[0] == "orders"]
+            if orders:
+                try:
+                    with connection:
+                        for _, (records,), _ in orders:
+                            self.insert_orders(connection, records)
+                except (sqlite3.Error, KeyError, TypeError, ValueError):
+                    # Store the jobs one by one so a bad record only fails its own job
+                    for _, (records,), future in orders:
+                        try:
+                            with connection:
+                                self.insert_orders(connection, records)
+                        except (sqlite3.Error, KeyError, TypeError, ValueError) as error:
+                            future.set_exception(error)
+                        else:
+                            future.set_result(None)
+                else:
+                    for _, _, future in orders:
+                        future.set_result(None)
+            for kind, args, future in jobs:
+                if kind is _STOP:
+                    connection.close()
+                    return
+                if kind == "orders":
+                    continue
+                try:
+                    if kind == "products":
+                        with connection:
+                            connection.executemany(UPSERT_PRODUCT, args[0])
+                        future.set_result(None)
+                    else:
+                        future.set_result(connection.execute(*args).fetchall())
+                except sqlite3.Error as error:
+                    future.set_exception(error)
+
+    def insert_orders(self, connection, records):
+        # Insert orders with their lines and tax breakdown, and fold them into the daily and hourly aggregates
+        keys = [order_key(record) for record in records]
+        known = set()
+        for start in range(0, len(keys), 900):
+            chunk = keys[start:start + 900]
+            known.update(row[0] for row in connection.execute(
+                f"SELECT order_id FROM orders WHERE order_id IN ({','.join('?' * len(chunk))})", chunk))
+        orders = []
+        lines = []
+        taxes = []
+        products = {}
+        daily = {}
+        hourly = {}
+        for key, record in zip(keys, records):
+            if key in known:
+                continue
+            known.add(key)
+            closed = record["closed"]
+            orders.append((key, record.get("till") or "", record["order"], record["opened"], closed,
+                           record["paid"], record["total"]))
+            day = day_key(closed)
+            for line_no, line in enumerate(record["lines"]):
+                product_id, name, price, quantity = line[:4]
+                products[product_id] = (product_id, name, price)
+                subtotal = price * quantity
+                lines.append((key, line_no, product_id, quantity, price, subtotal))
+                totals = daily.setdefault((day, product_id), [0, 0])
+                totals[0] += quantity
+                totals[1] += subtotal
+            taxes.extend((key, code, rate_bp, gross, tax) for code, rate_bp, gross, tax in taxes_of_record(record))
+            totals = hourly.setdefault(hour_key(closed), [0, 0])
+            totals[0] += 1
+            totals[1] += record["total"]
+        connection.executemany(UPSERT_PRODUCT, products.values())
+        connection.executemany("INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?, ?)", orders)
+        connection.executemany("INSERT INTO order_lines VALUES (?, ?, ?, ?, ?, ?)", lines)
+        connection.executemany("INSERT INTO order_taxes VALUES (?, ?, ?, ?, ?)", taxes)
+        connection.executemany(
+            "INSERT INTO sales_daily VALUES (?, ?, ?, ?) ON CONFLICT (day, product_id) DO UPDATE SET "
+            "quantity = quantity + excluded.quantity, revenue_cents = revenue_cents + excluded.revenue_cents",
+            [(day, product_id, quantity, revenue) for (day, product_id), (quantity, revenue) in daily.items()])
+        connection.executemany(
+            "INSERT INTO sales_hourly VALUES (?, ?, ?) ON CONFLICT (hour) DO UPDATE SET "
+            "orders = orders + excluded.orders, revenue_cents = revenue_cents + excluded.revenue_cents",
+            [(hour, count, revenue) for hour, (count, revenue) in hourly.items()])
+
+
+if __name__ == "__main__":
+    # Usage: python salesstore.py sales.journal sales.db [day]
+    from journal import replay
+
+    store = SalesStore(sys.argv[2])
+    store.add_records(replay(sys.argv[1])).result()
+    day = sys.argv[3] if len(sys.argv) > 3 else day_key(time.time())
+    print(f"Sales on {day}")
+    print("-" * 40)
+    for product_id, name, quantity, revenue in store.sales_by_product(day).result():
+        print(f"{name} x {quantity} - €{format_cents(revenue)}")
+    store.close()
@@ -0,0 +1,105 @@
+import queue
+import sys
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+
+class Task:
+    def __init__(self, name, on_done, on_error):
+        # Initialize a task with the callbacks to run on the Tk thread when it finishes
+        self.name = name
+        self.on_done = on_done
+        self.on_error = on_error
+        self.future = None
+        self.cancelled = False
+        self.submitted_at = time.perf_counter()
+
+    def cancel(self):
+        # Stop the task if it has not started, and never run its callbacks
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+
+
+class TaskScheduler:
+    # Runs slow work on a thread pool and hands the results back to the Tk thread, which polls a queue with
+    # master.after; also measures how long each callback keeps the Tk main loop busy
+    def __init__(self, master, workers=2, poll_ms=20, slow_ms=50):
+        # Initialize the pool and start polling for finished tasks
+        self.master = master
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="till-worker")
+        self.finished = queue.Queue()
+        self.poll_ms = poll_ms
+        self.slow_ms = slow_ms
+        # Per callback name: [calls, total ms, longest ms] on the Tk thread
+        self.timings = {}
+        self.poll_id = self.master.after(self.poll_ms, self.poll)
+
+    def submit(self, function, *args, on_done=None, on_error=None, name=None):
+        # Run function(*args) on a worker; on_done(result) or on_error(error) is then called on the Tk thread
+        task = Task(name or getattr(function, "__name__", "task"), on_done, on_error)
+        task.future = self.pool.submit(function, *args)
+        task.future.add_done_callback(lambda future: self.finished.put(task))
+        return task
+
+    def poll(self):
+        # Run the callbacks of the tasks that finished since the last poll; a callback that raises is reported
+        # and the others still run, and polling always goes on
+        try:
+            while True:
+                try:
+                    task = self.finished.get_nowait()
+                except queue.Empty:
+                    break
+                if task.cancelled:
+                    continue
+                try:
+                    result = task.future.result()
+                except CancelledError:
+                    continue
+                except Exception as error:
+                    if task.on_error is None:
+                        self.master.report_callback_exception(type(error), error, error.__traceback__)
+                        continue
+                    callback, argument = task.on_error, error
+                else:
+                    if task.on_done is None:
+                        continue
+                    callback, argument = task.on_done, result
+                try:
+                    self.run(task.name, callback, argument)
+                except Exception as error:
+                    self.master.report_callback_exception(type(error), error, error.__traceback__)
+        finally:
+            self.poll_id = self.master.after(self.poll_ms, self.poll)
+
+    def timed(self, name, callback):
+        # Wrap a Tk callback so its time on the main loop is recorded under the given name
+        def run_timed(*args):
+            return self.run(name, callback, *args)
+        return run_timed
+
+    def run(self, name, callback, *args):
+        # Call a callback on the Tk thread and record how long it took
+        start = time.perf_counter()
+        try:
+            return callback(*args)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            timing = self.timings.setdefault(name, [0, 0.0, 0.0])
+            timing[0] += 1
+            timing[1] += elapsed
+            timing[2] = max(timing[2], elapsed)
+            if elapsed >= self.slow_ms:
+                print(f"Slow callback {name}: {elapsed:.1f} ms on the main loop", file=sys.stderr)
+
+    def report(self):
+        # Lines with the calls, mean and longest main-loop time of every callback, busiest first
+        rows = sorted(self.timings.items(), key=lambda item: item[1][1], reverse=True)
+        return [f"{name:<20}{calls:>8}{total / calls:>10.2f} ms{longest:>10.2f} ms max"
+                for name, (calls, total, longest) in rows]
+
+    def close(self):
+        # Stop polling, drop the tasks that have not started and wait for the running ones
+        self.master.after_cancel(self.poll_id)
+        self.pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,160 @@
+import tkinter as tk
+
+
+def name_terms(name):
+    # Lower-case words of a product name
+    return name.lower().split()
+
+
+def name_prefixes(terms):
+    # Every distinct prefix of the given words; words such as "coffee cola" share prefixes and must count once
+    return {term[:end] for term in terms for end in range(1, len(term) + 1)}
+
+
+class ProductIndex:
+    # Maps every prefix of every word in a product name to the ids of the matching products, in menu order
+    def __init__(self, products):
+        # Initialize the index over a list of products
+        self.prefixes = {}
+        self.terms = {}
+        self.order = {}
+        self.all_ids = []
+        for product in products:
+            self.add(product)
+
+    def add(self, product):
+        # Index a product after the ones already indexed
+        product_id = product.product_id
+        self.order[product_id] = len(self.order)
+        self.all_ids.append(product_id)
+        terms = name_terms(product.name)
+        self.terms[product_id] = terms
+        for prefix in name_prefixes(terms):
+            ids = self.prefixes.setdefault(prefix, [])
+            # Skip the id if it is already the last entry, so a product is never listed twice under a prefix
+            if not ids or ids[-1] != product_id:
+                ids.append(product_id)
+
+    def remove(self, product_id):
+        # Drop a product from the index
+        for prefix in name_prefixes(self.terms.pop(product_id)):
+            ids = self.prefixes[prefix]
+            ids.remove(product_id)
+            if not ids:
+                del self.prefixes[prefix]
+        self.all_ids.remove(product_id)
+
+    def rename(self, product):
+        # Re-index a product after its name changed, keeping its place in menu order
+        position = self.order[product.product_id]
+        self.remove(product.product_id)
+        terms = name_terms(product.name)
+        self.terms[product.product_id] = terms
+        self.all_ids.insert(self.position_in(self.all_ids, position), product.product_id)
+        for prefix in name_prefixes(terms):
+            ids = self.prefixes.setdefault(prefix, [])
+            at = self.position_in(ids, position)
+            # Skip the id if it is already at its place, as in add
+            if at == len(ids) or ids[at] != product.product_id:
+                ids.insert(at, product.product_id)
+
+    def position_in(self, ids, position):
+        # Where a product at the given menu position belongs in a sorted id list
+        order = self.order
+        low, high = 0, len(ids)
+        while low < high:
+            middle = (low + high) // 2
+            if order[ids[middle]] < position:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def search(self, query):
+        # Ids of the products whose name has a word starting with each word of the query, in menu order
+        terms = name_terms(query)
+        if not terms:
+            return self.all_ids
+        lists = sorted((self.prefixes.get(term, ()) for term in set(terms)), key=len)
+        if len(lists) == 1:
+            return lists[0]
+        matches = set(lists[0])
+        for ids in lists[1:]:
+            matches.intersection_update(ids)
+            if not matches:
+                return []
+        return [product_id for product_id in lists[0] if product_id in matches]
+
+
+def row_changes(old, new):
+    # Listbox edits that turn the row list `old` into `new`, both in the same global order
+    # Returns (index, delete_count, inserted_rows) tuples to apply from the last to the first
+    new_set = set(new)
+    old_set = set(old)
+    changes = []
+    i = j = 0
+    while i < len(old) or j < len(new):
+        start = i
+        while i < len(old) and old[i] not in new_set:
+            i += 1
+        inserted_from = j
+        while j < len(new) and new[j] not in old_set:
+            j += 1
+        if i > start or j > inserted_from:
+            changes.append((start, i - start, new[inserted_from:j]))
+        if i < len(old) and j < len(new):
+            if old[i] != new[j]:
+                raise ValueError("Row lists must keep the same order and hold each product once.")
+            i += 1
+            j += 1
+        elif i == start and j == inserted_from:
+            # One list ran out while the other still holds shared rows, which only duplicates can cause
+            raise ValueError("Row lists must keep the same order and hold each product once.")
+    changes.reverse()
+    return changes
+
+
+class FilteredMenuView:
+    # Menu listbox showing the products that match the search box, addressed by product id
+    def __init__(self, listbox, cashier, index=None):
+        # Initialize the view and show the whole menu
+        self.listbox = listbox
+        self.cashier = cashier
+        self.index = index or ProductIndex(cashier.products)
+        self.visible = []
+        self.show(self.index.all_ids)
+
+    def row_text(self, product_id):
+        # Menu text of a product
+        return self.cashier.display_menu()[self.index.order[product_id]]
+
+    def show(self, product_ids):
+        # Change the rows to the given products, touching only the rows that differ
+        if not self.visible or not product_ids:
+            self.listbox.delete(0, tk.END)
+            if product_ids:
+                self.listbox.insert(tk.END, *[self.row_text(product_id) for product_id in product_ids])
+        else:
+            # Positions shift after each edit, so apply them from the bottom up
+            for position, deleted, inserted in row_changes(self.visible, product_ids):
+                if deleted:
+                    self.listbox.delete(position, position + deleted - 1)
+                if inserted:
+                    self.listbox.insert(position, *[self.row_text(product_id) for product_id in inserted])
+        self.visible = list(product_ids)
+
+    def filter(self, query):
+        # Show the products matching a search query
+        self.show(self.index.search(query))
+
+    def product_id_at(self, row):
+        # Product id shown in a listbox row
+        return self.visible[row]
+
+    def refresh(self, product_ids):
+        # Redraw the rows of products whose name or price changed, if they are visible
+        for product_id in product_ids:
+            if product_id in self.visible:
+                row = self.visible.index(product_id)
+                self.listbox.delete(row)
+                self.listbox.insert(row, self.row_text(product_id))
@@ -0,0 +1,226 @@
+import argparse
+import asyncio
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from cashier import Cashier
+from catalog import Catalog
+from inventory import Inventory, OutOfStockError, StockBusyError
+from journal import Journal, restore_cashier
+from till import till_id
+from metrics import Metrics
+
+# Protocol: one JSON object per line in each direction.
+# Request:  {"id": 1, "op": "take_order", "s": "session id", "a": [index, quantity]}
+# Response: {"id": 1, "ok": true, "r": result} or {"id": 1, "ok": false, "e": "message"}
+
+
+def encode(message):
+    # Serialize a message as one compact JSON line
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+class Session:
+    def __init__(self, cashier):
+        # Initialize an order session with its own cashier and a lock that serializes its operations
+        self.cashier = cashier
+        self.lock = asyncio.Lock()
+
+
+class CashierServer:
+    # One menu, one inventory and one sales ledger shared by every connected till
+    def __init__(self, products, inventory=None, merge_lines=False, till=None):
+        # Initialize the server with the shared menu, optional stock tracking and the till id its orders are stored under
+        self.products = products
+        self.till = till
+        self.inventory = inventory
+        self.merge_lines = merge_lines
+        self.sessions = {}
+        self.next_session = 1
+        self.next_order_number = 1
+        self.listeners = []
+        # Sessions share the menu cashier's id index, so opening one does not depend on the menu size
+        menu_cashier = Cashier(products)
+        self.product_by_id = menu_cashier.product_by_id
+        self.menu = menu_cashier.display_menu()
+        # Reserving stock in the shared database can wait on another till's lock, so with stock every session
+        # operation runs on one worker thread, which is then the only one using the inventory, and the event loop
+        # keeps answering the other tills
+        self.executor = ThreadPoolExecutor(1, "stock") if inventory is not None else None
+
+    def subscribe(self, listener):
+        # Register a callback called as listener(receipt) for every order paid on any till
+        self.listeners.append(listener)
+
+    def open_session(self):
+        # Start an order session and return its id
+        cashier = Cashier(self.products, self.merge_lines, self.inventory, self.till, self.product_by_id)
+        cashier.listeners = self.listeners
+        cashier.start_new_order()
+        session_id = str(self.next_session)
+        self.next_session += 1
+        self.sessions[session_id] = Session(cashier)
+        return session_id
+
+    def close_session(self, session_id):
+        # Drop a session, releasing any stock its open order still holds
+        session = self.sessions.pop(session_id)
+        if self.inventory is not None and session.cashier.receipt.items:
+            self.inventory.release_receipt(session.cashier.receipt)
+
+    def settle_order(self, cashier, payment_cents):
+        # Pay the session's order using the server-wide order numbering
+        receipt = cashier.receipt
+        if not receipt.items:
+            raise ValueError("No items in the order.")
+        if payment_cents < receipt.total_cents:
+            raise ValueError("Insufficient payment.")
+        cashier.next_order_number = self.next_order_number
+        change = cashier.settle_order(payment_cents)
+        self.next_order_number = cashier.next_order_number
+        return {"order": receipt.order_number, "change": change}
+
+    def dispatch(self, cashier, op, args):
+        # Run one session operation and return its result
+        if op == "take_order":
+            index, quantity = args
+            if not 0 <= index < len(self.products) or quantity <= 0:
+                raise ValueError("Invalid product index or quantity.")
+            cashier.take_order(index, quantity)
+            return cashier.receipt.total_cents
+        if op == "remove_item":
+            cashier.remove_item(*args)
+            return cashier.receipt.total_cents
+        if op == "receipt":
+            receipt = cashier.receipt
+            return {"lines": [receipt.line_text(i) for i in range(len(receipt.items))], "total": receipt.total_cents}
+        if op == "complete_order":
+            return cashier.complete_order()
+        if op == "settle_order":
+            return self.settle_order(cashier, *args)
+        raise ValueError(f"Unknown operation: {op}")
+
+    async def run(self, function, *args):
+        # Run a session operation, on the stock thread when the server tracks stock
+        if self.executor is None:
+            return function(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def handle(self, request, opened=None):
+        # Answer one request; sessions opened or closed are tracked in the connection's `opened` set
+        if not isinstance(request, dict):
+            raise ValueError("Request must be a JSON object.")
+        op = request.get("op")
+        if op == "open":
+            session_id = self.open_session()
+            if opened is not None:
+                opened.add(session_id)
+            return session_id
+        if op == "menu":
+            return self.menu
+        session = self.sessions.get(request.get("s"))
+        if session is None:
+            raise ValueError("Unknown session.")
+        if op == "close":
+            async with session.lock:
+                await self.run(self.close_session, request["s"])
+            if opened is not None:
+                opened.discard(request["s"])
+            return None
+        async with session.lock:
+            return await self.run(self.dispatch, session.cashier, op, request.get("a", []))
+
+    async def serve_client(self, reader, writer):
+        # Read requests from one connection until it closes, then close the sessions it left open
+        opened = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request_id = None
+                try:
+                    request = json.loads(line)
+                    if isinstance(request, dict):
+                        request_id = request.get("id")
+                    response = {"id": request_id, "ok": True, "r": await self.handle(request, opened)}
+                except (ValueError, TypeError, KeyError, OutOfStockError, StockBusyError) as error:
+                    response = {"id": request_id, "ok": False, "e": str(error)}
+                except sqlite3.Error as error:
+                    response = {"id": request_id, "ok": False, "e": f"Stock database error: {error}"}
+                writer.write(encode(response))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            # A till that disconnects without closing its sessions must not keep their reserved stock. The stock
+            # thread runs operations in order, so the sessions are closed there after whatever is still running,
+            # and nothing here waits, so a shutdown cannot cut this short.
+            for session_id in opened:
+                if session_id in self.sessions:
+                    if self.executor is None:
+                        self.close_session(session_id)
+                    else:
+                        self.executor.submit(self.close_session, session_id)
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8765, path=None):
+        # Listen on a Unix socket if a path is given, otherwise on a local TCP port
+        if path is not None:
+            return await asyncio.start_unix_server(self.serve_client, path=path)
+        return await asyncio.start_server(self.serve_client, host, port)
+
+    def close(self):
+        # Finish the stock operations still running
+        if self.executor is not None:
+            self.executor.shutdown()
+
+
+async def main(args):
+    products = Catalog(args.catalog).products
+    till = till_id(args.till_file)
+    inventory = Inventory(products, args.stock, till) if args.stock else None
+    server = CashierServer(products, inventory, merge_lines=True, till=till)
+    journal = None
+    if args.journal:
+        counter = Cashier(products)
+        restore_cashier(counter, args.journal)
+        server.next_order_number = counter.next_order_number
+        journal = Journal(args.journal)
+        server.subscribe(journal.record_receipt)
+    metrics = None
+    if args.metrics_port:
+        # Opt-in latency histograms for every cashier operation, served in Prometheus text format
+        metrics = Metrics()
+        metrics.instrument()
+        metrics.serve(port=args.metrics_port)
+    listener = await server.start(args.host, args.port, args.unix)
+    print(f"Cashier server listening on {args.unix or f'{args.host}:{args.port}'}")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+        if journal is not None:
+            journal.close()
+        if inventory is not None:
+            inventory.close()
+        if metrics is not None:
+            metrics.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared cashier service for several tills")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="listen on this Unix socket path instead of TCP")
+    parser.add_argument("--journal", help="append paid orders to this journal")
+    parser.add_argument("--stock", help="shared stock database")
+    parser.add_argument("--catalog", default="products.json", help="JSON or CSV product catalog")
+    parser.add_argument("--metrics-port", type=int, help="serve latency metrics at http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--till-file", default="server-till.id", help="file that keeps this server's till id")
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,225 @@
+import json
+import os
+import queue
+import threading
+import time
+
+from inventory import OutOfStockError, StockBusyError
+from journal import replay, repair
+
+_STOP = object()
+
+
+def load_state(path):
+    # (seq, tabs) of the open orders saved at path: the base file, then the logged changes made after it; tabs maps
+    # tab id to [opened, lines]
+    seq = 0
+    tabs = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as file:
+            base = json.load(file)
+        seq = base["seq"]
+        tabs = {tab_id: [opened, lines] for tab_id, opened, lines in base["tabs"]}
+    for record in replay(f"{path}.log"):
+        if record[0] > seq:
+            seq = record[0]
+            apply_change(tabs, record[1:])
+    return seq, tabs
+
+
+def apply_change(tabs, change):
+    # Apply one logged change to the open orders by tab id
+    kind = change[0]
+    if kind == "insert":
+        tabs[change[1]][1].insert(change[2], change[3])
+    elif kind == "update":
+        tabs[change[1]][1][change[2]][3] = change[3]
+    elif kind == "delete":
+        del tabs[change[1]][1][change[2]]
+    elif kind == "new":
+        tabs[change[1]] = [change[2], change[3]]
+    elif kind == "close":
+        tabs.pop(change[1], None)
+    elif kind == "reset":
+        tabs.clear()
+        for tab_id, opened, lines in change[1]:
+            tabs[tab_id] = [opened, lines]
+
+
+def load_open_orders(path):
+    # The unfinished orders saved at path as [{"tab": id, "opened": time, "lines": [[id, name, price, quantity,
+    # tax], ...]}, ...], counter order first; empty when the till was closed with no order open
+    _, tabs = load_state(path)
+    orders = [{"tab": tab_id, "opened": opened, "lines": lines} for tab_id, (opened, lines) in tabs.items() if lines]
+    return sorted(orders, key=lambda order: (order["tab"] is not None, str(order["tab"])))
+
+
+def restore_orders(tabs, orders):
+    # Put unfinished orders back on their tabs at their original prices and stock holds; returns the lines that
+    # could not be put back as (tab id, line, error), e.g. when another till sold the last units meanwhile
+    cashier = tabs.cashier
+    skipped = []
+    for order in orders:
+        tab_id = order["tab"]
+        receipt = tabs.tabs.get(tab_id) or tabs.open(tab_id)
+        receipt.opened_at = order["opened"]
+        for line in order["lines"]:
+            product_id, name, price, quantity, tax_class = line
+            if product_id not in cashier.product_by_id:
+                skipped.append((tab_id, line, ValueError(f"{name} is no longer on the menu.")))
+                continue
+            if cashier.inventory is not None:
+                try:
+                    cashier.inventory.reserve(product_id, quantity)
+                except (OutOfStockError, StockBusyError) as error:
+                    skipped.append((tab_id, line, error))
+                    continue
+            receipt.add_line(product_id, name, price, quantity, tax_class)
+    return skipped
+
+
+def receipt_lines(receipt):
+    # Lines of a receipt as saved: [product id, name, price cents, quantity, tax class]
+    return [[product_id, name, price, quantity, tax_class]
+            for product_id, name, price, quantity, _, tax_class in receipt.items]
+
+
+class OrderSnapshots:
+    # Crash-safe copy of a till's open orders, one per tab. Each receipt change is queued as one small record, so
+    # the till pays the same for an edit whatever the receipt length; a background thread appends the records to
+    # path.log and, once the log is longer than the orders themselves, writes them all to path with an atomic
+    # rename and starts a new log. Records carry a sequence number, so a crash between the rename and the new log
+    # is harmless.
+    def __init__(self, path, interval=0.2, sync=True, min_compact=64):
+        # Initialize the snapshots and start the writer thread; interval is how long the writer gathers changes
+        # before writing them, and sync makes it fsync what it wrote
+        self.path = path
+        self.log_path = f"{path}.log"
+        self.interval = interval
+        self.sync = sync
+        self.min_compact = min_compact
+        # (receipt, listener) followed for each tab id
+        self.receipts = {}
+        self.pending = queue.Queue()
+        # Last write error; the writer rewrites the whole state on its next round, so nothing is lost for good
+        self.error = None
+        self.thread = threading.Thread(target=self.run, name="order-snapshots", daemon=True)
+        self.thread.start()
+
+    def follow(self, tabs):
+        # Keep snapshots of every open tab of a TabManager, replacing whatever was saved before with them
+        for tab_id, receipt in tabs.tabs.items():
+            self.watch(tab_id, receipt)
+        self.pending.put(("reset", [[tab_id, receipt.opened_at, receipt_lines(receipt)]
+                                    for tab_id, (receipt, _) in self.receipts.items()]))
+        tabs.subscribe(self.attach)
+
+    def attach(self, tab_id, receipt):
+        # Snapshot the receipt of a tab from now on, starting from its current lines; TabManager listener, with
+        # receipt None when the tab was closed
+        current = self.receipts.get(tab_id)
+        if current is not None and current[0] is receipt:
+            return
+        if receipt is None:
+            self.unwatch(tab_id)
+            self.pending.put(("close", tab_id))
+            return
+        self.watch(tab_id, receipt)
+        self.pending.put(("new", tab_id, receipt.opened_at, receipt_lines(receipt)))
+
+    def watch(self, tab_id, receipt):
+        # Listen to a tab's receipt instead of the one it had before
+        self.unwatch(tab_id)
+        listener = lambda event, index: self.on_change(tab_id, receipt, event, index)
+        receipt.subscribe(listener)
+        self.receipts[tab_id] = (receipt, listener)
+
+    def unwatch(self, tab_id):
+        # Stop listening to a tab's receipt
+        current = self.receipts.pop(tab_id, None)
+        if current is not None:
+            current[0].unsubscribe(current[1])
+
+    def on_change(self, tab_id, receipt, event, index):
+        # Receipt listener: queue the changed line only
+        items = receipt.items
+        if event == "insert":
+            self.pending.put(("insert", tab_id, index, [items.product_ids[index], items.names[index],
+                                                        items.prices[index], items.quantities[index],
+                                                        items.tax_classes[index]]))
+        elif event == "update":
+            self.pending.put(("update", tab_id, index, items.quantities[index]))
+        elif event == "delete":
+            self.pending.put(("delete", tab_id, index))
+
+    def close(self):
+        # Write the queued changes and stop the writer thread; the orders stay on disk for the next start
+        for tab_id in list(self.receipts):
+            self.unwatch(tab_id)
+        self.pending.put(_STOP)
+        self.thread.join()
+
+    def run(self):
+        # Writer loop: gather changes, apply them to a copy of the orders, then log them or rewrite the orders
+        seq, tabs = load_state(self.path)
+        repair(self.log_path)
+        log = open(self.log_path, "ab")
+        logged = 0
+        rewrite = False
+        while True:
+            changes = [self.pending.get()]
+            while True:
+                try:
+                    changes.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            stop = _STOP in changes
+            if stop:
+                changes = changes[:changes.index(_STOP)]
+            records = []
+            for change in changes:
+                seq += 1
+                apply_change(tabs, change)
+                if change[0] in ("new", "close", "reset"):
+                    # Tabs are opened and closed far less often than lines change, so the whole state is written
+                    rewrite = True
+                else:
+                    records.append(json.dumps([seq, *change], separators=(",", ":")).encode("utf-8") + b"\n")
+            logged += len(records)
+            try:
+                if rewrite or logged > max(self.min_compact, sum(len(lines) for _, lines in tabs.values())):
+                    log.close()
+                    self.write_base(seq, tabs)
+                    log = open(self.log_path, "wb")
+                    logged = 0
+                    rewrite = False
+                elif records:
+                    log.write(b"".join(records))
+                    log.flush()
+                    if self.sync:
+                        os.fsync(log.fileno())
+                self.error = None
+            except OSError as error:
+                # The log may now miss changes; the whole state is written again on the next round
+                self.error = error
+                rewrite = True
+                if log.closed:
+                    try:
+                        log = open(self.log_path, "ab")
+                    except OSError:
+                        pass
+            if stop:
+                log.close()
+                return
+            time.sleep(self.interval)
+
+    def write_base(self, seq, tabs):
+        # Replace the base file with every open order; the log is started again by the caller
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump({"seq": seq, "tabs": [[tab_id, opened, lines] for tab_id, (opened, lines) in tabs.items()]},
+                      file, separators=(",", ":"))
+            file.flush()
+            if self.sync:
+                os.fsync(file.fileno())
+        os.replace(temporary, self.path)
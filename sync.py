@@ -0,0 +1,251 @@
+import json
+import os
+import threading
+
+from inventory import Inventory
+from journal import repair, replay
+
+
+def write_json(path, data):
+    # Write JSON to path through a temporary file and an atomic rename, so readers never see half a file
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump(data, file, separators=(",", ":"))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+
+def read_json(path):
+    # JSON saved at path, or None when there is no such file
+    try:
+        with open(path, encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def batch_name(seq):
+    # File name of a batch; zero padded so a listing sorts by sequence number
+    return f"{seq:012d}.json"
+
+
+def read_stock(saved):
+    # {product_id: count} from JSON, where object keys are strings
+    return {int(product_id): count for product_id, count in saved.items()}
+
+
+def pending_line(entry):
+    # One line of the pending log
+    return json.dumps(entry, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+class TillSync:
+    # Replicates paid orders and stock changes between tills through a shared directory, e.g. a LAN share.
+    # Each till only ever writes its own subdirectory, as numbered batch files holding what changed since its
+    # previous batch: the new order records, and for each product whose stock it changed, the total it has
+    # changed that product's stock by so far. Batches are first written to a local outbox, so the till keeps
+    # selling while the share is unreachable, and copied over once it is back.
+    # Reading a batch twice does no harm: orders are stored by order id, and a stock total replaces the last one
+    # seen from that till instead of adding to it. A sync round reads and writes only the batches that are new.
+    def __init__(self, directory, till, outbox="sync-outbox", inventory=None):
+        # Initialize the sync for a till; inventory, if given, takes the stock changes of the other tills, and
+        # should then be this till's own stock rather than a stock database shared with the other tills
+        self.directory = directory
+        self.till = till
+        self.outbox = outbox
+        self.inventory = inventory
+        self.listeners = []
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        os.makedirs(outbox, exist_ok=True)
+        self.state_path = os.path.join(outbox, "state.json")
+        state = read_json(self.state_path) or {"seq": 0, "pushed": 0, "stock": {}, "peers": {}}
+        # Last batch written to the outbox and last one copied to the shared directory
+        self.seq = state["seq"]
+        self.pushed = state["pushed"]
+        # How much this till has changed each product's stock by, and per other till the last batch applied and
+        # its totals as applied to the inventory
+        self.stock = read_stock(state["stock"])
+        self.peers = {peer: {"seq": seen["seq"], "stock": read_stock(seen["stock"])}
+                      for peer, seen in state["peers"].items()}
+        self.orders = []
+        self.changed = set()
+        # Changes recorded since the last batch are logged as they come, so a till that stops before its next
+        # round still sends them. Entries hold stock totals rather than changes, so replaying one twice is harmless.
+        self.pending_path = os.path.join(outbox, "pending.jsonl")
+        repair(self.pending_path)
+        for entry in replay(self.pending_path):
+            if "order" in entry:
+                self.orders.append(entry["order"])
+            for product_id, total in read_stock(entry["stock"]).items():
+                self.stock[product_id] = total
+                self.changed.add(product_id)
+        self.pending = open(self.pending_path, "ab")
+        # Last error reaching the shared directory; the next round tries again
+        self.error = None
+
+    def subscribe(self, listener):
+        # Register a callback called as listener(records) with the order records of the other tills, e.g.
+        # SalesStore.add_records; a record can come again after a crash, so listeners must ignore known order ids
+        self.listeners.append(listener)
+
+    def record_receipt(self, receipt):
+        # Cashier listener: send a paid order, and the stock it sold, to the other tills
+        record = receipt.to_record()
+        quantities = Inventory.receipt_quantities(receipt)
+        with self.lock:
+            self.orders.append(record)
+            for product_id, quantity in quantities.items():
+                self.stock[product_id] = self.stock.get(product_id, 0) - quantity
+                self.changed.add(product_id)
+            self.log_pending(record, quantities)
+
+    def record_stock(self, quantities):
+        # Send stock added or taken out at this till, given as {product_id: quantity}, e.g. a delivery
+        with self.lock:
+            for product_id, quantity in quantities.items():
+                self.stock[product_id] = self.stock.get(product_id, 0) + quantity
+                self.changed.add(product_id)
+            self.log_pending(None, quantities)
+
+    def log_pending(self, record, quantities):
+        # Append a recorded change to the pending log, with the new totals of the products it changed; called
+        # with the lock held. A till that cannot write its own outbox still sends the change from memory.
+        entry = {"stock": {str(product_id): self.stock[product_id] for product_id in quantities}}
+        if record is not None:
+            entry["order"] = record
+        try:
+            self.pending.write(pending_line(entry))
+            self.pending.flush()
+        except OSError:
+            pass
+
+    def trim_pending(self):
+        # Rewrite the pending log with only the changes not in a batch yet; called with the lock held, after the
+        # state with the new batch was saved
+        temporary = f"{self.pending_path}.tmp"
+        try:
+            with open(temporary, "wb") as file:
+                file.write(b"".join(pending_line({"order": record, "stock": {}}) for record in self.orders))
+                if self.changed:
+                    file.write(pending_line({"stock": {str(product_id): self.stock[product_id]
+                                                       for product_id in self.changed}}))
+            self.pending.close()
+            os.replace(temporary, self.pending_path)
+        except OSError:
+            # The old log is kept; what it holds beyond the batch is sent again, which the other tills ignore
+            pass
+        if self.pending.closed:
+            self.pending = open(self.pending_path, "ab")
+
+    def save_state(self):
+        # Write the sequence numbers and stock totals to the outbox
+        with self.save_lock:
+            with self.lock:
+                state = {"seq": self.seq, "pushed": self.pushed,
+                         "stock": {str(product_id): total for product_id, total in self.stock.items()},
+                         "peers": {peer: {"seq": seen["seq"],
+                                          "stock": {str(product_id): total
+                                                    for product_id, total in seen["stock"].items()}}
+                                   for peer, seen in self.peers.items()}}
+            write_json(self.state_path, state)
+
+    def exchange(self):
+        # One sync round, safe to run on a worker thread: put the changes since the last round in a new outbox
+        # batch, copy the outbox to the shared directory, and return the new batches of the other tills, to be
+        # passed to apply(). Only the outbox write raises; an unreachable share is kept in self.error.
+        # Rounds must not overlap, so run one at a time.
+        with self.lock:
+            orders, changed = self.orders, self.changed
+            self.orders, self.changed = [], set()
+            stock = {str(product_id): self.stock[product_id] for product_id in changed}
+            seen = {peer: peer_state["seq"] for peer, peer_state in self.peers.items()}
+        if orders or changed:
+            batch = {"till": self.till, "seq": self.seq + 1, "orders": orders, "stock": stock}
+            try:
+                write_json(os.path.join(self.outbox, batch_name(self.seq + 1)), batch)
+            except OSError:
+                # Sent with the next round instead
+                with self.lock:
+                    self.orders[:0] = orders
+                    self.changed |= changed
+                raise
+            with self.lock:
+                self.seq += 1
+            self.save_state()
+            with self.lock:
+                self.trim_pending()
+        try:
+            self.push(self.seq)
+            incoming = self.pull(seen)
+        except OSError as error:
+            self.error = error
+            return []
+        self.error = None
+        return incoming
+
+    def push(self, seq):
+        # Copy the outbox batches the shared directory does not have yet, oldest first
+        own = os.path.join(self.directory, self.till)
+        os.makedirs(own, exist_ok=True)
+        while self.pushed < seq:
+            name = batch_name(self.pushed + 1)
+            with open(os.path.join(self.outbox, name), "rb") as file:
+                data = file.read()
+            temporary = os.path.join(own, f"{name}.tmp")
+            with open(temporary, "wb") as file:
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary, os.path.join(own, name))
+            self.pushed += 1
+            self.save_state()
+            os.remove(os.path.join(self.outbox, name))
+
+    def pull(self, seen):
+        # The batches of the other tills after the last one applied from each, in order per till
+        incoming = []
+        for peer in sorted(os.listdir(self.directory)):
+            if peer == self.till or not os.path.isdir(os.path.join(self.directory, peer)):
+                continue
+            seq = seen.get(peer, 0)
+            while True:
+                batch = read_json(os.path.join(self.directory, peer, batch_name(seq + 1)))
+                if batch is None:
+                    break
+                incoming.append(batch)
+                seq += 1
+        return incoming
+
+    def apply(self, batches):
+        # Apply batches returned by exchange(): give their orders to the listeners and their stock changes to the
+        # inventory; batches already applied are skipped. Run this where the inventory is used, e.g. the Tk thread.
+        records = []
+        with self.lock:
+            for batch in batches:
+                peer = self.peers.setdefault(batch["till"], {"seq": 0, "stock": {}})
+                if batch["seq"] <= peer["seq"]:
+                    continue
+                records.extend(batch["orders"])
+                changes = {}
+                if self.inventory is not None:
+                    for product_id, total in read_stock(batch["stock"]).items():
+                        # Products not on this till's menu yet are taken up by the first batch after they are added
+                        if product_id in self.inventory.products:
+                            changes[product_id] = total - peer["stock"].get(product_id, 0)
+                            peer["stock"][product_id] = total
+                peer["seq"] = batch["seq"]
+                if changes:
+                    self.inventory.restock(changes)
+        # The listeners go first: after a crash in between, the batches are applied again, which they tolerate
+        if records:
+            for listener in self.listeners:
+                listener(records)
+        if batches:
+            self.save_state()
+        return records
+
+    def sync(self):
+        # One whole sync round on the calling thread; returns the order records received
+        return self.apply(self.exchange())
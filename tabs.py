@@ -0,0 +1,131 @@
+from cashier import Receipt
+
+
+class TabManager:
+    # Open receipts of one till kept by tab id, e.g. a table number, so several customers can be served at once.
+    # The tab with id None is the counter order. Switching only changes which receipt the cashier works on.
+    def __init__(self, cashier):
+        # Initialize the tabs with the cashier's current receipt as the counter order
+        self.cashier = cashier
+        if cashier.receipt is None:
+            cashier.start_new_order()
+        self.tabs = {None: cashier.receipt}
+        self.current = None
+        self.listeners = []
+
+    def __len__(self):
+        return len(self.tabs)
+
+    def subscribe(self, listener):
+        # Register a callback called as listener(tab_id, receipt) when a tab gets a new receipt, and as
+        # listener(tab_id, None) when it is closed
+        self.listeners.append(listener)
+
+    def notify(self, tab_id, receipt):
+        # Tell the listeners about a tab's new receipt, or None when it was closed
+        for listener in self.listeners:
+            listener(tab_id, receipt)
+
+    def receipt(self, tab_id):
+        # Open receipt of a tab
+        receipt = self.tabs.get(tab_id)
+        if receipt is None:
+            raise ValueError(f"There is no open tab {tab_id}.")
+        return receipt
+
+    def open(self, tab_id):
+        # Start an empty receipt for a new tab
+        if tab_id in self.tabs:
+            raise ValueError(f"Tab {tab_id} is already open.")
+        receipt = Receipt(self.cashier.merge_lines)
+        receipt.tab = tab_id
+        self.tabs[tab_id] = receipt
+        self.notify(tab_id, receipt)
+        return receipt
+
+    def switch(self, tab_id):
+        # Make a tab the cashier's current receipt, opening it first if needed; the other tabs are left untouched
+        receipt = self.tabs.get(tab_id)
+        if receipt is None:
+            receipt = self.open(tab_id)
+        self.current = tab_id
+        self.cashier.switch_receipt(receipt)
+        return receipt
+
+    def move_line(self, source_id, index, target_id, quantity=None):
+        # Move a line, or part of its quantity, to another tab at the price it was rung up at; the stock stays
+        # reserved, since both tabs belong to this till
+        source = self.receipt(source_id)
+        target = self.receipt(target_id)
+        if source is target:
+            raise ValueError("Lines can only be moved to another tab.")
+        items = source.items
+        if index < 0:
+            index += len(items)
+        if not 0 <= index < len(items):
+            raise ValueError("That line is no longer on the order.")
+        product_id, name, price, line_quantity, _, tax_class = items.line(index)
+        if quantity is None:
+            quantity = line_quantity
+        if not 0 < quantity <= line_quantity:
+            raise ValueError("Quantity to move must be between 1 and the line quantity.")
+        source.remove_item(index, None if quantity == line_quantity else quantity)
+        target.add_line(product_id, name, price, quantity, tax_class)
+
+    def split(self, source_id, lines, target_id):
+        # Move some lines to another tab, opening it if needed; lines maps line index to the quantity to move,
+        # or None for the whole line, e.g. to split a table's bill by guest
+        if target_id not in self.tabs:
+            self.open(target_id)
+        # Whole lines are removed from the source, so later indexes are moved first
+        for index in sorted(lines, reverse=True):
+            self.move_line(source_id, index, target_id, lines[index])
+        return self.tabs[target_id]
+
+    def merge(self, source_id, target_id):
+        # Move every line of a tab to another one and close it, e.g. when two tables join
+        source = self.receipt(source_id)
+        if source is self.receipt(target_id):
+            raise ValueError("A tab cannot be merged into itself.")
+        for _ in range(len(source.items)):
+            self.move_line(source_id, 0, target_id)
+        self.drop(source_id)
+
+    def cancel(self, tab_id):
+        # Close a tab without payment and give its stock back
+        receipt = self.receipt(tab_id)
+        if self.cashier.inventory is not None:
+            self.cashier.inventory.release_receipt(receipt)
+        self.drop(tab_id)
+
+    def drop(self, tab_id):
+        # Forget a tab; the counter order is replaced by an empty one instead, and the cashier moves to the counter
+        # when it was on the dropped tab
+        if tab_id is None:
+            self.tabs[None] = Receipt(self.cashier.merge_lines)
+            self.notify(None, self.tabs[None])
+        else:
+            del self.tabs[tab_id]
+            self.notify(tab_id, None)
+        if self.current == tab_id:
+            self.switch(None)
+
+    def settle(self, payment_cents):
+        # Take payment for the current tab through the cashier, close the tab and go back to the counter order
+        tab_id = self.current
+        change = self.cashier.settle_order(payment_cents)
+        if tab_id is None:
+            # The cashier has already started the next counter order
+            self.tabs[None] = self.cashier.receipt
+            self.notify(None, self.cashier.receipt)
+        else:
+            del self.tabs[tab_id]
+            self.notify(tab_id, None)
+            self.switch(None)
+        return change
+
+    def summary(self):
+        # (tab id, lines, total cents) of every open tab with items, counter order first, then by tab id
+        rows = [(tab_id, len(receipt.items), receipt.total_cents)
+                for tab_id, receipt in self.tabs.items() if receipt.items]
+        return sorted(rows, key=lambda row: (row[0] is not None, str(row[0])))
@@ -0,0 +1,72 @@
+class TaxClass:
+    # A tax rate that products are sold under; menu prices include the tax
+    def __init__(self, code, name, rate_bp):
+        # Initialize a tax class with a code used in catalogs and records, a printed name and a rate in basis points
+        self.code = code
+        self.name = name
+        self.rate_bp = rate_bp
+
+    @property
+    def label(self):
+        # Printed label, e.g. "IVA (10.0%)"
+        return f"{self.name} ({self.rate_bp / 100:.1f}%)"
+
+    def included(self, gross_cents):
+        # Tax contained in a tax-inclusive amount, rounded half up to the cent with integers only
+        divisor = 10000 + self.rate_bp
+        return (2 * gross_cents * self.rate_bp + divisor) // (2 * divisor)
+
+
+# Spanish IVA: food and non-alcoholic drinks served in hospitality are reduced, alcohol is general
+TAX_CLASSES = {tax.code: tax for tax in (
+    TaxClass("general", "IVA", 2100),
+    TaxClass("reduced", "IVA", 1000),
+    TaxClass("super_reduced", "IVA", 400),
+    TaxClass("exempt", "IVA", 0),
+)}
+
+# Class of products whose catalog entry names none; the general rate is the one that never undercharges
+DEFAULT_TAX_CLASS = "general"
+
+
+def tax_class(code):
+    # Tax class for a code, rejecting unknown codes so a typo in the catalog does not go unnoticed
+    tax = TAX_CLASSES.get(code)
+    if tax is None:
+        raise ValueError(f"Unknown tax class: {code}")
+    return tax
+
+
+def breakdown(gross_by_class):
+    # Per-class rows (tax class, gross cents, base cents, tax cents), highest rate first; each class is rounded
+    # once on its total, as on a Spanish simplified invoice, not line by line
+    rows = []
+    for code, gross in gross_by_class.items():
+        if gross:
+            tax = tax_class(code)
+            amount = tax.included(gross)
+            rows.append((tax, gross, gross - amount, amount))
+    rows.sort(key=lambda row: -row[0].rate_bp)
+    return rows
+
+
+def record_taxes(gross_by_class):
+    # Breakdown as plain lists [code, rate_bp, gross_cents, tax_cents] for journals and stores; the rate is kept
+    # so old records still add up after a rate change
+    return [[tax.code, tax.rate_bp, gross, amount] for tax, gross, _, amount in breakdown(gross_by_class)]
+
+
+def recorded_tax_lines(taxes):
+    # Printed (label, tax cents) rows of a breakdown made by record_taxes, at the rates it was recorded with
+    rows = []
+    for code, rate_bp, _, amount in taxes:
+        known = TAX_CLASSES.get(code)
+        rows.append((TaxClass(code, known.name if known is not None else "IVA", rate_bp).label, amount))
+    return rows
+
+
+def taxes_of_record(record):
+    # Tax breakdown of a receipt record; records from before tax classes were all taxed at the general rate
+    if "taxes" in record:
+        return record["taxes"]
+    return record_taxes({DEFAULT_TAX_CLASS: record["total"]})
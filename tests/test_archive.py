@@ -0,0 +1,87 @@
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archive import ReceiptArchive, record_lines
+from cashier import Cashier, Product
+from tax import TAX_CLASSES
+
+
+class ReceiptArchiveTest(unittest.TestCase):
+    def setUp(self):
+        # A cashier whose paid receipts go to an archive of small blocks, and the text each receipt printed
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+        products = [Product(f"Product {i}", 1.00 + i * 0.35, 10 ** 6, i, "reduced" if i % 2 else "general")
+                    for i in range(8)]
+        self.cashier = Cashier(products)
+        self.archive = ReceiptArchive(self.path, block_size=50)
+        self.cashier.subscribe(lambda receipt: self.archive.add_receipt(receipt))
+        self.printed = {}
+        self.cashier.subscribe(lambda receipt: self.printed.__setitem__(
+            receipt.order_number, receipt.print_receipt(when=receipt.closed_at)))
+        self.cashier.start_new_order()
+
+    def tearDown(self):
+        self.archive.close()
+        self.directory.cleanup()
+
+    def sell(self, orders):
+        rng = random.Random(orders)
+        for _ in range(orders):
+            for _ in range(rng.randint(1, 4)):
+                self.cashier.take_order(rng.randrange(len(self.cashier.products)), rng.randint(1, 3))
+            self.cashier.settle_order(10 ** 6)
+
+    def reopen(self):
+        self.archive.close()
+        self.archive = ReceiptArchive(self.path, block_size=50)
+
+    def test_reprints_match_printed_receipts_after_restart(self):
+        self.sell(237)
+        self.reopen()
+        self.assertEqual(len(self.archive.entries), 4)
+        self.assertEqual(len(self.archive.block), 37)
+        for number in (1, 50, 51, 200, 237):
+            self.assertEqual(self.archive.reprint(number), self.printed[number])
+        self.assertIsNone(self.archive.reprint(238))
+        self.assertEqual(len(self.archive.between(0, float("inf"))), 237)
+        count, raw, stored = self.archive.stats()
+        self.assertEqual(count, 200)
+        self.assertLess(stored, raw / 3)
+
+    def test_tail_left_behind_by_a_crash_is_cut_down(self):
+        # The till stopped after writing the last blocks but before cutting the tail down
+        self.sell(120)
+        self.reopen()
+        unfinished = list(self.archive.block)
+        written = self.archive.read_block(self.archive.entries[0]) + self.archive.read_block(self.archive.entries[1])
+        self.archive.close()
+        with open(os.path.join(self.path, "tail.jsonl"), "wb") as file:
+            file.write(record_lines(written + unfinished))
+        self.archive = ReceiptArchive(self.path, block_size=50)
+        self.assertEqual(self.archive.block, unfinished)
+        self.sell(30)
+        self.reopen()
+        self.assertEqual(self.archive.stats()[0] + len(self.archive.block), 150)
+
+    def test_reprint_keeps_the_rates_charged(self):
+        self.sell(60)
+        self.reopen()
+        reduced = TAX_CLASSES["reduced"]
+        rate_bp = reduced.rate_bp
+        reduced.rate_bp = 1500
+        try:
+            reprints = [self.archive.reprint(number) for number in range(1, 61)]
+            self.assertEqual(reprints, [self.printed[number] for number in range(1, 61)])
+            self.assertTrue(any("IVA (10.0%)" in text for text in reprints))
+        finally:
+            reduced.rate_bp = rate_bp
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cashier import Cashier, Product
+from fastentry import FastEntry
+
+
+class FastEntryTest(unittest.TestCase):
+    def setUp(self):
+        products = [Product("Coffee", 1.50, 100, 3), Product("Beer", 2.30, 100, 12)]
+        self.cashier = Cashier(products)
+        self.cashier.start_new_order()
+        self.entry = FastEntry(self.cashier)
+
+    def type(self, keys):
+        for key in keys:
+            status = self.entry.key(key)
+        return status
+
+    def test_quantity_and_code(self):
+        self.assertEqual(self.type(["2", "*", "1", "2", "Return"]), "Beer x 2")
+        self.assertEqual(self.entry.buffer, "")
+        self.assertEqual(list(self.cashier.receipt.items.quantities), [2])
+
+    def test_leading_zeros_are_ignored(self):
+        self.assertEqual(self.type(["0", "1", "2", "Return"]), "Beer x 1")
+        self.assertEqual(self.type(["0", "0", "3", "Return"]), "Coffee x 1")
+        self.assertEqual(list(self.cashier.receipt.items.product_ids), [12, 3])
+
+    def test_unknown_code_keeps_the_buffer(self):
+        with self.assertRaises(ValueError):
+            self.type(["4", "Return"])
+        self.assertEqual(self.entry.buffer, "4")
+        self.assertEqual(len(self.cashier.receipt.items), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
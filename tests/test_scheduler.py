@@ -0,0 +1,61 @@
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import TaskScheduler
+
+
+class FakeMaster:
+    # Stand-in for the Tk root: after() only records the callback, which the test runs by hand
+    def __init__(self):
+        self.timers = {}
+        self.next_id = 0
+        self.reported = []
+
+    def after(self, ms, function, *args):
+        self.next_id += 1
+        self.timers[self.next_id] = (function, args)
+        return self.next_id
+
+    def after_cancel(self, timer_id):
+        self.timers.pop(timer_id, None)
+
+    def report_callback_exception(self, exc_type, exc, traceback):
+        self.reported.append(exc)
+
+    def run_timers(self):
+        timers, self.timers = self.timers, {}
+        for function, args in timers.values():
+            function(*args)
+
+
+class TaskSchedulerTest(unittest.TestCase):
+    def wait_for(self, master, condition):
+        deadline = time.monotonic() + 5
+        while not condition() and time.monotonic() < deadline:
+            master.run_timers()
+            time.sleep(0.01)
+
+    def test_raising_callback_does_not_stop_polling(self):
+        master = FakeMaster()
+        scheduler = TaskScheduler(master)
+        delivered = []
+
+        def broken(result):
+            raise RuntimeError("callback failed")
+
+        scheduler.submit(lambda: 1, on_done=broken)
+        self.wait_for(master, lambda: master.reported)
+        self.assertIsInstance(master.reported[0], RuntimeError)
+        self.assertEqual(len(master.timers), 1)
+        scheduler.submit(lambda: 2, on_done=delivered.append)
+        self.wait_for(master, lambda: delivered)
+        self.assertEqual(delivered, [2])
+        scheduler.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
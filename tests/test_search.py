@@ -0,0 +1,79 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tkinter as tk
+
+from cashier import Cashier, Product
+from search import ProductIndex, FilteredMenuView, row_changes
+
+
+class FakeListbox:
+    # Stand-in for tk.Listbox that keeps the rows in a list
+    def __init__(self):
+        self.rows = []
+
+    def insert(self, index, *elements):
+        if index == tk.END:
+            self.rows.extend(elements)
+        else:
+            self.rows[index:index] = elements
+
+    def delete(self, first, last=None):
+        if last == tk.END:
+            del self.rows[first:]
+        elif last is not None:
+            del self.rows[first:last + 1]
+        else:
+            del self.rows[first]
+
+
+class SearchTest(unittest.TestCase):
+    def setUp(self):
+        # Names whose words share prefixes, the case that used to list a product twice
+        self.products = [Product("Coffee Cola", 2.00, 10), Product("Tea", 1.50, 10),
+                         Product("Cold Coffee", 3.00, 10), Product("Cocoa Cocoa", 2.50, 10)]
+        self.cashier = Cashier(self.products)
+
+    def test_shared_prefixes_listed_once(self):
+        index = ProductIndex(self.products)
+        self.assertEqual(index.search("c"), [0, 2, 3])
+        self.assertEqual(index.search("co"), [0, 2, 3])
+        self.assertEqual(index.search("col"), [0, 2])
+        self.assertEqual(index.search("coffee co"), [0, 2])
+
+    def test_rename_and_remove(self):
+        index = ProductIndex(self.products)
+        self.products[1].name = "Cool Tea"
+        index.rename(self.products[1])
+        self.assertEqual(index.search("co"), [0, 1, 2, 3])
+        self.assertEqual(index.search("cool"), [1])
+        index.remove(0)
+        self.assertEqual(index.search("c"), [1, 2, 3])
+        self.assertNotIn("cola", index.prefixes)
+
+    def test_filter_matches_full_redraw(self):
+        listbox = FakeListbox()
+        view = FilteredMenuView(listbox, self.cashier)
+        menu = self.cashier.display_menu()
+        for query in ("c", "co", "col", "cold", "", "tea", "cocoa", "x", "c"):
+            view.filter(query)
+            expected = [menu[i] for i in view.index.search(query)]
+            self.assertEqual(listbox.rows, expected, query)
+
+    def test_row_changes_random(self):
+        rng = random.Random(1)
+        for _ in range(200):
+            old = sorted(rng.sample(range(30), rng.randint(0, 30)))
+            new = sorted(rng.sample(range(30), rng.randint(0, 30)))
+            rows = list(old)
+            for position, deleted, inserted in row_changes(old, new):
+                rows[position:position + deleted] = inserted
+            self.assertEqual(rows, new)
+
+
+if __name__ == "__main__":
+    unittest.main()
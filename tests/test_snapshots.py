@@ -0,0 +1,68 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cashier import Cashier, Product
+from snapshots import OrderSnapshots, load_open_orders, restore_orders
+from tabs import TabManager
+
+
+class OrderSnapshotsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "open-tabs.snap")
+        self.products = [Product(f"Product {i}", 1.00 + i, 100, i) for i in range(4)]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def till(self):
+        # A cashier with tabs whose open orders are snapshotted, after putting back what the last run left
+        cashier = Cashier(self.products)
+        tabs = TabManager(cashier)
+        skipped = restore_orders(tabs, load_open_orders(self.path))
+        snapshots = OrderSnapshots(self.path, interval=0, sync=False, min_compact=4)
+        snapshots.follow(tabs)
+        return cashier, tabs, snapshots, skipped
+
+    def saved(self, tabs):
+        return {tab_id: [receipt.items.line(index)[:4] for index in range(len(receipt.items))]
+                for tab_id, receipt in tabs.tabs.items() if receipt.items}
+
+    def test_every_tab_is_restored_on_its_own_tab(self):
+        cashier, tabs, snapshots, _ = self.till()
+        cashier.take_order(0, 1)
+        tabs.switch("7")
+        for i in range(6):
+            cashier.take_order(i % 4, 1)
+        cashier.remove_item(0)
+        tabs.move_line("7", 0, None)
+        tabs.switch("paid")
+        cashier.take_order(3, 2)
+        tabs.settle(10 ** 4)
+        tabs.switch("9")
+        cashier.take_order(2, 1)
+        tabs.split("9", {0: None}, "12")
+        expected = self.saved(tabs)
+        snapshots.close()
+        cashier, tabs, snapshots, skipped = self.till()
+        snapshots.close()
+        self.assertEqual(skipped, [])
+        self.assertEqual(set(expected), {None, "7", "12"})
+        self.assertEqual(self.saved(tabs), expected)
+        self.assertIs(tabs.receipt(None), cashier.receipt)
+
+    def test_moving_a_line_that_is_gone_is_refused(self):
+        cashier, tabs, snapshots, _ = self.till()
+        snapshots.close()
+        cashier.take_order(0, 1)
+        tabs.open("4")
+        with self.assertRaises(ValueError):
+            tabs.move_line(None, 1, "4")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cashier import Cashier, Product
+from inventory import Inventory
+from sync import TillSync
+
+PRODUCTS = 6
+STOCK = 1000
+
+
+def run_till(till, share, down, work, orders, tills):
+    # One till process: sell while the share is unreachable, then sync until every till's orders have arrived,
+    # and write the stock counts and order ids it ended up with
+    random.seed(till)
+    products = [Product(f"Product {i}", 1.00 + i, STOCK, i) for i in range(PRODUCTS)]
+    inventory = Inventory(products)
+    cashier = Cashier(products, inventory=inventory, till=till)
+    sync = TillSync(down, till, os.path.join(work, f"{till}-outbox"), inventory)
+    order_ids = set()
+    sync.subscribe(lambda records: order_ids.update(record["id"] for record in records))
+    cashier.subscribe(lambda receipt: order_ids.add(receipt.order_id))
+    cashier.subscribe(sync.record_receipt)
+    cashier.start_new_order()
+    for number in range(orders):
+        for _ in range(random.randint(1, 3)):
+            cashier.take_order(random.randrange(PRODUCTS), random.randint(1, 2))
+        cashier.settle_order(10 ** 6)
+        if number % 5 == 0:
+            sync.sync()
+            assert sync.error is not None
+    # The link comes back
+    sync.directory = share
+    deadline = time.monotonic() + 30
+    while len(order_ids) < orders * tills and time.monotonic() < deadline:
+        sync.sync()
+        time.sleep(0.02)
+    # A last round after everything arrived, so the others see this till's final batch too
+    sync.sync()
+    time.sleep(0.5)
+    sync.sync()
+    with open(os.path.join(work, f"{till}.json"), "w") as file:
+        json.dump({"on_hand": inventory.on_hand, "orders": sorted(order_ids)}, file)
+
+
+class TillSyncTest(unittest.TestCase):
+    def test_tills_converge_after_offline_sales(self):
+        # Several till processes sell offline, then sync through one directory and end up with the same state
+        tills = 3
+        orders = 40
+        with tempfile.TemporaryDirectory() as work:
+            share = os.path.join(work, "share")
+            os.mkdir(share)
+            # A path below a plain file can never be created, like a share that is not mounted
+            down = os.path.join(work, "unmounted", "share")
+            open(os.path.join(work, "unmounted"), "w").close()
+            processes = [subprocess.Popen([sys.executable, os.path.abspath(__file__), f"till-{n}", share, down, work,
+                                           str(orders), str(tills)]) for n in range(tills)]
+            for process in processes:
+                self.assertEqual(process.wait(timeout=60), 0)
+            results = []
+            for n in range(tills):
+                with open(os.path.join(work, f"till-{n}.json")) as file:
+                    results.append(json.load(file))
+            self.assertEqual(len(results[0]["orders"]), orders * tills)
+            for result in results[1:]:
+                self.assertEqual(result, results[0])
+            self.assertTrue(any(on_hand < STOCK for on_hand in results[0]["on_hand"].values()))
+
+    def test_batches_applied_twice_change_nothing(self):
+        # A batch read again, e.g. after a crash before the state was saved, is skipped
+        with tempfile.TemporaryDirectory() as work:
+            share = os.path.join(work, "share")
+            products = [Product("Coffee", 1.50, 10, 0)]
+            inventory = Inventory(products)
+            sender = TillSync(share, "a", os.path.join(work, "a"))
+            receiver = TillSync(share, "b", os.path.join(work, "b"), inventory)
+            sender.record_stock({0: -3})
+            sender.exchange()
+            batches = receiver.exchange()
+            receiver.apply(batches)
+            receiver.apply(batches)
+            self.assertEqual(inventory.on_hand[0], 7)
+            # A restarted till carries on from its saved state
+            receiver = TillSync(share, "b", os.path.join(work, "b"), inventory)
+            self.assertEqual(receiver.exchange(), [])
+            sender.record_stock({0: 5})
+            sender.exchange()
+            receiver.sync()
+            self.assertEqual(inventory.on_hand[0], 12)
+
+    def test_changes_recorded_before_a_restart_are_sent(self):
+        # The till stops between recording changes and its next round
+        with tempfile.TemporaryDirectory() as work:
+            share = os.path.join(work, "share")
+            products = [Product("Coffee", 1.50, 10, 0)]
+            cashier = Cashier(products)
+            sender = TillSync(share, "a", os.path.join(work, "a"))
+            cashier.subscribe(sender.record_receipt)
+            cashier.start_new_order()
+            cashier.take_order(0, 2)
+            cashier.settle_order(1000)
+            sender.record_stock({0: -1})
+            sender.exchange()
+            sender.record_stock({0: 4})
+            cashier.take_order(0, 1)
+            cashier.settle_order(1000)
+            order_id = sender.orders[-1]["id"]
+            sender = TillSync(share, "a", os.path.join(work, "a"))
+            sender.exchange()
+            inventory = Inventory(products)
+            receiver = TillSync(share, "b", os.path.join(work, "b"), inventory)
+            self.assertEqual([record["id"] for record in receiver.sync()][-1], order_id)
+            self.assertEqual(inventory.on_hand[0], 10)
+            # Nothing is left pending once it is in a batch
+            self.assertEqual(TillSync(share, "a", os.path.join(work, "a")).orders, [])
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        run_till(sys.argv[1], sys.argv[2], sys.argv[3], sys.argv[4], int(sys.argv[5]), int(sys.argv[6]))
+    else:
+        unittest.main()
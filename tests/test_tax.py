@@ -0,0 +1,100 @@
+import os
+import json
+import random
+import sys
+import tempfile
+import unittest
+from fractions import Fraction
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import Catalog
+from cashier import Cashier, Product, Receipt
+from tax import TAX_CLASSES
+
+
+def scanned_gross(receipt):
+    # Gross cents per tax class found by scanning every line
+    gross = {}
+    for *_, subtotal, code in receipt.items:
+        gross[code] = gross.get(code, 0) + subtotal
+    return {code: cents for code, cents in gross.items() if cents}
+
+
+class TaxTest(unittest.TestCase):
+    def setUp(self):
+        self.products = [Product("Coffee", 1.50, 100, 0, "reduced"), Product("Beer", 2.30, 100, 1, "general"),
+                         Product("Bread", 0.95, 100, 2, "super_reduced"), Product("Water", 1.00, 100, 3)]
+
+    def test_included_tax_rounds_half_up(self):
+        for tax in TAX_CLASSES.values():
+            for gross in range(3000):
+                exact = Fraction(gross * tax.rate_bp, 10000 + tax.rate_bp)
+                self.assertEqual(tax.included(gross), int(exact + Fraction(1, 2)))
+
+    def test_breakdown_per_class(self):
+        cashier = Cashier(self.products)
+        cashier.take_order(0, 2)
+        cashier.take_order(1, 1)
+        self.assertEqual(cashier.receipt.tax_lines(), [("IVA (21.0%)", 40), ("IVA (10.0%)", 27)])
+        self.assertEqual(cashier.receipt.iva_cents, 67)
+
+    def test_sums_follow_random_edits(self):
+        for merge_lines in (False, True):
+            cashier = Cashier(self.products, merge_lines=merge_lines)
+            cashier.start_new_order()
+            receipt = cashier.receipt
+            rng = random.Random(merge_lines)
+            for _ in range(2000):
+                count = len(receipt.items)
+                choice = rng.random()
+                if choice < 0.5 or not count:
+                    cashier.take_order(rng.randrange(len(self.products)), rng.randint(1, 3))
+                elif choice < 0.7:
+                    cashier.remove_item(rng.randrange(count))
+                elif choice < 0.85 or merge_lines:
+                    index = rng.randrange(count)
+                    cashier.remove_item(index, rng.randint(1, receipt.items.quantities[index]))
+                else:
+                    index = rng.randrange(count)
+                    if receipt.items.quantities[index] > 1:
+                        receipt.split_item(index, receipt.items.quantities[index] - 1)
+                self.assertEqual({code: cents for code, cents in receipt.tax_gross.items() if cents},
+                                 scanned_gross(receipt))
+
+    def test_records_keep_the_breakdown(self):
+        cashier = Cashier(self.products)
+        cashier.take_order(1, 3)
+        cashier.take_order(2, 1)
+        record = cashier.receipt.to_record()
+        self.assertEqual(record["taxes"], [["general", 2100, 690, 120], ["super_reduced", 400, 95, 4]])
+        self.assertEqual(Receipt.from_record(record).tax_lines(), cashier.receipt.tax_lines())
+        # Lines written before tax classes were all taxed at the general rate
+        record["lines"] = [line[:4] for line in record["lines"]]
+        del record["taxes"]
+        self.assertEqual(Receipt.from_record(record).tax_lines(), [("IVA (21.0%)", 136)])
+
+    def test_catalog_with_an_unknown_tax_class_is_not_applied(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "products.json")
+            items = [{"id": 0, "name": "Coffee", "price": 1.5, "tax": "reduced"},
+                     {"id": 1, "name": "Beer", "price": 2.3}]
+            with open(path, "w") as file:
+                json.dump(items, file)
+            catalog = Catalog(path, cache=False)
+            stamp = catalog.stamp
+            # The first entry changes fine, the second names a class that does not exist
+            items[0]["price"] = 1.6
+            items[1]["tax"] = "genral"
+            with open(path, "w") as file:
+                json.dump(items + [{"id": 2, "name": "Tea", "price": 1.2}], file)
+            with self.assertRaises(ValueError):
+                catalog.reload()
+            self.assertEqual([(product.price, product.tax_class) for product in catalog.products],
+                             [(1.5, "reduced"), (2.3, "general")])
+            self.assertEqual(catalog.stamp, stamp)
+            self.assertTrue(catalog.changed())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,22 @@
+import os
+import uuid
+
+
+def till_id(path="till.id"):
+    # Stable name of this till, read from a file next to the shared databases and created on first run
+    try:
+        with open(path) as file:
+            till = file.read().strip()
+        if till:
+            return till
+    except FileNotFoundError:
+        pass
+    till = f"till-{uuid.uuid4().hex[:12]}"
+    # Write to a temporary file and rename it, so a crash never leaves an empty id behind
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as file:
+        file.write(till + "\n")
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+    return till